@@ -24,8 +24,10 @@ CREATE TABLE orders (
 -- Create indexes
 CREATE INDEX idx_customers_code ON customers(code);
 CREATE INDEX idx_customers_phone ON customers(phone_number);
-CREATE INDEX idx_orders_customer_id ON orders(customer_id);
-CREATE INDEX idx_orders_order_time ON orders(order_time);
+-- Newest-first order lists narrowed with ?fields= to these columns are
+-- answered from the indexes alone (index-only scans).
+CREATE INDEX idx_orders_customer_time ON orders(customer_id, order_time) INCLUDE (id, amount);
+CREATE INDEX idx_orders_order_time ON orders(order_time) INCLUDE (id, customer_id, amount);
 -- Create trigger function
 CREATE OR REPLACE FUNCTION update_updated_at_column() RETURNS TRIGGER AS $$ BEGIN NEW.updated_at = CURRENT_TIMESTAMP;
 RETURN NEW;
@@ -35,4 +37,104 @@ $$ language 'plpgsql';
 CREATE TRIGGER update_customers_updated_at BEFORE
 UPDATE ON customers FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 CREATE TRIGGER update_orders_updated_at BEFORE
-UPDATE ON orders FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
\ No newline at end of file
+UPDATE ON orders FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+-- Publish order inserts and deletes for /api/orders/stream/ (orders.streams).
+-- Bulk imports (orders.imports) set orders.skip_notify.
+CREATE OR REPLACE FUNCTION notify_order_change() RETURNS TRIGGER AS $$
+DECLARE changed orders;
+BEGIN IF current_setting('orders.skip_notify', true) = 'on' THEN RETURN NULL;
+END IF;
+IF TG_OP = 'DELETE' THEN changed := OLD;
+ELSE changed := NEW;
+END IF;
+PERFORM pg_notify('order_events', json_build_object(
+    'op', lower(TG_OP), 'id', changed.id, 'customer_id', changed.customer_id,
+    'item', changed.item, 'amount', changed.amount, 'order_time', changed.order_time
+)::text);
+RETURN NULL;
+END;
+$$ language 'plpgsql';
+CREATE TRIGGER notify_order_change
+AFTER INSERT OR DELETE ON orders FOR EACH ROW EXECUTE FUNCTION notify_order_change();
+-- Incremental sync (/api/*/changes/, core.changes): pages are range scans
+-- of these (time, id) indexes, and deletes leave tombstones behind.
+CREATE INDEX idx_customers_updated ON customers(updated_at, id);
+CREATE INDEX idx_orders_updated ON orders(updated_at, id);
+CREATE TABLE tombstones (
+    entity VARCHAR(20) NOT NULL,
+    id UUID NOT NULL,
+    deleted_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (entity, id)
+);
+CREATE INDEX idx_tombstones_deleted ON tombstones(entity, deleted_at, id);
+-- One INSERT per DELETE statement, cascades included. Moving a customer
+-- between shards sets sync.skip_tombstones: the rows live on elsewhere.
+CREATE OR REPLACE FUNCTION record_tombstones() RETURNS TRIGGER AS $$ BEGIN IF current_setting('sync.skip_tombstones', true) = 'on' THEN RETURN NULL;
+END IF;
+INSERT INTO tombstones (entity, id)
+SELECT TG_ARGV[0], id FROM deleted_rows
+ON CONFLICT (entity, id) DO UPDATE SET deleted_at = EXCLUDED.deleted_at;
+RETURN NULL;
+END;
+$$ language 'plpgsql';
+CREATE TRIGGER record_customer_tombstones
+AFTER DELETE ON customers REFERENCING OLD TABLE AS deleted_rows
+FOR EACH STATEMENT EXECUTE FUNCTION record_tombstones('customer');
+CREATE TRIGGER record_order_tombstones
+AFTER DELETE ON orders REFERENCING OLD TABLE AS deleted_rows
+FOR EACH STATEMENT EXECUTE FUNCTION record_tombstones('order');
+-- Outbound webhooks (webhooks app): partner registrations, and one
+-- delivery row per (event, subscription) until it is delivered or dead.
+CREATE TABLE webhook_subscriptions (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    url VARCHAR(500) NOT NULL,
+    events TEXT [] NOT NULL,
+    secret VARCHAR(100) NOT NULL,
+    max_batch_size INTEGER NOT NULL DEFAULT 1,
+    active BOOLEAN NOT NULL DEFAULT true,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE webhook_deliveries (
+    id BIGSERIAL PRIMARY KEY,
+    subscription_id UUID NOT NULL REFERENCES webhook_subscriptions(id) ON DELETE CASCADE,
+    event_id UUID NOT NULL,
+    event VARCHAR(50) NOT NULL,
+    payload TEXT NOT NULL,
+    status VARCHAR(10) NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    last_error TEXT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX idx_webhook_deliveries_due ON webhook_deliveries(subscription_id, next_attempt_at)
+WHERE status = 'pending';
+CREATE INDEX idx_webhook_deliveries_dead ON webhook_deliveries(subscription_id, id)
+WHERE status = 'dead';
+-- Order import jobs (orders.imports): uploaded files wait in IMPORT_DIR
+-- until `manage.py process_order_imports` loads them. Progress is saved
+-- per chunk, so a job taken over from a dead worker resumes where it was.
+CREATE TABLE import_jobs (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    format VARCHAR(10) NOT NULL,
+    path VARCHAR(500) NOT NULL,
+    status VARCHAR(10) NOT NULL DEFAULT 'queued',
+    total_bytes BIGINT NOT NULL,
+    bytes_read BIGINT NOT NULL DEFAULT 0,
+    rows_read BIGINT NOT NULL DEFAULT 0,
+    rows_imported BIGINT NOT NULL DEFAULT 0,
+    rows_rejected BIGINT NOT NULL DEFAULT 0,
+    error TEXT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    started_at TIMESTAMP WITH TIME ZONE,
+    heartbeat_at TIMESTAMP WITH TIME ZONE,
+    finished_at TIMESTAMP WITH TIME ZONE
+);
+CREATE INDEX idx_import_jobs_pending ON import_jobs(created_at)
+WHERE status IN ('queued', 'running');
+CREATE TABLE import_rejects (
+    job_id UUID NOT NULL REFERENCES import_jobs(id) ON DELETE CASCADE,
+    row_number BIGINT NOT NULL,
+    error TEXT NOT NULL,
+    data TEXT,
+    PRIMARY KEY (job_id, row_number)
+);
\ No newline at end of file
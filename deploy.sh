@@ -10,6 +10,7 @@ SERVER_USER="root"
 SERVER_HOST="185.240.51.176"
 SERVER_PATH="/var/www/savannah/savannah_test"
 LOCAL_PATH="./savannah_test"
+GUNICORN_PID="/tmp/savannah-gunicorn.pid"
 
 echo "🚀 Starting deployment to $SERVER_HOST..."
 
@@ -47,14 +48,14 @@ install_dependencies() {
 restart_service() {
     echo "🔄 Restarting Django service..."
     
-    # Kill existing Django processes
+    # Stop the old gunicorn gracefully (in-flight requests finish, see
+    # graceful_timeout in gunicorn.conf.py), and any leftover runserver
     run_remote "pkill -f 'python3 manage.py runserver' || true"
+    run_remote "if [ -f $GUNICORN_PID ]; then kill -TERM \$(cat $GUNICORN_PID) 2>/dev/null || true; fi"
+    run_remote "for i in \$(seq 1 35); do [ -f $GUNICORN_PID ] || break; sleep 1; done"
     
-    # Wait a moment for processes to stop
-    sleep 2
-    
-    # Start Django service
-    run_remote "cd $SERVER_PATH && nohup python3 manage.py runserver 0.0.0.0:8003 > /dev/null 2>&1 &"
+    # Start gunicorn; workers warm their DB connections before serving
+    run_remote "cd $SERVER_PATH && GUNICORN_BIND=0.0.0.0:8003 gunicorn -c gunicorn.conf.py --daemon --pid $GUNICORN_PID --access-logfile $SERVER_PATH/gunicorn-access.log --error-logfile $SERVER_PATH/gunicorn-error.log"
     
     # Wait for service to start
     sleep 3
@@ -72,7 +73,7 @@ check_service() {
         echo "🌐 Application is available at: http://$SERVER_HOST:8003"
     else
         echo "⚠️  Service may not be responding properly"
-        echo "🔧 Check logs: ssh $SERVER_USER@$SERVER_HOST 'cd $SERVER_PATH && tail -f nohup.out'"
+        echo "🔧 Check logs: ssh $SERVER_USER@$SERVER_HOST 'tail -f $SERVER_PATH/gunicorn-error.log'"
     fi
 }
 
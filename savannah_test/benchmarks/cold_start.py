@@ -0,0 +1,138 @@
+"""
+Cold-start comparison of the full site and the slim API-only entrypoint.
+
+Each entrypoint is booted in a fresh interpreter under ``python -X importtime``.
+It then serves one unauthenticated GET /api/customers/ (a 401, which needs no
+database). The script reports the total import time, the time until that
+first response and the packages that took longest to import:
+
+    python benchmarks/cold_start.py
+    python benchmarks/cold_start.py --entrypoint savannah_test.asgi_api --top 15
+
+Run it from savannah_test/ with the same environment as the server.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+DEFAULT_ENTRYPOINTS = ('savannah_test.wsgi', 'savannah_test.wsgi_api')
+
+# Runs in the child: import the entrypoint and serve one WSGI request.
+BOOT = """
+import sys, time
+started = time.perf_counter()
+from {module} import application
+booted = time.perf_counter()
+environ = {{
+    'REQUEST_METHOD': 'GET', 'PATH_INFO': '/api/customers/', 'QUERY_STRING': '',
+    'SERVER_NAME': 'localhost', 'SERVER_PORT': '443', 'HTTP_HOST': 'localhost',
+    'SERVER_PROTOCOL': 'HTTP/1.1', 'HTTP_ACCEPT': 'application/json',
+    'wsgi.url_scheme': 'https', 'wsgi.input': __import__('io').BytesIO(),
+    'wsgi.errors': sys.stderr, 'wsgi.multithread': False,
+    'wsgi.multiprocess': False, 'wsgi.run_once': False, 'wsgi.version': (1, 0),
+}}
+statuses = []
+b''.join(application(environ, lambda status, headers, exc_info=None: statuses.append(status)))
+served = time.perf_counter()
+print('COLDSTART', (booted - started) * 1000, (served - started) * 1000, statuses[0].split()[0], len(sys.modules))
+"""
+
+ASGI_BOOT = """
+import asyncio, sys, time
+started = time.perf_counter()
+from {module} import application
+booted = time.perf_counter()
+scope = {{
+    'type': 'http', 'asgi': {{'version': '3.0'}}, 'http_version': '1.1',
+    'method': 'GET', 'scheme': 'https', 'path': '/api/customers/',
+    'raw_path': b'/api/customers/', 'query_string': b'', 'root_path': '',
+    'headers': [(b'host', b'localhost'), (b'accept', b'application/json')],
+    'server': ('localhost', 443), 'client': ('127.0.0.1', 0),
+}}
+statuses = []
+
+async def receive():
+    return {{'type': 'http.request', 'body': b'', 'more_body': False}}
+
+async def send(message):
+    if message['type'] == 'http.response.start':
+        statuses.append(str(message['status']))
+
+asyncio.run(application(scope, receive, send))
+served = time.perf_counter()
+print('COLDSTART', (booted - started) * 1000, (served - started) * 1000, statuses[0], len(sys.modules))
+"""
+
+
+def parse_importtime(stderr):
+    """
+    Sum -X importtime's self time per top-level package, so e.g. everything
+    under django.* is one entry however deeply it was imported.
+    Returns (total microseconds, {package: microseconds}).
+    """
+    packages = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        self_time, _, name = line[len('import time:'):].split('|')
+        if not self_time.strip().isdigit():
+            continue  # the header line
+        package = name.strip().split('.')[0]
+        packages[package] = packages.get(package, 0) + int(self_time)
+    return sum(packages.values()), packages
+
+
+def measure(module):
+    template = ASGI_BOOT if module.endswith('asgi') or '.asgi_' in module else BOOT
+    started = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', template.format(module=module)],
+        capture_output=True, text=True, env=os.environ.copy(),
+    )
+    wall = (time.perf_counter() - started) * 1000
+    report = [line for line in completed.stdout.splitlines() if line.startswith('COLDSTART')]
+    if completed.returncode or not report:
+        raise RuntimeError(f"{module} failed to boot:\n{completed.stderr[-2000:]}")
+    _, booted, served, status, modules = report[0].split()
+    total, packages = parse_importtime(completed.stderr)
+    return {
+        'booted': float(booted),
+        'served': float(served),
+        'status': status,
+        'modules': int(modules),
+        'imports': total / 1000,
+        'wall': wall,
+        'packages': packages,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--entrypoint', action='append',
+                        help='Module exposing `application` (default: full site and wsgi_api)')
+    parser.add_argument('--runs', type=int, default=3, help='Fresh processes per entrypoint; the fastest is kept')
+    parser.add_argument('--top', type=int, default=10, help='Slowest packages to list')
+    args = parser.parse_args()
+
+    results = {}
+    for module in args.entrypoint or DEFAULT_ENTRYPOINTS:
+        results[module] = min((measure(module) for _ in range(args.runs)), key=lambda r: r['served'])
+
+    print(f"{'entrypoint':<26} {'imports ms':>10} {'boot ms':>8} {'1st resp ms':>11} {'process ms':>10} {'modules':>8}  status")
+    for module, result in results.items():
+        print(
+            f"{module:<26} {result['imports']:>10.1f} {result['booted']:>8.1f} {result['served']:>11.1f} "
+            f"{result['wall']:>10.1f} {result['modules']:>8}  {result['status']}"
+        )
+
+    for module, result in results.items():
+        print(f"\nSlowest packages to import for {module}:")
+        ranked = sorted(result['packages'].items(), key=lambda item: item[1], reverse=True)
+        for package, micros in ranked[:args.top]:
+            print(f"  {package:<30} {micros / 1000:>8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
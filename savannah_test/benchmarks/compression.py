@@ -0,0 +1,89 @@
+"""
+Response compression benchmark for order list bodies.
+
+Renders order lists with ORJSONRenderer (see render_orders.py), then
+compresses them with every gzip/brotli tier of core.compression and,
+as a streaming response in 64 KiB chunks, through
+core.middleware.CompressionMiddleware. Django's GZipMiddleware is the
+baseline. Reports output size, CPU time, KB saved per CPU millisecond
+and the largest chunk sent at once. No database is needed:
+
+    python benchmarks/compression.py
+    python benchmarks/compression.py --rows 2000 --rows 100000
+"""
+import argparse
+import time
+
+from render_orders import make_orders
+
+from django.http import HttpResponse, StreamingHttpResponse
+from django.middleware.gzip import GZipMiddleware
+from django.test import RequestFactory, override_settings
+
+from core.compression import ENCODERS, PREFERRED_ENCODINGS, compression_stats
+from core.middleware import CompressionMiddleware
+from core.renderers import ORJSONRenderer
+
+CHUNK = 64 * 1024
+
+
+def chunks(body):
+    for start in range(0, len(body), CHUNK):
+        yield body[start:start + CHUNK]
+
+
+def run_buffered(body, encoding, tier):
+    encoder = ENCODERS[encoding](tier)
+    return len(encoder.compress(body) + encoder.finish()), encoder.cpu_time, len(body)
+
+
+def run_streaming(body, encoding):
+    request = RequestFactory().get('/api/orders/', HTTP_ACCEPT_ENCODING=encoding)
+    middleware = CompressionMiddleware(
+        lambda request: StreamingHttpResponse(chunks(body), content_type='application/json')
+    )
+    started = time.thread_time()
+    sizes = [len(part) for part in middleware(request).streaming_content]
+    return sum(sizes), time.thread_time() - started, max(sizes)
+
+
+def run_django_gzip(body):
+    request = RequestFactory().get('/api/orders/', HTTP_ACCEPT_ENCODING='gzip')
+    middleware = GZipMiddleware(lambda request: HttpResponse(body, content_type='application/json'))
+    started = time.thread_time()
+    response = middleware(request)
+    return len(response.content), time.thread_time() - started, len(body)
+
+
+def report(rows, label, size, compressed, cpu_time, held):
+    saved_kb = (size - compressed) / 1024
+    print(
+        f"{rows:>8} {label:<16} {compressed / 1e6:>8.2f} {compressed / size:>6.3f} "
+        f"{cpu_time * 1000:>9.1f} {saved_kb / (cpu_time * 1000) if cpu_time else 0:>10.1f} "
+        f"{held / 1024:>9.0f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--rows', type=int, action='append', help='Orders per response (default: 2000 and 100000)')
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} {'encoding:tier':<16} {'MB out':>8} {'ratio':>6} {'cpu ms':>9} {'KB/cpu ms':>10} {'chunk KB':>9}")
+    with override_settings(COMPRESSION_ENABLED=True, COMPRESSION_BUSY_LOAD=float('inf')):
+        for rows in args.rows or [2_000, 100_000]:
+            body = ORJSONRenderer().render(make_orders(rows))
+            print(f"{rows:>8} {'identity':<16} {len(body) / 1e6:>8.2f}")
+            report(rows, 'django gzip', len(body), *run_django_gzip(body))
+            for encoding in PREFERRED_ENCODINGS:
+                for tier in range(3):
+                    report(rows, f'{encoding}:{tier}', len(body), *run_buffered(body, encoding, tier))
+                report(rows, f'{encoding} stream', len(body), *run_streaming(body, encoding))
+
+    print('\ncore.compression totals for this run:')
+    for key, totals in compression_stats.stats().items():
+        print(f"  {key:<8} {totals}")
+
+
+if __name__ == '__main__':
+    main()
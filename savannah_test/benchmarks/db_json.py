@@ -0,0 +1,96 @@
+"""
+CPU cost of GET /api/orders/ with and without DB_JSON_RESPONSES.
+
+Inserts ``--rows`` orders inside a transaction that is rolled back at the
+end. It then calls OrderListView both ways and reports per request:
+- wall time
+- CPU time of this (the Django) process
+- response size
+
+It also checks that both bodies are identical. Needs the database from the
+usual settings (or DJANGO_SETTINGS_MODULE):
+
+    python benchmarks/db_json.py
+    python benchmarks/db_json.py --rows 1000 --rows 100000 --repeat 3
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'savannah_test.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.contrib.auth.models import User  # noqa: E402
+from django.db import connection, transaction  # noqa: E402
+from django.test.utils import override_settings  # noqa: E402
+from rest_framework.test import APIRequestFactory, force_authenticate  # noqa: E402
+
+from orders.views import OrderListView  # noqa: E402
+
+SEED_SQL = """
+    WITH new_customers AS (
+        INSERT INTO customers (code, name, phone_number)
+        SELECT 'BENCH' || g, 'Benchmark customer ' || g, '+2547' || lpad(g::text, 8, '0')
+        FROM generate_series(1, 500) g
+        RETURNING id
+    ), numbered AS (
+        SELECT id, row_number() OVER () - 1 AS n FROM new_customers
+    )
+    INSERT INTO orders (customer_id, item, amount, order_time)
+    SELECT numbered.id, 'Item ' || (g %% 1000), (g %% 100000) / 100.0 + 1,
+           now() - g * interval '37 seconds'
+    FROM generate_series(1, %s) g
+    JOIN numbered ON numbered.n = g %% 500
+"""
+
+
+def request_orders():
+    request = APIRequestFactory().get('/api/orders/', HTTP_ACCEPT='application/json')
+    force_authenticate(request, user=User(username='benchmark'))
+    response = OrderListView.as_view()(request)
+    if hasattr(response, 'render'):
+        response.render()
+    return response
+
+
+def measure(repeat):
+    """Best wall and CPU time over ``repeat`` requests, and the last body"""
+    wall = cpu = float('inf')
+    for _ in range(repeat):
+        started_wall, started_cpu = time.perf_counter(), time.process_time()
+        response = request_orders()
+        wall = min(wall, time.perf_counter() - started_wall)
+        cpu = min(cpu, time.process_time() - started_cpu)
+    return wall, cpu, response.content
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--rows', type=int, action='append', help='Orders to seed (default: 100, 1k, 10k, 100k)')
+    parser.add_argument('--repeat', type=int, default=5, help='Requests per mode; the fastest is reported')
+    args = parser.parse_args()
+
+    print(f"{'orders':>8} {'mode':<9} {'wall ms':>9} {'cpu ms':>9} {'MB':>7}  identical")
+    for rows in args.rows or [100, 1_000, 10_000, 100_000]:
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(SEED_SQL, [rows])
+            bodies = {}
+            for label, enabled in (('python', False), ('database', True)):
+                with override_settings(DB_JSON_RESPONSES=enabled):
+                    wall, cpu, bodies[label] = measure(args.repeat)
+                print(
+                    f"{rows:>8} {label:<9} {wall * 1000:>9.1f} {cpu * 1000:>9.1f} "
+                    f"{len(bodies[label]) / 1e6:>7.2f}  {bodies[label] == bodies['python']}"
+                )
+            transaction.set_rollback(True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Memory and speed of parsing a batch body with ORJSONParser, which reads
+and decodes the whole body before the view sees it, against
+core.parsers.JSONArrayStream, which hands out one element at a time.
+
+For each ``--sizes`` (number of orders in the array) it writes the body to
+a temporary file, then reads it back through each parser from the file,
+as from a request stream, keeping nothing but a count and a running
+total the way a chunked view would. It reports MB/s and the peak of
+traced Python allocations during parsing:
+
+    python benchmarks/json_stream.py --sizes 1000 10000 100000 1000000
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'savannah_test.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from core.parsers import JSONArrayStream, ORJSONParser  # noqa: E402
+
+
+def write_body(path, count):
+    with open(path, 'w') as body:
+        body.write('[')
+        for n in range(count):
+            order = {'customer_code': f'CUST{n % 500:03d}', 'item': f'Item {n}', 'amount': f'{n % 1000}.50'}
+            body.write((',' if n else '') + json.dumps(order))
+        body.write(']')
+
+
+def consume(elements):
+    count, total = 0, 0.0
+    for element in elements:
+        count += 1
+        total += float(element['amount'])
+    return count
+
+
+def parse_whole(stream):
+    return consume(ORJSONParser().parse(stream))
+
+
+def parse_stream(stream):
+    return consume(JSONArrayStream(stream))
+
+
+def measure(parse, path):
+    tracemalloc.start()
+    started = time.perf_counter()
+    with open(path, 'rb') as stream:
+        count = parse(stream)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return count, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000, 1000000],
+                        help='Orders per body')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'body.json')
+        for size in args.sizes:
+            write_body(path, size)
+            megabytes = os.path.getsize(path) / 1e6
+            print(f"{size} orders, {megabytes:.1f} MB")
+            for name, parse in [('orjson', parse_whole), ('stream', parse_stream)]:
+                count, elapsed, peak = measure(parse, path)
+                assert count == size
+                print(f"  {name:>8}: {megabytes / elapsed:7.1f} MB/s  peak {peak / 1e6:8.2f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""
+Side-by-side HTTP load test for the WSGI and ASGI deployments.
+
+Opens ``--connections`` concurrent keep-alive connections per target and
+keeps each one busy with GET requests for ``--duration`` seconds, then
+reports throughput and latency percentiles. Only the standard library is
+used, so it runs anywhere the app does.
+
+Example, with gunicorn on :8000 and uvicorn on :8001:
+
+    python benchmarks/loadtest.py \\
+        --target wsgi=http://localhost:8000/api/orders/ \\
+        --target asgi=http://localhost:8001/api/async/orders/ \\
+        --connections 1000 --duration 30 --token "$TOKEN"
+
+Raise the open file limit first (ulimit -n 4096) for 1k connections.
+"""
+import argparse
+import asyncio
+import time
+from urllib.parse import urlsplit
+
+
+class Result:
+    def __init__(self):
+        self.latencies = []
+        self.errors = 0
+        self.statuses = {}
+
+    def percentile(self, p):
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+async def read_response(reader):
+    """Read one HTTP/1.1 response; returns (status, keep_alive)"""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('connection closed')
+    status = int(status_line.split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip().lower()
+
+    if 'content-length' in headers:
+        await reader.readexactly(int(headers['content-length']))
+    elif headers.get('transfer-encoding') == 'chunked':
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    else:
+        await reader.read()
+        return status, False
+    return status, headers.get('connection') != 'close'
+
+
+async def worker(url, headers, deadline, result):
+    parts = urlsplit(url)
+    port = parts.port or 80
+    path = parts.path or '/'
+    if parts.query:
+        path += f'?{parts.query}'
+    request = (
+        f'GET {path} HTTP/1.1\r\nHost: {parts.hostname}:{port}\r\n'
+        + ''.join(f'{name}: {value}\r\n' for name, value in headers.items())
+        + '\r\n'
+    ).encode('latin-1')
+
+    reader = writer = None
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(parts.hostname, port)
+            writer.write(request)
+            await writer.drain()
+            status, keep_alive = await read_response(reader)
+        except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError, IndexError):
+            result.errors += 1
+            if writer is not None:
+                writer.close()
+            reader = writer = None
+            await asyncio.sleep(0.01)
+            continue
+        result.latencies.append(time.perf_counter() - started)
+        result.statuses[status] = result.statuses.get(status, 0) + 1
+        if not keep_alive:
+            # gunicorn's sync workers close after every response.
+            writer.close()
+            reader = writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def run(url, connections, duration, headers):
+    result = Result()
+    deadline = time.monotonic() + duration
+    started = time.monotonic()
+    await asyncio.gather(*(worker(url, headers, deadline, result) for _ in range(connections)))
+    return result, time.monotonic() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--target', action='append', required=True,
+                        help='label=url to load, e.g. asgi=http://localhost:8001/api/async/orders/')
+    parser.add_argument('--connections', type=int, default=1000)
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--token', help='Bearer token sent with every request')
+    args = parser.parse_args()
+
+    headers = {'Accept': 'application/json'}
+    if args.token:
+        headers['Authorization'] = f'Bearer {args.token}'
+
+    print(f"{'target':<10} {'requests':>9} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}  statuses")
+    for target in args.target:
+        label, _, url = target.partition('=')
+        result, elapsed = asyncio.run(run(url, args.connections, args.duration, headers))
+        print(
+            f"{label:<10} {len(result.latencies):>9} {len(result.latencies) / elapsed:>9.1f} "
+            f"{result.percentile(50) * 1000:>8.1f} {result.percentile(99) * 1000:>8.1f} "
+            f"{result.errors:>7}  {result.statuses}"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+MessagePack vs JSON for order list responses.
+
+Encodes order lists with DRF's JSONRenderer, core.renderers.ORJSONRenderer
+and core.renderers.MessagePackRenderer, decodes them again and reports the
+best time of each plus the payload size. JSON decodes to strings and
+floats; "JSON typed" also converts ids, amounts and timestamps back to
+UUID, Decimal and datetime, which MessagePack returns directly.
+
+Orders are generated like render_orders.py, or with --database read from
+the database of the usual settings (or DJANGO_SETTINGS_MODULE):
+
+    python benchmarks/msgpack_orders.py
+    python benchmarks/msgpack_orders.py --database --repeat 3
+"""
+import argparse
+import json
+import time
+import uuid
+from datetime import datetime
+from decimal import Decimal
+from io import BytesIO
+
+from render_orders import make_orders
+
+from django.db import connection
+from rest_framework.renderers import JSONRenderer
+
+from core.parsers import MessagePackParser, ORJSONParser
+from core.renderers import MessagePackRenderer, ORJSONRenderer
+from orders.queries import ORDER_LIST
+
+
+def best_of(repeat, function, *args):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function(*args)
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def parse_typed(parser, body):
+    """What a JSON client does to get the types MessagePack keeps"""
+    orders = parser.parse(BytesIO(body))
+    for order in orders:
+        order['id'] = uuid.UUID(order['id'])
+        order['customer_id'] = uuid.UUID(order['customer_id'])
+        order['amount'] = Decimal(str(order['amount']))
+        order['order_time'] = datetime.fromisoformat(order['order_time'])
+        order['created_at'] = datetime.fromisoformat(order['created_at'])
+    return orders
+
+
+def database_orders():
+    with connection.cursor() as cursor:
+        return ORDER_LIST.fetchall(cursor)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--rows', type=int, action='append', help='Generated orders per list (default: 10000 and 100000)')
+    parser.add_argument('--database', action='store_true', help='Use the orders in the database instead')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per case; the fastest is reported')
+    args = parser.parse_args()
+
+    cases = [
+        ('JSONRenderer', JSONRenderer().render, lambda body: json.loads(body)),
+        ('ORJSONRenderer', ORJSONRenderer().render, lambda body: ORJSONParser().parse(BytesIO(body))),
+        ('JSON typed', ORJSONRenderer().render, lambda body: parse_typed(ORJSONParser(), body)),
+        ('MessagePack', MessagePackRenderer().render, lambda body: MessagePackParser().parse(BytesIO(body))),
+    ]
+    lists = [('db', database_orders())] if args.database else [(rows, make_orders(rows)) for rows in args.rows or [10_000, 100_000]]
+
+    print(f"{'rows':>8} {'format':<15} {'encode ms':>10} {'decode ms':>10} {'MB':>7}")
+    for label, data in lists:
+        for name, encode, decode in cases:
+            encode_time, body = best_of(args.repeat, encode, data)
+            decode_time, _ = best_of(args.repeat, decode, body)
+            print(
+                f"{len(data) if label == 'db' else label:>8} {name:<15} {encode_time * 1000:>10.1f} "
+                f"{decode_time * 1000:>10.1f} {len(body) / 1e6:>7.2f}"
+            )
+
+
+if __name__ == '__main__':
+    main()
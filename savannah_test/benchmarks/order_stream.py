@@ -0,0 +1,143 @@
+"""
+Fan-out benchmark for GET /api/orders/stream/ (Server-Sent Events).
+
+Opens ``--subscribers`` idle SSE connections to a running server, then
+inserts ``--orders`` orders into the database of the usual settings (or
+DJANGO_SETTINGS_MODULE) one at a time and reports how long each insert
+took from commit to reaching every subscriber. It also reports how many
+transactions the database ran while the subscribers sat idle for
+``--idle`` seconds: polling clients would cost one list query each per
+poll, the stream costs the listeners' keepalive checks. Only the standard
+library is used for HTTP:
+
+    uvicorn savannah_test.asgi:application --port 8001 &
+    python benchmarks/order_stream.py --url http://localhost:8001/api/orders/stream/ \\
+        --subscribers 2000 --token "$TOKEN"
+
+Raise the open file limit first (ulimit -n 8192) for thousands of subscribers.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+from urllib.parse import urlsplit
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'savannah_test.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import connection  # noqa: E402
+
+
+class Subscriber:
+    def __init__(self):
+        self.received = {}
+
+    async def run(self, url, headers, connected):
+        parts = urlsplit(url)
+        reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+        writer.write((
+            f'GET {parts.path} HTTP/1.1\r\nHost: {parts.hostname}\r\nAccept: text/event-stream\r\n'
+            + ''.join(f'{name}: {value}\r\n' for name, value in headers.items())
+            + '\r\n'
+        ).encode('latin-1'))
+        await writer.drain()
+        status = int((await reader.readline()).split()[1])
+        if status != 200:
+            raise ConnectionError(f'HTTP {status}')
+        connected.release()
+        try:
+            # Chunk size lines of the chunked encoding are skipped like any other line.
+            while line := await reader.readline():
+                if line.startswith(b'id: '):
+                    self.received[line[4:].strip().decode()] = time.perf_counter()
+        finally:
+            writer.close()
+
+
+def insert_order():
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            INSERT INTO orders (customer_id, item, amount)
+            SELECT id, 'Stream benchmark', 1.00 FROM customers LIMIT 1
+            RETURNING id
+        """)
+        order_id = cursor.fetchone()[0]
+    return f'insert:{order_id}', time.perf_counter()
+
+
+def delete_benchmark_orders():
+    with connection.cursor() as cursor:
+        cursor.execute("DELETE FROM orders WHERE item = 'Stream benchmark'")
+
+
+def committed_transactions():
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_stat_clear_snapshot()")
+        cursor.execute("SELECT xact_commit FROM pg_stat_database WHERE datname = current_database()")
+        return cursor.fetchone()[0]
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] if ordered else 0.0
+
+
+async def run(args, headers):
+    subscribers = [Subscriber() for _ in range(args.subscribers)]
+    connected = asyncio.Semaphore(0)
+    started = time.perf_counter()
+    tasks = [asyncio.create_task(subscriber.run(args.url, headers, connected)) for subscriber in subscribers]
+    for _ in subscribers:
+        await connected.acquire()
+    print(f"{len(subscribers)} subscribers connected in {time.perf_counter() - started:.2f} s")
+
+    # Let the backends flush the statistics of the connection phase first
+    # (PostgreSQL 15+ reports idle sessions' counters within 10 s).
+    await asyncio.sleep(11)
+    before = await asyncio.to_thread(committed_transactions)
+    await asyncio.sleep(args.idle)
+    idle = await asyncio.to_thread(committed_transactions) - before - 1
+    print(f"transactions while idle for {args.idle:.0f} s: {idle}")
+
+    latencies = []
+    for _ in range(args.orders):
+        event_id, committed = await asyncio.to_thread(insert_order)
+        deadline = time.perf_counter() + 5
+        while time.perf_counter() < deadline and not all(event_id in s.received for s in subscribers):
+            await asyncio.sleep(0.001)
+        latencies.extend(s.received[event_id] - committed for s in subscribers if event_id in s.received)
+    delivered = len(latencies) / (args.orders * len(subscribers))
+
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await asyncio.to_thread(delete_benchmark_orders)
+
+    print(
+        f"{args.orders} orders: delivered {delivered:.1%}, commit to subscriber "
+        f"p50 {percentile(latencies, 50) * 1000:.1f} ms, p99 {percentile(latencies, 99) * 1000:.1f} ms, "
+        f"max {max(latencies, default=0) * 1000:.1f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--url', required=True, help='Stream URL, e.g. http://localhost:8001/api/orders/stream/')
+    parser.add_argument('--subscribers', type=int, default=1000)
+    parser.add_argument('--orders', type=int, default=20, help='Orders inserted, one at a time')
+    parser.add_argument('--idle', type=float, default=10, help='Seconds to count idle database load')
+    parser.add_argument('--token', help='Bearer token sent with every request')
+    args = parser.parse_args()
+
+    headers = {'Authorization': f'Bearer {args.token}'} if args.token else {}
+    asyncio.run(run(args, headers))
+
+
+if __name__ == '__main__':
+    main()
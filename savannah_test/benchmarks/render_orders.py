@@ -0,0 +1,111 @@
+"""
+Renderer benchmark for order list responses.
+
+Builds order lists shaped like GET /api/orders/ (UUIDs, Decimal amounts,
+aware datetimes) and times DRF's JSONRenderer against
+core.renderers.ORJSONRenderer. It also checks that both produce the same
+bytes. It also times the ?embed=customers shape, including the
+side-loading pass. No database is needed:
+
+    python benchmarks/render_orders.py
+    python benchmarks/render_orders.py --rows 10000 --rows 100000 --repeat 5
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'savannah_test.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+
+from core.renderers import ORJSONRenderer  # noqa: E402
+from orders.views import embed_customers  # noqa: E402
+
+
+def make_orders(count, customers=500):
+    """Order rows as the raw-SQL order views return them"""
+    rng = random.Random(count)
+    people = [
+        {
+            'customer_id': uuid.UUID(int=rng.getrandbits(128), version=4),
+            'customer_code': f'CUST{i:05d}',
+            'customer_name': f'Customer {i}',
+            'customer_phone': f'+2547{rng.randrange(10 ** 8):08d}',
+        }
+        for i in range(customers)
+    ]
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    orders = []
+    for i in range(count):
+        created = start + timedelta(seconds=i * 37, microseconds=rng.randrange(10 ** 6))
+        orders.append({
+            'id': uuid.UUID(int=rng.getrandbits(128), version=4),
+            'item': f'Item {rng.randrange(1000)}',
+            'amount': Decimal(rng.randrange(100, 10 ** 7)) / 100,
+            'order_time': created,
+            'created_at': created,
+            **people[rng.randrange(customers)],
+        })
+    return orders
+
+
+def best_of(repeat, render, data):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = render(data)
+        timings.append(time.perf_counter() - started)
+    return min(timings), body
+
+
+def best_of_embedded(repeat, renderer, data):
+    """Like best_of, timing embed_customers() plus rendering"""
+    timings = []
+    for _ in range(repeat):
+        # embed_customers() pops fields, so each run gets fresh rows.
+        rows = [dict(row) for row in data]
+        started = time.perf_counter()
+        body = renderer.render(embed_customers(rows))
+        timings.append(time.perf_counter() - started)
+    return min(timings), body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--rows', type=int, action='append', help='Orders per response (default: 10000 and 100000)')
+    parser.add_argument('--repeat', type=int, default=5, help='Renders per size; the fastest is reported')
+    args = parser.parse_args()
+
+    renderers = [('JSONRenderer', JSONRenderer()), ('ORJSONRenderer', ORJSONRenderer())]
+    print(f"{'rows':>8} {'renderer':<21} {'ms':>9} {'rows/s':>11} {'MB':>7}  identical")
+    for rows in args.rows or [10_000, 100_000]:
+        data = make_orders(rows)
+        baseline = None
+        for label, renderer in renderers:
+            elapsed, body = best_of(args.repeat, renderer.render, data)
+            baseline = body if baseline is None else baseline
+            print(
+                f"{rows:>8} {label:<21} {elapsed * 1000:>9.1f} {rows / elapsed:>11.0f} "
+                f"{len(body) / 1e6:>7.2f}  {body == baseline}"
+            )
+        for label, renderer in renderers:
+            elapsed, body = best_of_embedded(args.repeat, renderer, data)
+            print(
+                f"{rows:>8} {label + ' embed':<21} {elapsed * 1000:>9.1f} {rows / elapsed:>11.0f} "
+                f"{len(body) / 1e6:>7.2f}  -"
+            )
+
+
+if __name__ == '__main__':
+    main()
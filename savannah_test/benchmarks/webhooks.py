@@ -0,0 +1,108 @@
+"""
+Webhook dispatcher benchmark: a fast and a slow subscriber side by side.
+
+Starts two local receivers, one answering at once and one after
+``--slow-delay`` seconds, registers both for order.created in the
+database of the usual settings (or DJANGO_SETTINGS_MODULE), queues
+``--events`` events with webhooks.events.publish() and runs a
+webhooks.dispatcher.Dispatcher until the fast receiver has them all. It
+reports the enqueue cost per event, how long the fast subscriber took,
+and how many HTTP requests each receiver got, which shows the batching:
+
+    python benchmarks/webhooks.py --events 2000 --batch-size 50
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'savannah_test.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import connection  # noqa: E402
+
+from webhooks.dispatcher import Dispatcher  # noqa: E402
+from webhooks.events import ORDER_CREATED, publish  # noqa: E402
+
+
+class Receiver(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        time.sleep(self.server.delay)
+        with self.server.lock:
+            self.server.requests += 1
+            self.server.events += body.count(b'"type":')
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def start_receiver(delay):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Receiver)
+    server.delay, server.requests, server.events, server.lock = delay, 0, 0, threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def subscribe(server, batch_size):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "INSERT INTO webhook_subscriptions (url, events, secret, max_batch_size) "
+            "VALUES (%s, %s, 'benchmark', %s) RETURNING id",
+            [f'http://127.0.0.1:{server.server_address[1]}/', [ORDER_CREATED], batch_size]
+        )
+        return cursor.fetchone()[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--events', type=int, default=1000)
+    parser.add_argument('--batch-size', type=int, default=50, help='max_batch_size of both subscriptions')
+    parser.add_argument('--slow-delay', type=float, default=2.0, help='Seconds the slow receiver takes to answer')
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    fast, slow = start_receiver(0), start_receiver(args.slow_delay)
+    ids = [subscribe(fast, args.batch_size), subscribe(slow, args.batch_size)]
+    dispatcher = Dispatcher(args.workers)
+    runner = threading.Thread(target=dispatcher.run, kwargs={'poll_interval': 0.05})
+    try:
+        started = time.perf_counter()
+        for number in range(args.events):
+            publish(ORDER_CREATED, {'number': number})
+        enqueued = time.perf_counter() - started
+        print(f"queued {args.events} events: {enqueued / args.events * 1000:.2f} ms per event")
+
+        started = time.perf_counter()
+        runner.start()
+        while fast.events < args.events and time.perf_counter() - started < 120:
+            time.sleep(0.01)
+        elapsed = time.perf_counter() - started
+        print(
+            f"fast subscriber: {fast.events} events in {fast.requests} requests, {elapsed:.2f} s; "
+            f"slow subscriber meanwhile: {slow.events} events in {slow.requests} requests"
+        )
+    finally:
+        dispatcher.stop()
+        if runner.is_alive():
+            runner.join()
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM webhook_subscriptions WHERE id = ANY(%s)", [ids])
+        fast.shutdown()
+        slow.shutdown()
+
+
+if __name__ == '__main__':
+    main()
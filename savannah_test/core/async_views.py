@@ -0,0 +1,103 @@
+"""
+Base class for the async (ASGI) variants of the raw-SQL endpoints
+"""
+from io import BytesIO
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.http import HttpResponse
+from django.views import View
+from rest_framework import exceptions, permissions, status
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from core.parsers import MessagePackParser, ORJSONParser
+from core.renderers import MessagePackRenderer, ORJSONRenderer
+
+
+class AsyncAPIView(View):
+    """
+    Async counterpart of the DRF APIView used by the sync endpoints.
+
+    DRF itself is synchronous, so the configured authentication and
+    permission classes run in a worker thread; the handlers are
+    ``async def`` methods that query through core.db.aio and return
+    ``self.respond(...)``, which renders exactly like the sync views.
+    """
+    authentication_classes = api_settings.DEFAULT_AUTHENTICATION_CLASSES
+    permission_classes = [permissions.IsAuthenticated]
+    renderer = ORJSONRenderer()
+    parser = ORJSONParser()
+    msgpack_renderer = MessagePackRenderer()
+    msgpack_parser = MessagePackParser()
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        # Same as DRF: session authentication enforces CSRF itself.
+        view.csrf_exempt = True
+        return view
+
+    async def dispatch(self, request, *args, **kwargs):
+        # Run on the shared executor rather than a thread per request, so
+        # authentication can't open more DB connections than it has threads.
+        denied = await sync_to_async(self.check_access, thread_sensitive=False)(request)
+        if denied is not None:
+            return denied
+        try:
+            return await super().dispatch(request, *args, **kwargs)
+        except exceptions.APIException as e:
+            return self.respond({"detail": e.detail}, status=e.status_code)
+
+    def check_access(self, request):
+        """Authenticate and check permissions; returns an error response or None"""
+        try:
+            return self._check_access(request)
+        finally:
+            close_old_connections()
+
+    def _check_access(self, request):
+        drf_request = Request(request, authenticators=[auth() for auth in self.authentication_classes])
+        try:
+            for permission in [permission() for permission in self.permission_classes]:
+                if not permission.has_permission(drf_request, self):
+                    if drf_request.authenticators and not drf_request.successful_authenticator:
+                        raise exceptions.NotAuthenticated()
+                    raise exceptions.PermissionDenied()
+        except exceptions.APIException as e:
+            response = self.respond({"detail": e.detail}, status=e.status_code)
+            if isinstance(e, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+                authenticators = drf_request.authenticators
+                header = authenticators[0].authenticate_header(drf_request) if authenticators else None
+                if header:
+                    response['WWW-Authenticate'] = header
+                else:
+                    response.status_code = status.HTTP_403_FORBIDDEN
+            return response
+        request.user = drf_request.user
+        return None
+
+    def parse_body(self, request):
+        """Request data as a dict: JSON or MessagePack bodies, or form data for POST"""
+        if request.content_type == 'application/json':
+            return self.parser.parse(BytesIO(request.body or b'{}'))
+        if request.content_type == self.msgpack_parser.media_type:
+            return self.msgpack_parser.parse(BytesIO(request.body or b'\x80'))
+        return request.POST
+
+    def get_renderer(self):
+        """MessagePack for clients that accept it, JSON otherwise"""
+        request = getattr(self, 'request', None)
+        if request is not None and self.msgpack_renderer.media_type in request.headers.get('Accept', ''):
+            return self.msgpack_renderer
+        return self.renderer
+
+    def respond(self, data=None, status=status.HTTP_200_OK):
+        if data is None:
+            return HttpResponse(status=status)
+        renderer = self.get_renderer()
+        return HttpResponse(
+            renderer.render(data),
+            status=status,
+            content_type=renderer.media_type,
+        )
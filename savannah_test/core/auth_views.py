@@ -4,15 +4,14 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from django.contrib.auth.models import User
-from oauth2_provider.models import Application, AccessToken
-from oauth2_provider import models as oauth2_models
-from django.http import JsonResponse
-from django.shortcuts import render
 from django.http import HttpResponse
-import secrets
-from datetime import datetime, timedelta
+from datetime import timedelta
 from django.utils import timezone
 
+# oauth2_provider's models (and its validators), secrets and the template
+# loader are imported inside the views that use them: this module is loaded
+# with the URLconf on every boot, but these views are rarely called.
+
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
@@ -41,6 +40,9 @@ def get_test_token(request):
             status=status.HTTP_401_UNAUTHORIZED
         )
     
+    import secrets
+    from oauth2_provider.models import AccessToken, Application
+
     try:
         # Get or create OAuth2 application
         application = Application.objects.get(name="Savannah OIDC")
@@ -100,6 +102,8 @@ def oidc_login_page(request):
     OIDC login page
     GET /api/auth/login/
     """
+    from django.shortcuts import render
+
     return render(request, 'oidc_login.html')
 
 
@@ -110,6 +114,8 @@ def create_user_page(request):
     User registration page
     GET /api/auth/register/
     """
+    from django.shortcuts import render
+
     return render(request, 'create_user.html')
 
 
@@ -120,6 +126,8 @@ def setup_oidc_application(request):
     Create OAuth2 application for OIDC
     POST /api/auth/setup-oidc/
     """
+    from oauth2_provider.models import Application
+
     try:
         application, created = Application.objects.get_or_create(
             name="Savannah OIDC",
@@ -0,0 +1,33 @@
+"""
+DRF authentication classes for the API-only entrypoints
+"""
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+
+
+class LazyOIDCAuthentication(BaseAuthentication):
+    """
+    mozilla_django_oidc's DRF authentication, imported when the first bearer
+    token arrives.
+
+    Importing it pulls in the OIDC backend, josepy and requests. Cold starts
+    and requests without a token (which it would ignore anyway) skip that.
+    """
+    # Same realm as mozilla_django_oidc's OIDCAuthentication
+    www_authenticate_realm = 'api'
+    _authentication_class = None
+
+    @classmethod
+    def _load(cls):
+        if cls._authentication_class is None:
+            from mozilla_django_oidc.contrib.drf import OIDCAuthentication
+            cls._authentication_class = OIDCAuthentication
+        return cls._authentication_class
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != b'bearer':
+            return None
+        return self._load()().authenticate(request)
+
+    def authenticate_header(self, request):
+        return f'Bearer realm="{self.www_authenticate_realm}"'
@@ -0,0 +1,55 @@
+"""
+Helpers for the batch endpoints (POST and PUT /api/customers/bulk/ and
+POST /api/orders/bulk/). Their body is a JSON array read with
+core.parsers.JSONArrayStreamParser, and it is written BULK_CHUNK_SIZE
+elements at a time, one statement per chunk, while the rest of the body
+is still being received. Chunks are committed as they go, so a body that
+turns out malformed halfway keeps the chunks before the error.
+"""
+from itertools import islice
+
+from django.conf import settings
+
+
+def chunks(elements, size=None):
+    """(index of the first element, list of elements) for each chunk of ``elements``"""
+    size = size or settings.BULK_CHUNK_SIZE
+    iterator = iter(elements)
+    start = 0
+    while chunk := list(islice(iterator, size)):
+        yield start, chunk
+        start += len(chunk)
+
+
+class BulkResult:
+    """
+    Response body of a batch request: a count per outcome, and the first
+    BULK_MAX_ERRORS elements that failed, by their index in the array.
+    With ``results`` it also lists the outcome of every element recorded,
+    which grows with the body.
+    """
+
+    def __init__(self, *outcomes, results=False):
+        self.counts = dict.fromkeys(outcomes, 0)
+        self.error_count = 0
+        self.errors = []
+        self.results = [] if results else None
+
+    def add(self, outcome, count=1):
+        self.counts[outcome] += count
+
+    def record(self, index, outcome, **fields):
+        self.counts[outcome] += 1
+        if self.results is not None:
+            self.results.append({'index': index, 'status': outcome, **fields})
+
+    def error(self, index, message):
+        self.error_count += 1
+        if len(self.errors) < settings.BULK_MAX_ERRORS:
+            self.errors.append({'index': index, 'error': message})
+
+    def body(self):
+        body = {**self.counts, 'error_count': self.error_count, 'errors': self.errors}
+        if self.results is not None:
+            body['results'] = self.results
+        return body
@@ -0,0 +1,193 @@
+"""
+Incremental sync: GET /api/customers/changes/ and /api/orders/changes/.
+
+Clients page through the rows changed since their last sync ordered by
+(updated_at, id), together with the tombstones that the
+record_tombstones triggers (database/*.sql) write for every delete,
+cascades included. Each page ends at a cursor that the next request
+resumes after. Both sides are range scans of a (time, id) index that stop
+after one page, so a sync costs the number of changes, not the table size.
+
+updated_at (and deleted_at) is the writing transaction's start time and
+becomes visible only at commit. Without care a cursor could move past a
+row that commits later with an older timestamp, e.g. an import chunk or a
+group commit that took longer than expected. So a page only goes up to
+the start of the oldest transaction still open on the database (from
+pg_stat_activity, see SYNC_HORIZON): whatever it writes can't be older
+than that. A long transaction, even a read-only one, delays sync until it
+ends but no row is skipped. Rows from the last SYNC_SETTLE_SECONDS are
+held back too, for the gap between a statement and its commit becoming
+visible. With shards the lowest horizon of all of them applies, since
+their pages are merged under one cursor.
+
+pg_stat_activity only shows the transactions of the server it is read
+on, so changes are always read from the primary (or each shard), never a
+replica. It also hides the xact_start of other roles' sessions unless the
+API's role has pg_read_all_stats, so every writer should connect as the
+API's role, or it should be granted that.
+"""
+import base64
+import heapq
+import uuid
+from datetime import datetime, timedelta, timezone as dt_timezone
+from operator import itemgetter
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core.db.routing import PRIMARY_ALIAS
+from core.db.sharding import query_shards, sharding_enabled
+from core.db.statements import register
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+NIL_ID = uuid.UUID(int=0)
+
+_position = itemgetter('changed_at', 'id')
+
+
+# The newest changed_at a page may include: SYNC_SETTLE_SECONDS ago, or
+# just before the start of the oldest transaction open in this database
+# (other than ours) if that is earlier. Only client backends: autovacuum
+# doesn't write rows.
+SYNC_HORIZON = register('sync_horizon', """
+    SELECT least(now() - make_interval(secs => %s), min(xact_start) - interval '1 microsecond') AS horizon
+    FROM pg_stat_activity
+    WHERE datname = current_database()
+      AND backend_type = 'client backend'
+      AND pid <> pg_backend_pid()
+""")
+
+
+def changes_sql(table, entity, columns):
+    """
+    SELECT of one page of changes to ``table`` after a (changed_at, id)
+    position, up to a horizon from SYNC_HORIZON. Parameters: changed_at,
+    id, horizon and page size, once for the rows and once for the
+    tombstones, then the page size.
+    """
+    column_list = ', '.join(columns)
+    nulls = ', '.join(f'NULL AS {column}' for column in columns)
+    return f"""
+        SELECT * FROM (
+            (SELECT id, updated_at AS changed_at, false AS deleted, {column_list}
+             FROM {table}
+             WHERE (updated_at, id) > (%s, %s)
+               AND updated_at <= %s
+             ORDER BY updated_at, id
+             LIMIT %s)
+            UNION ALL
+            (SELECT id, deleted_at, true, {nulls}
+             FROM tombstones
+             WHERE entity = '{entity}'
+               AND (deleted_at, id) > (%s, %s)
+               AND deleted_at <= %s
+             ORDER BY deleted_at, id
+             LIMIT %s)
+        ) changes
+        ORDER BY changed_at, id
+        LIMIT %s
+    """
+
+
+def encode_cursor(changed_at, row_id):
+    return base64.urlsafe_b64encode(f'{changed_at.isoformat()}|{row_id}'.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """(changed_at, id) of a cursor; raises ValueError for anything else"""
+    try:
+        changed_at, _, row_id = base64.urlsafe_b64decode(cursor.encode()).decode().partition('|')
+        position = datetime.fromisoformat(changed_at), uuid.UUID(row_id)
+    except (ValueError, UnicodeError):
+        raise ValueError("Invalid cursor")
+    if position[0].tzinfo is None:
+        raise ValueError("Invalid cursor")
+    return position
+
+
+def requested_position(request):
+    """
+    The (changed_at, id) to resume after: from ?cursor=, or just before
+    ?updated_since= (an ISO 8601 timestamp), or the start for a full sync.
+    Raises ValueError for a malformed value.
+    """
+    cursor = request.query_params.get('cursor')
+    since = request.query_params.get('updated_since')
+    if cursor is not None and since is not None:
+        raise ValueError("Use either cursor or updated_since, not both")
+    if cursor is not None:
+        return decode_cursor(cursor)
+    if since is None:
+        return EPOCH, NIL_ID
+    try:
+        changed_at = parse_datetime(since)
+    except ValueError:
+        changed_at = None
+    if changed_at is None:
+        raise ValueError("updated_since must be an ISO 8601 timestamp")
+    if timezone.is_naive(changed_at):
+        changed_at = timezone.make_aware(changed_at, dt_timezone.utc)
+    return changed_at, NIL_ID
+
+
+def requested_limit(request):
+    """?limit= page size, SYNC_PAGE_SIZE by default; raises ValueError out of range"""
+    limit = request.query_params.get('limit')
+    if limit is None:
+        return settings.SYNC_PAGE_SIZE
+    try:
+        limit = int(limit)
+    except ValueError:
+        limit = 0
+    if not 1 <= limit <= settings.SYNC_MAX_PAGE_SIZE:
+        raise ValueError(f"limit must be between 1 and {settings.SYNC_MAX_PAGE_SIZE}")
+    return limit
+
+
+def expired(position):
+    """
+    Whether tombstones after ``position`` may already have been purged
+    (see the purge_tombstones command), so the client must sync from scratch
+    """
+    retention = timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS)
+    return position[0] != EPOCH and position[0] < timezone.now() - retention
+
+
+def fetch_changes(statement, position, limit):
+    """One page of changes after ``position``, oldest first, read from the primary"""
+    if sharding_enabled():
+        horizons = query_shards(SYNC_HORIZON, [settings.SYNC_SETTLE_SECONDS])
+        horizon = min(rows[0]['horizon'] for _, rows in horizons)
+        params = [*position, horizon, limit] * 2 + [limit]
+        results = [rows for _, rows in query_shards(statement, params)]
+        return list(heapq.merge(*results, key=_position))[:limit]
+
+    with connections[PRIMARY_ALIAS].cursor() as cursor:
+        horizon = SYNC_HORIZON.fetchvalue(cursor, [settings.SYNC_SETTLE_SECONDS])
+        params = [*position, horizon, limit] * 2 + [limit]
+        return statement.fetchall(cursor, params)
+
+
+def changes_page(rows, key, position, limit):
+    """
+    Response body for a page: the rows under ``key`` and the ids under
+    ``deleted``, each id in only one of them (whichever happened last),
+    plus the cursor for the next page and whether there may be more.
+    """
+    latest = {}
+    for row in rows:
+        latest.pop(row['id'], None)
+        latest[row['id']] = row
+    if rows:
+        position = _position(rows[-1])
+    return {
+        key: [
+            {column: value for column, value in row.items() if column not in ('changed_at', 'deleted')}
+            for row in latest.values() if not row['deleted']
+        ],
+        'deleted': [str(row['id']) for row in latest.values() if row['deleted']],
+        'next_cursor': encode_cursor(*position),
+        'has_more': len(rows) == limit,
+    }
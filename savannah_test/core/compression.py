@@ -0,0 +1,251 @@
+"""
+Response compression for core.middleware.CompressionMiddleware:
+Accept-Encoding negotiation, the compression level for each response and
+incremental gzip/brotli encoders that count bytes saved and CPU spent.
+
+brotli is optional; without it only gzip is offered.
+"""
+import os
+import threading
+import time
+import zlib
+from functools import lru_cache
+
+from django.conf import settings
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional
+    brotli = None
+
+# Levels per tier, fastest first. Measured on order lists, brotli 4 is
+# about as fast as gzip 4 with 40% smaller output; above that both get
+# much slower for little gain.
+GZIP_LEVELS = (1, 4, 6)
+BROTLI_QUALITIES = (1, 4, 5)
+
+# Bodies up to SMALL_BODY get the best tier, up to LARGE_BODY the middle
+# one, anything bigger the fastest. Streams, of unknown size, get the middle one.
+SMALL_BODY = 256 * 1024
+LARGE_BODY = 4 * 1024 * 1024
+
+# Server preference when the client accepts several equally
+PREFERRED_ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+# Only the API's own media types. HTML pages (admin, the browsable API)
+# carry CSRF tokens, and compressing them would open them to BREACH.
+COMPRESSIBLE_TYPES = frozenset(('application/json', 'application/msgpack', 'text/csv', 'application/x-ndjson'))
+
+_load_lock = threading.Lock()
+_load = {'checked_at': float('-inf'), 'value': 0.0}
+
+
+def compressible(content_type):
+    """JSON (including +json types), MessagePack and CSV; not event streams, which must not buffer"""
+    media_type = content_type.split(';')[0].strip().lower()
+    return media_type in COMPRESSIBLE_TYPES or media_type.endswith('+json')
+
+
+@lru_cache(maxsize=128)
+def negotiate(accept_encoding):
+    """
+    The content coding to use for an Accept-Encoding header, or None to
+    send the body as is. Honours q-values (q=0 refuses) and "*".
+    """
+    weights = {}
+    for part in accept_encoding.lower().split(','):
+        coding, _, params = part.partition(';')
+        coding = coding.strip()
+        if not coding:
+            continue
+        weight = 1.0
+        for param in params.split(';'):
+            name, _, value = param.partition('=')
+            if name.strip() == 'q':
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[coding] = weight
+
+    best, best_weight = None, 0.0
+    for coding in PREFERRED_ENCODINGS:
+        weight = weights.get(coding, weights.get('*', 0.0))
+        if weight > best_weight:
+            best, best_weight = coding, weight
+    return best
+
+
+def cpu_load():
+    """1-minute load average per CPU, re-read at most once a second"""
+    now = time.monotonic()
+    with _load_lock:
+        if now - _load['checked_at'] >= 1:
+            try:
+                _load['value'] = os.getloadavg()[0] / (os.cpu_count() or 1)
+            except (AttributeError, OSError):
+                _load['value'] = 0.0
+            _load['checked_at'] = now
+        return _load['value']
+
+
+def compression_tier(size):
+    """
+    0 (fastest) to 2 (smallest output) for a body of ``size`` bytes, or
+    None for a stream. Above COMPRESSION_BUSY_LOAD always the fastest.
+    """
+    if cpu_load() >= settings.COMPRESSION_BUSY_LOAD:
+        return 0
+    if size is None:
+        return 1
+    if size <= SMALL_BODY:
+        return 2
+    if size <= LARGE_BODY:
+        return 1
+    return 0
+
+
+class Encoder:
+    """Incremental compressor that records its bytes and CPU time"""
+    encoding = None
+
+    def __init__(self, tier):
+        self.tier = tier
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.cpu_time = 0.0
+
+    def compress(self, data):
+        started = time.thread_time()
+        out = self._compress(data)
+        self.cpu_time += time.thread_time() - started
+        self.bytes_in += len(data)
+        self.bytes_out += len(out)
+        return out
+
+    def flush(self):
+        """Everything compressed so far, at a small cost in ratio"""
+        started = time.thread_time()
+        out = self._flush()
+        self.cpu_time += time.thread_time() - started
+        self.bytes_out += len(out)
+        return out
+
+    def finish(self):
+        started = time.thread_time()
+        out = self._finish()
+        self.cpu_time += time.thread_time() - started
+        self.bytes_out += len(out)
+        compression_stats.record(self)
+        return out
+
+
+class GzipEncoder(Encoder):
+    encoding = 'gzip'
+
+    def __init__(self, tier):
+        super().__init__(tier)
+        self._compressor = zlib.compressobj(GZIP_LEVELS[tier], zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def _compress(self, data):
+        return self._compressor.compress(data)
+
+    def _flush(self):
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def _finish(self):
+        return self._compressor.flush()
+
+
+class BrotliEncoder(Encoder):
+    encoding = 'br'
+
+    def __init__(self, tier):
+        super().__init__(tier)
+        self._compressor = brotli.Compressor(mode=brotli.MODE_TEXT, quality=BROTLI_QUALITIES[tier])
+
+    def _compress(self, data):
+        return self._compressor.process(data)
+
+    def _flush(self):
+        return self._compressor.flush()
+
+    def _finish(self):
+        return self._compressor.finish()
+
+
+ENCODERS = {'gzip': GzipEncoder, 'br': BrotliEncoder}
+
+
+def compress_stream(chunks, encoder, buffer_size):
+    """
+    Compress an iterable of byte chunks. Output is yielded once
+    ``buffer_size`` bytes of input went in since the last yield, flushing
+    the encoder if it held on to them, so memory stays bounded however
+    long the stream is.
+    """
+    buffered = 0
+    for chunk in chunks:
+        out = encoder.compress(chunk)
+        buffered += len(chunk)
+        if buffered >= buffer_size:
+            yield out + encoder.flush()
+            buffered = 0
+        elif out:
+            yield out
+    yield encoder.finish()
+
+
+async def acompress_stream(chunks, encoder, buffer_size):
+    """compress_stream() for async iterables"""
+    buffered = 0
+    async for chunk in chunks:
+        out = encoder.compress(chunk)
+        buffered += len(chunk)
+        if buffered >= buffer_size:
+            yield out + encoder.flush()
+            buffered = 0
+        elif out:
+            yield out
+    yield encoder.finish()
+
+
+class CompressionStats:
+    """Per-process totals of compressed responses, by encoding and tier"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals = {}
+
+    def record(self, encoder):
+        key = (encoder.encoding, encoder.tier)
+        with self._lock:
+            totals = self._totals.setdefault(key, [0, 0, 0, 0.0])
+            totals[0] += 1
+            totals[1] += encoder.bytes_in
+            totals[2] += encoder.bytes_out
+            totals[3] += encoder.cpu_time
+
+    def stats(self):
+        with self._lock:
+            items = sorted((key, list(totals)) for key, totals in self._totals.items())
+        result = {}
+        for (encoding, tier), (responses, bytes_in, bytes_out, cpu_time) in items:
+            saved = bytes_in - bytes_out
+            result[f'{encoding}:{tier}'] = {
+                'responses': responses,
+                'bytes_in': bytes_in,
+                'bytes_out': bytes_out,
+                'bytes_saved': saved,
+                'ratio': round(bytes_out / bytes_in, 3) if bytes_in else 0.0,
+                'cpu_ms': round(cpu_time * 1000, 3),
+                'kb_saved_per_cpu_ms': round(saved / 1024 / (cpu_time * 1000), 1) if cpu_time else 0.0,
+            }
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._totals.clear()
+
+
+compression_stats = CompressionStats()
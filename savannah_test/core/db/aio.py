@@ -0,0 +1,160 @@
+"""
+asyncpg connection pools for the async customer and order views.
+
+Every database alias gets one pool per event loop, sized from the same
+DATABASES[alias]['POOL'] options as the sync pool (MIN_SIZE, MAX_SIZE,
+MAX_IDLE, TIMEOUT). Under an ASGI server the number of requests in flight is
+then bounded by database connections rather than by worker processes.
+
+Queries are the Statements from core.db.statements; asyncpg prepares them
+once per connection and caches the plan itself. asyncpg is imported when the
+first pool is opened, so WSGI workers that never serve an async view don't
+load it.
+"""
+import asyncio
+import heapq
+import time
+import weakref
+from contextlib import asynccontextmanager
+
+from asgiref.sync import sync_to_async
+from django.db import connections
+
+from core.db.pool import DEFAULT_POOL_OPTIONS
+from core.db.routing import PRIMARY_ALIAS, db_alias_for, read_replicas
+from core.db.sharding import shard_aliases
+from core.db.statements import prepared_statements_enabled
+
+# event loop -> {alias: task that opens the asyncpg pool}
+_pools = weakref.WeakKeyDictionary()
+
+
+def connect_kwargs(alias):
+    """asyncpg.connect() arguments for a Django database alias"""
+    settings_dict = connections[alias].settings_dict
+    return {
+        'host': settings_dict.get('HOST') or None,
+        'port': int(settings_dict['PORT']) if settings_dict.get('PORT') else None,
+        'user': settings_dict.get('USER') or None,
+        'password': settings_dict.get('PASSWORD') or None,
+        'database': settings_dict.get('NAME'),
+    }
+
+
+def pool_kwargs(alias):
+    """asyncpg.create_pool() sizing for a Django database alias"""
+    options = {**DEFAULT_POOL_OPTIONS, **(connections[alias].settings_dict.get('POOL') or {})}
+    return {
+        'min_size': options['MIN_SIZE'],
+        'max_size': options['MAX_SIZE'],
+        'max_inactive_connection_lifetime': options['MAX_IDLE'],
+        # Behind a transaction-pooling proxy the statement cache must be off.
+        'statement_cache_size': 100 if prepared_statements_enabled() else 0,
+    }
+
+
+def pool_timeout(alias):
+    """Seconds to wait for a free connection before giving up"""
+    options = connections[alias].settings_dict.get('POOL') or {}
+    return options.get('TIMEOUT', DEFAULT_POOL_OPTIONS['TIMEOUT'])
+
+
+async def _open_pool(alias):
+    import asyncpg
+
+    return await asyncpg.create_pool(**connect_kwargs(alias), **pool_kwargs(alias))
+
+
+async def get_pool(alias=PRIMARY_ALIAS):
+    """The asyncpg pool for ``alias`` on the running event loop"""
+    loop = asyncio.get_running_loop()
+    pools = _pools.setdefault(loop, {})
+    # Keep the opening task, not the pool, so concurrent first requests
+    # all wait for the same pool instead of each opening one.
+    task = pools.get(alias)
+    if task is None:
+        task = pools[alias] = loop.create_task(_open_pool(alias))
+    try:
+        return await asyncio.shield(task)
+    except Exception:
+        if pools.get(alias) is task:
+            del pools[alias]
+        raise
+
+
+async def close_pools():
+    """Close every pool opened on the running event loop"""
+    tasks = _pools.pop(asyncio.get_running_loop(), {}).values()
+    pools = await asyncio.gather(*tasks, return_exceptions=True)
+    await asyncio.gather(*(pool.close() for pool in pools if not isinstance(pool, Exception)))
+
+
+async def alias_for(request):
+    """db_alias_for() without blocking the event loop on a replica lag check"""
+    if not read_replicas():
+        return db_alias_for(request)
+    return await sync_to_async(db_alias_for)(request)
+
+
+@asynccontextmanager
+async def _acquire(alias, connection):
+    if connection is not None:
+        yield connection
+        return
+    pool = await get_pool(alias)
+    async with pool.acquire(timeout=pool_timeout(alias)) as connection:
+        yield connection
+
+
+@asynccontextmanager
+async def transaction(alias=PRIMARY_ALIAS):
+    """
+    A connection from ``alias``'s pool in a transaction that commits when
+    the block exits normally, for the ``connection`` argument of fetch()
+    and fetchrow()
+    """
+    async with _acquire(alias, None) as connection:
+        async with connection.transaction():
+            yield connection
+
+
+async def fetch(statement, params=None, alias=PRIMARY_ALIAS, connection=None):
+    """Run a Statement and return every row as a dict"""
+    started = time.perf_counter()
+    async with _acquire(alias, connection) as connection:
+        records = await connection.fetch(statement.positional_sql, *(params or []))
+    rows = [dict(record) for record in records]
+    statement.record(time.perf_counter() - started, len(rows))
+    return rows
+
+
+async def fetchrow(statement, params=None, alias=PRIMARY_ALIAS, connection=None):
+    """Run a Statement and return the first row as a dict, or None"""
+    started = time.perf_counter()
+    async with _acquire(alias, connection) as connection:
+        record = await connection.fetchrow(statement.positional_sql, *(params or []))
+    statement.record(time.perf_counter() - started, 0 if record is None else 1)
+    return None if record is None else dict(record)
+
+
+async def query_shards(statement, params=None):
+    """Run a Statement on every shard concurrently; returns [(alias, rows), ...]"""
+    aliases = shard_aliases()
+    results = await asyncio.gather(*(fetch(statement, params, alias) for alias in aliases))
+    return list(zip(aliases, results))
+
+
+async def fetch_from_shards(statement, params=None, order_by=None, descending=False):
+    """Async counterpart of core.db.sharding.fetch_from_shards"""
+    results = [rows for _, rows in await query_shards(statement, params)]
+    if order_by is None:
+        return [row for rows in results for row in rows]
+    return list(heapq.merge(*results, key=lambda row: row[order_by], reverse=descending))
+
+
+async def locate(statement, params=None):
+    """Async counterpart of core.db.sharding.locate"""
+    for alias, rows in await query_shards(statement, params):
+        if rows:
+            return alias, rows[0]
+    return None, None
@@ -0,0 +1,59 @@
+"""
+PostgreSQL backend that borrows connections from a process-wide pool.
+
+Django still "closes" its connection at the end of every request
+(CONN_MAX_AGE = 0); with this backend that returns the connection to the
+pool instead of tearing down the session, so the raw-SQL views no longer pay
+for a TCP handshake and authentication per request. Pool sizing lives in
+DATABASES[alias]['POOL'], see core.db.pool.DEFAULT_POOL_OPTIONS.
+"""
+import psycopg2
+import psycopg2.extras
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.postgresql import base as postgresql_base
+from django.db.backends.postgresql.psycopg_any import IsolationLevel, is_psycopg3
+
+from core.db.pool import get_pool
+
+if is_psycopg3:
+    raise ImproperlyConfigured('core.db.backends.postgresql_pool requires psycopg2')
+
+
+def _connect(conn_params, isolation_level):
+    connection = psycopg2.connect(**conn_params)
+    if isolation_level is not None:
+        connection.isolation_level = isolation_level
+    # Same JSONB handling as Django's own psycopg2 connections.
+    psycopg2.extras.register_default_jsonb(conn_or_curs=connection, loads=lambda x: x)
+    return connection
+
+
+class DatabaseWrapper(postgresql_base.DatabaseWrapper):
+    def get_new_connection(self, conn_params):
+        isolation_level_value = self.settings_dict['OPTIONS'].get('isolation_level')
+        if isolation_level_value is None:
+            self.isolation_level = IsolationLevel.READ_COMMITTED
+            isolation_level = None
+        else:
+            try:
+                self.isolation_level = isolation_level = IsolationLevel(isolation_level_value)
+            except ValueError:
+                raise ImproperlyConfigured(
+                    f"Invalid transaction isolation level {isolation_level_value} "
+                    f"specified. Use one of the psycopg.IsolationLevel values."
+                )
+
+        # Key on the connection parameters too, so a wrapper whose NAME is
+        # switched (e.g. to the test database) never reuses the old sessions.
+        key = (self.alias,) + tuple(sorted((k, repr(v)) for k, v in conn_params.items()))
+        self.pool = get_pool(
+            key,
+            lambda: _connect(conn_params, isolation_level),
+            self.settings_dict.get('POOL'),
+        )
+        return self.pool.getconn()
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                return self.pool.putconn(self.connection)
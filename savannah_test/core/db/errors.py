@@ -0,0 +1,20 @@
+"""
+Helpers for telling PostgreSQL constraint violations apart once Django has
+wrapped them in django.db.IntegrityError, or as raised by asyncpg.
+"""
+from psycopg2 import errorcodes
+
+
+def pgcode(error):
+    """SQLSTATE of the driver error behind a Django database exception"""
+    return (getattr(error.__cause__, 'pgcode', None)
+            or getattr(error, 'pgcode', None)
+            or getattr(error, 'sqlstate', None))
+
+
+def is_unique_violation(error):
+    return pgcode(error) == errorcodes.UNIQUE_VIOLATION
+
+
+def is_foreign_key_violation(error):
+    return pgcode(error) == errorcodes.FOREIGN_KEY_VIOLATION
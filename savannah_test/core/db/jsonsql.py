@@ -0,0 +1,80 @@
+"""
+Response bodies built by PostgreSQL instead of Python (DB_JSON_RESPONSES).
+
+json_array() and json_object() wrap a SELECT so that it returns a single
+text value: the JSON the API renders for those rows. The view sends that
+text as it is, so no Python object is created per row or per column.
+
+For the body to match ORJSONRenderer/JSONRenderer byte for byte, the
+SELECT list has to format values the way DRF does: timestamps through
+utc_timestamp() and NUMERIC columns through json_float() (DRF renders
+Decimal as a float). UUIDs, text, integers and NULLs already match.
+"""
+from django.conf import settings
+from django.http import HttpResponse
+
+from core.db.sharding import sharding_enabled
+
+
+def utc_timestamp(column):
+    """
+    SQL rendering a timestamptz like datetime.isoformat() in UTC with the
+    "Z" suffix DRF uses; microseconds are left out when they are zero.
+    """
+    return (
+        f"replace(to_char({column} AT TIME ZONE 'UTC', 'YYYY-MM-DD\"T\"HH24:MI:SS.US'), '.000000', '')"
+        " || 'Z'"
+    )
+
+
+def json_float(column):
+    """
+    SQL rendering a NUMERIC column like json.dumps(float(value)): float8's
+    shortest round-trip digits, plus ".0" on whole numbers ("100.0", not
+    "100"). Typed json so row_to_json embeds it as a number.
+    """
+    return (
+        f"(CASE WHEN {column} = trunc({column}) THEN trunc({column})::text || '.0'"
+        f" ELSE {column}::float8::text END)::json"
+    )
+
+
+def json_array(select_sql):
+    """SELECT returning the rows of ``select_sql``, in order, as one compact JSON array"""
+    # string_agg rather than json_agg, which puts ", \n " between elements.
+    return f"""
+    SELECT coalesce('[' || string_agg(row_to_json(r)::text, ',') || ']', '[]')
+    FROM ({select_sql}) r
+"""
+
+
+def json_object(select_sql):
+    """SELECT returning the first row of ``select_sql`` as a JSON object, or no row"""
+    return f"""
+    SELECT row_to_json(r)::text
+    FROM ({select_sql}) r
+"""
+
+
+def db_json_enabled(request):
+    """
+    Whether to answer ``request`` with a body built by the database: the
+    setting is on, the client negotiated JSON (not the browsable API) and
+    the rows live in one database rather than across shards.
+    """
+    if not getattr(settings, 'DB_JSON_RESPONSES', False) or sharding_enabled():
+        return False
+    renderer = getattr(request, 'accepted_renderer', None)
+    return renderer is not None and renderer.format == 'json'
+
+
+class DBJSONResponse(HttpResponse):
+    """A response whose body is JSON text that came from the database"""
+
+    def __init__(self, json_text, status=200, **kwargs):
+        content = json_text.encode()
+        # Same as DRF's JSONRenderer: escape the line separators that are
+        # valid JSON but not valid JavaScript.
+        if b'\xe2\x80\xa8' in content or b'\xe2\x80\xa9' in content:
+            content = content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        super().__init__(content, status=status, content_type='application/json', **kwargs)
@@ -0,0 +1,293 @@
+"""
+Process-wide PostgreSQL connection pool used by the pooled database backend
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# psycopg2 transaction status codes (psycopg2.extensions.TRANSACTION_STATUS_*)
+TRANSACTION_STATUS_IDLE = 0
+TRANSACTION_STATUS_UNKNOWN = 4
+
+DEFAULT_POOL_OPTIONS = {
+    'MIN_SIZE': 1,
+    'MAX_SIZE': 10,
+    'MAX_LIFETIME': 30 * 60,
+    'MAX_IDLE': 5 * 60,
+    'TIMEOUT': 30,
+    'HEALTH_CHECK_AFTER': 10,
+}
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection became available within the pool timeout"""
+
+
+class _PooledConnection:
+    __slots__ = ('connection', 'created_at', 'last_used')
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of raw DB-API connections.
+
+    Connections are handed out most-recently-used first so that a small
+    working set stays warm, and are checked before reuse: anything past
+    MAX_LIFETIME is replaced, and anything idle for longer than
+    HEALTH_CHECK_AFTER seconds must answer ``SELECT 1`` first.
+    """
+
+    def __init__(self, connect, min_size=1, max_size=10, max_lifetime=1800,
+                 max_idle=300, timeout=30, health_check_after=10):
+        if max_size < 1 or min_size < 0 or min_size > max_size:
+            raise ValueError('Pool sizes must satisfy 0 <= MIN_SIZE <= MAX_SIZE, MAX_SIZE >= 1')
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_lifetime = max_lifetime
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self.health_check_after = health_check_after
+
+        self._cond = threading.Condition()
+        self._idle = deque()
+        self._records = {}
+        self._size = 0
+        self._stats = {
+            'checkouts': 0,
+            'wait_time_total': 0.0,
+            'wait_time_max': 0.0,
+            'timeouts': 0,
+            'connections_created': 0,
+            'connections_discarded': 0,
+        }
+
+    @classmethod
+    def from_options(cls, connect, options):
+        """Build a pool from a DATABASES[...]['POOL'] style dict"""
+        options = {**DEFAULT_POOL_OPTIONS, **(options or {})}
+        return cls(
+            connect,
+            min_size=options['MIN_SIZE'],
+            max_size=options['MAX_SIZE'],
+            max_lifetime=options['MAX_LIFETIME'],
+            max_idle=options['MAX_IDLE'],
+            timeout=options['TIMEOUT'],
+            health_check_after=options['HEALTH_CHECK_AFTER'],
+        )
+
+    def getconn(self):
+        """Check out a connection, waiting up to ``timeout`` seconds for one"""
+        started = time.monotonic()
+        deadline = started + self.timeout
+        while True:
+            record, create = self._reserve(deadline)
+            if create:
+                try:
+                    record = self._create()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+            elif not self._is_healthy(record):
+                self._discard(record)
+                continue
+
+            waited = time.monotonic() - started
+            with self._cond:
+                self._stats['checkouts'] += 1
+                self._stats['wait_time_total'] += waited
+                self._stats['wait_time_max'] = max(self._stats['wait_time_max'], waited)
+            return record.connection
+
+    def putconn(self, connection, discard=False):
+        """Return a connection to the pool, or close it if it can't be reused"""
+        record = self._records.get(connection)
+        if record is None:
+            connection.close()
+            return
+
+        if discard or not self._reset(connection):
+            self._discard(record)
+            return
+
+        now = time.monotonic()
+        record.last_used = now
+        with self._cond:
+            if now - record.created_at >= self.max_lifetime:
+                expired = True
+            else:
+                expired = False
+                self._idle.append(record)
+                self._cond.notify()
+        if expired:
+            self._discard(record)
+
+    def warm(self, on_connect=None):
+        """
+        Open connections until MIN_SIZE are available, calling ``on_connect``
+        with each idle connection (e.g. to prepare statements) before reuse.
+        """
+        checked_out = []
+        try:
+            while len(checked_out) < self.min_size:
+                checked_out.append(self.getconn())
+            if on_connect is not None:
+                for connection in checked_out:
+                    on_connect(connection)
+        finally:
+            for connection in checked_out:
+                self.putconn(connection)
+
+    def close_all(self):
+        """Close every idle connection; checked-out ones close on return"""
+        with self._cond:
+            idle, self._idle = list(self._idle), deque()
+        for record in idle:
+            self._discard(record)
+
+    def stats(self):
+        with self._cond:
+            idle = len(self._idle)
+            return {
+                **self._stats,
+                'size': self._size,
+                'idle': idle,
+                'in_use': self._size - idle,
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+            }
+
+    def _reserve(self, deadline):
+        """Pop an idle record, or reserve a slot for a new connection"""
+        with self._cond:
+            while True:
+                self._reap_idle()
+                if self._idle:
+                    return self._idle.pop(), False
+                if self._size < self.max_size:
+                    self._size += 1
+                    return None, True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    raise PoolTimeout(
+                        f'No database connection available after {self.timeout}s '
+                        f'(pool size {self.max_size})'
+                    )
+                self._cond.wait(remaining)
+
+    def _reap_idle(self):
+        """Drop the least-recently-used idle connections beyond MIN_SIZE"""
+        now = time.monotonic()
+        while (self._idle and self._size > self.min_size
+               and now - self._idle[0].last_used > self.max_idle):
+            record = self._idle.popleft()
+            self._size -= 1
+            self._stats['connections_discarded'] += 1
+            self._records.pop(record.connection, None)
+            self._close_quietly(record.connection)
+
+    def _create(self):
+        connection = self._connect()
+        record = _PooledConnection(connection)
+        with self._cond:
+            self._records[connection] = record
+            self._stats['connections_created'] += 1
+        return record
+
+    def _discard(self, record):
+        with self._cond:
+            if self._records.pop(record.connection, None) is not None:
+                self._size -= 1
+                self._stats['connections_discarded'] += 1
+            self._cond.notify()
+        self._close_quietly(record.connection)
+
+    def _is_healthy(self, record):
+        now = time.monotonic()
+        if record.connection.closed or now - record.created_at >= self.max_lifetime:
+            return False
+        if now - record.last_used < self.health_check_after:
+            return True
+        try:
+            with record.connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            # Without autocommit (e.g. a connection only warmed so far) the
+            # check opened a transaction, which Django can't connect with.
+            if record.connection.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+                record.connection.rollback()
+        except Exception:
+            return False
+        return True
+
+    @staticmethod
+    def _reset(connection):
+        """Leave no open transaction behind for the next borrower"""
+        if connection.closed:
+            return False
+        try:
+            status = connection.get_transaction_status()
+            if status == TRANSACTION_STATUS_UNKNOWN:
+                return False
+            if status != TRANSACTION_STATUS_IDLE:
+                connection.rollback()
+        except Exception:
+            return False
+        return True
+
+    @staticmethod
+    def _close_quietly(connection):
+        try:
+            connection.close()
+        except Exception:
+            logger.debug('Error closing pooled connection', exc_info=True)
+
+
+_pools = {}
+_pools_pid = os.getpid()
+_pools_lock = threading.Lock()
+# Pools inherited from a parent process share its sockets. Closing them
+# would terminate the parent's sessions, so they are only kept referenced.
+_inherited_pools = []
+
+
+def get_pool(key, connect, options):
+    """Return the pool for ``key`` in this process, creating it on first use"""
+    global _pools_pid
+    with _pools_lock:
+        if os.getpid() != _pools_pid:
+            _inherited_pools.append(_pools.copy())
+            _pools.clear()
+            _pools_pid = os.getpid()
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool.from_options(connect, options)
+        return pool
+
+
+def all_pools():
+    with _pools_lock:
+        if os.getpid() != _pools_pid:
+            return {}
+        return dict(_pools)
+
+
+def pool_stats():
+    """Statistics for every pool in this process, keyed by database alias"""
+    return {key[0]: pool.stats() for key, pool in all_pools().items()}
+
+
+def close_all_pools():
+    for pool in all_pools().values():
+        pool.close_all()
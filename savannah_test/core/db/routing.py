@@ -0,0 +1,142 @@
+"""
+Read-replica routing for the raw-SQL views.
+
+Views ask for a connection alias with ``db_alias_for(request)``. Writes and
+unsafe methods always use ``default``. Safe reads go to one of
+``DATABASE_READ_REPLICAS`` unless the replica is lagging by more than
+``REPLICA_MAX_LAG`` seconds, or the client wrote something within the last
+``READ_YOUR_WRITES_WINDOW`` seconds. In that case the read stays on the primary
+so the client always sees its own writes.
+
+Clients are pinned with a cookie for browser sessions and with the
+``X-DB-Pin-Until`` response header for API clients. API clients echo that
+header back on their next requests.
+"""
+import logging
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+PRIMARY_ALIAS = 'default'
+PIN_COOKIE_NAME = 'db_pin_until'
+PIN_HEADER_NAME = 'X-DB-Pin-Until'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+REPLICA_LAG_QUERY = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+_lag_cache = {}
+_lag_lock = threading.Lock()
+
+
+def read_replicas():
+    return list(getattr(settings, 'DATABASE_READ_REPLICAS', []))
+
+
+def db_alias_for(request):
+    """
+    Connection alias a view should use for this request. The choice is kept
+    on the request so every query it makes reads from the same database.
+    """
+    if request is None:
+        return PRIMARY_ALIAS
+    alias = getattr(request, '_db_alias', None)
+    if alias is None:
+        alias = request._db_alias = _choose_alias(request)
+    return alias
+
+
+def is_read(request):
+    """Safe methods, and POSTs that only read (see mark_read_only)"""
+    return request.method in SAFE_METHODS or getattr(request, 'db_read_only', False)
+
+
+def mark_read_only(request):
+    """
+    Treat a POST that only reads, such as a multi-get lookup, like a GET:
+    it may go to a replica and doesn't pin the client to the primary.
+    """
+    # Set on Django's request so the middleware sees it too.
+    getattr(request, '_request', request).db_read_only = True
+
+
+def _choose_alias(request):
+    if not is_read(request) or is_pinned_to_primary(request):
+        return PRIMARY_ALIAS
+    healthy = [alias for alias in read_replicas() if replica_is_fresh(alias)]
+    if not healthy:
+        return PRIMARY_ALIAS
+    return random.choice(healthy)
+
+
+def is_pinned_to_primary(request):
+    """Whether the client wrote recently enough to need read-your-writes"""
+    value = request.META.get('HTTP_X_DB_PIN_UNTIL') or request.COOKIES.get(PIN_COOKIE_NAME)
+    if not value:
+        return False
+    try:
+        return float(value) > time.time()
+    except (TypeError, ValueError):
+        return False
+
+
+def pin_to_primary(response):
+    """Pin the client to the primary for READ_YOUR_WRITES_WINDOW seconds"""
+    window = getattr(settings, 'READ_YOUR_WRITES_WINDOW', 5)
+    until = f'{time.time() + window:.3f}'
+    response[PIN_HEADER_NAME] = until
+    response.set_cookie(
+        PIN_COOKIE_NAME,
+        until,
+        max_age=window,
+        httponly=True,
+        samesite='Lax',
+        secure=getattr(settings, 'SESSION_COOKIE_SECURE', False),
+    )
+    return response
+
+
+def replica_is_fresh(alias):
+    """Whether a replica is reachable and within REPLICA_MAX_LAG seconds"""
+    max_lag = getattr(settings, 'REPLICA_MAX_LAG', 5)
+    lag = replica_lag(alias)
+    return lag is not None and lag <= max_lag
+
+
+def replica_lag(alias):
+    """
+    Replication lag of ``alias`` in seconds, or None when it can't be measured.
+    Results are cached per process for REPLICA_LAG_CHECK_INTERVAL seconds so
+    the check costs one query per interval rather than one per request.
+    """
+    interval = getattr(settings, 'REPLICA_LAG_CHECK_INTERVAL', 5)
+    now = time.monotonic()
+    with _lag_lock:
+        cached = _lag_cache.get(alias)
+        if cached is not None and now - cached[0] < interval:
+            return cached[1]
+        # Let other threads keep using the previous value while this one
+        # refreshes it, instead of every thread querying the replica at once.
+        _lag_cache[alias] = (now, cached[1] if cached else None)
+
+    try:
+        with connections[alias].cursor() as cursor:
+            cursor.execute(REPLICA_LAG_QUERY)
+            lag = float(cursor.fetchone()[0])
+    except Exception as e:
+        logger.warning(f"Replica {alias} unavailable, reading from primary: {e}")
+        lag = None
+
+    with _lag_lock:
+        _lag_cache[alias] = (time.monotonic(), lag)
+    return lag
@@ -0,0 +1,180 @@
+"""
+Opt-in hash sharding of customers and their orders.
+
+When CUSTOMER_SHARDS lists database aliases, each customer lives on exactly
+one of them, chosen by a jump consistent hash of the customer code. All of
+that customer's orders live on the same shard. Operations keyed by customer
+code touch a single shard. Lookups by customer or order id, and list
+endpoints, fan out to every shard in parallel, and ordered lists are
+combined with a k-way merge.
+
+Changing a customer's code may move it to another shard; see
+relocate_customer(), which is also used by the reshard_customers command.
+"""
+import hashlib
+import heapq
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+
+from core.db.statements import Statement
+
+CUSTOMER_COLUMNS = ['id', 'code', 'name', 'phone_number', 'created_at', 'updated_at']
+ORDER_COLUMNS = ['id', 'customer_id', 'item', 'amount', 'order_time', 'created_at', 'updated_at']
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def shard_aliases():
+    return list(getattr(settings, 'CUSTOMER_SHARDS', []))
+
+
+def sharding_enabled():
+    return bool(shard_aliases())
+
+
+def jump_hash(key, buckets):
+    """Jump consistent hash (Lamping & Veach): growing N to N+1 buckets moves 1/(N+1) keys"""
+    b, j = -1, 0
+    while j < buckets:
+        b = j
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        j = int((b + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return b
+
+
+def shard_for_code(code, aliases=None):
+    """Alias of the shard that owns the customer with this code"""
+    aliases = shard_aliases() if aliases is None else aliases
+    digest = hashlib.blake2b(str(code).encode('utf-8'), digest_size=8).digest()
+    return aliases[jump_hash(int.from_bytes(digest, 'big'), len(aliases))]
+
+
+def connection_for_code(code):
+    return connections[shard_for_code(code)]
+
+
+def _fetch(alias, query, params):
+    with connections[alias].cursor() as cursor:
+        if isinstance(query, Statement):
+            return alias, query.fetchall(cursor, params)
+        cursor.execute(query, params)
+        if cursor.description is None:
+            return alias, []
+        columns = [col[0] for col in cursor.description]
+        return alias, [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def _fetch_in_worker(alias, query, params):
+    try:
+        return _fetch(alias, query, params)
+    finally:
+        # Fan-out threads outlive the request, so hand the connection back
+        # now rather than leaving one open per worker thread and shard.
+        connections[alias].close()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'SHARD_FANOUT_WORKERS', 8),
+                thread_name_prefix='shard-fanout',
+            )
+        return _executor
+
+
+def query_shards(query, params=None, aliases=None):
+    """
+    Run ``query`` (SQL or a Statement) on every shard in parallel;
+    returns [(alias, rows), ...]
+    """
+    aliases = shard_aliases() if aliases is None else aliases
+    if len(aliases) == 1:
+        return [_fetch(aliases[0], query, params)]
+    futures = [_get_executor().submit(_fetch_in_worker, alias, query, params) for alias in aliases]
+    return [future.result() for future in futures]
+
+
+def fetch_from_shards(query, params=None, order_by=None, descending=False):
+    """
+    Rows from every shard as one list. When each shard returns its rows
+    sorted by ``order_by`` they are k-way merged rather than re-sorted.
+    """
+    results = [rows for _, rows in query_shards(query, params)]
+    if order_by is None:
+        return [row for rows in results for row in rows]
+    return list(heapq.merge(*results, key=lambda row: row[order_by], reverse=descending))
+
+
+def locate(query, params=None):
+    """
+    First (alias, row) any shard returns for a statement touching one row by
+    id, e.g. a point lookup or ``DELETE ... RETURNING``, or (None, None).
+    """
+    for alias, rows in query_shards(query, params):
+        if rows:
+            return alias, rows[0]
+    return None, None
+
+
+def relocate_customer(customer_id, source, target, updates=None):
+    """
+    Move a customer and its orders from ``source`` to ``target``, applying
+    ``updates`` (column -> value) to the customer row on the way; None if
+    there is no such customer on ``source``.
+
+    The source rows are locked (FOR UPDATE) and deleted in one source
+    transaction around the copy, so order writes racing the move wait for
+    it and then find the customer gone, rather than being deleted unseen.
+    The copy commits on the target before the source commits. If the
+    process dies in between, the customer exists on both shards until the
+    next reshard_customers run, rather than on neither.
+    """
+    customer_select = f"SELECT {', '.join(CUSTOMER_COLUMNS)} FROM customers WHERE id = %s FOR UPDATE"
+    orders_select = f"SELECT {', '.join(ORDER_COLUMNS)} FROM orders WHERE customer_id = %s FOR UPDATE"
+
+    with transaction.atomic(using=source):
+        with connections[source].cursor() as source_cursor:
+            source_cursor.execute(customer_select, [customer_id])
+            row = source_cursor.fetchone()
+            if not row:
+                return None
+            customer = dict(zip(CUSTOMER_COLUMNS, row))
+            source_cursor.execute(orders_select, [customer_id])
+            orders = source_cursor.fetchall()
+
+            if updates:
+                # Like any other update, so incremental sync (core.changes) sees it
+                customer.update(updates, updated_at=timezone.now())
+            with transaction.atomic(using=target):
+                with connections[target].cursor() as cursor:
+                    cursor.execute(
+                        f"""
+                        INSERT INTO customers ({', '.join(CUSTOMER_COLUMNS)})
+                        VALUES ({', '.join(['%s'] * len(CUSTOMER_COLUMNS))})
+                        ON CONFLICT (id) DO UPDATE SET
+                            code = EXCLUDED.code, name = EXCLUDED.name,
+                            phone_number = EXCLUDED.phone_number
+                        """,
+                        [customer[col] for col in CUSTOMER_COLUMNS]
+                    )
+                    if orders:
+                        cursor.executemany(
+                            f"""
+                            INSERT INTO orders ({', '.join(ORDER_COLUMNS)})
+                            VALUES ({', '.join(['%s'] * len(ORDER_COLUMNS))})
+                            ON CONFLICT (id) DO NOTHING
+                            """,
+                            orders
+                        )
+
+            # The rows live on, so the delete mustn't leave sync tombstones behind.
+            source_cursor.execute("SET LOCAL sync.skip_tombstones = 'on'")
+            source_cursor.execute("DELETE FROM customers WHERE id = %s", [customer_id])
+    return customer
@@ -0,0 +1,221 @@
+"""
+Registry of named SQL statements for the raw-SQL views.
+
+Each Statement is written with the usual ``%s`` placeholders. On first use
+on a database session it is sent once as ``PREPARE name AS ...`` (with
+``$1..$n`` parameters); after that it runs as ``EXECUTE name(...)``, so
+PostgreSQL parses and plans it once per session instead of once per call.
+Prepared names are tracked per raw DB-API connection. A reconnect, or a
+pooled connection seen for the first time, therefore prepares again, while
+a connection reused from the pool keeps its statements.
+
+Statements also map result rows to dicts with column names worked out once
+per statement, and keep per-statement execution counters.
+
+Set DB_PREPARED_STATEMENTS = False when a transaction-pooling proxy such as
+PgBouncer sits in front of PostgreSQL; statements then run as plain SQL.
+"""
+import logging
+import re
+import threading
+import time
+import weakref
+
+from django.conf import settings
+from django.db import DatabaseError
+from psycopg2 import Error as DriverError, errorcodes
+
+from core.db.errors import pgcode
+
+logger = logging.getLogger(__name__)
+
+_PLACEHOLDER = re.compile(r'%%|%s')
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+# raw DB-API connection -> names of the statements prepared on it
+_prepared = weakref.WeakKeyDictionary()
+_prepared_lock = threading.Lock()
+
+
+def prepared_statements_enabled():
+    return getattr(settings, 'DB_PREPARED_STATEMENTS', True)
+
+
+class Statement:
+    """A named query, prepared lazily on each database session that runs it"""
+
+    def __init__(self, name, sql):
+        self.name = name
+        self.sql = sql
+        self.param_count = 0
+
+        def to_positional(match):
+            if match.group(0) == '%%':
+                return '%'
+            self.param_count += 1
+            return f'${self.param_count}'
+
+        # $1..$n form, used by PREPARE and by asyncpg (core.db.aio)
+        self.positional_sql = _PLACEHOLDER.sub(to_positional, sql)
+        self.prepare_sql = f'PREPARE {name} AS {self.positional_sql}'
+        self.execute_sql = f'EXECUTE {name}'
+        if self.param_count:
+            self.execute_sql += f"({', '.join(['%s'] * self.param_count)})"
+
+        self.columns = None
+        self._stats_lock = threading.Lock()
+        self.calls = 0
+        self.rows = 0
+        self.total_time = 0.0
+
+    def __repr__(self):
+        return f'<Statement {self.name}>'
+
+    def execute(self, cursor, params=None):
+        """Run the statement on a Django cursor"""
+        params = list(params or [])
+        started = time.perf_counter()
+        if not prepared_statements_enabled():
+            cursor.execute(self.sql, params)
+        else:
+            self._ensure_prepared(cursor)
+            try:
+                cursor.execute(self.execute_sql, params)
+            except DatabaseError as e:
+                # The session lost its prepared statements behind our back
+                # (e.g. DISCARD ALL). Outside a transaction, prepare again.
+                if (pgcode(e) != errorcodes.INVALID_SQL_STATEMENT_NAME
+                        or cursor.db.in_atomic_block):
+                    raise
+                _forget(cursor.db.connection)
+                self._ensure_prepared(cursor)
+                cursor.execute(self.execute_sql, params)
+        self.record(time.perf_counter() - started)
+        return cursor
+
+    def fetchall(self, cursor, params=None):
+        """Execute and return every row as a dict"""
+        self.execute(cursor, params)
+        columns = self._columns(cursor)
+        rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        self.record(rows=len(rows))
+        return rows
+
+    def fetchone(self, cursor, params=None):
+        """Execute and return the first row as a dict, or None"""
+        self.execute(cursor, params)
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        self.record(rows=1)
+        return dict(zip(self._columns(cursor), row))
+
+    def fetchvalue(self, cursor, params=None):
+        """Execute and return the first column of the first row, or None"""
+        self.execute(cursor, params)
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        self.record(rows=1)
+        return row[0]
+
+    def prepare(self, raw_connection):
+        """PREPARE on a raw DB-API connection, e.g. while warming a pool"""
+        with _prepared_lock:
+            names = _prepared.setdefault(raw_connection, set())
+            if self.name in names:
+                return
+        with raw_connection.cursor() as cursor:
+            cursor.execute(self.prepare_sql)
+        with _prepared_lock:
+            names.add(self.name)
+
+    def record(self, elapsed=None, rows=0):
+        """Count one execution taking ``elapsed`` seconds, and/or rows returned"""
+        with self._stats_lock:
+            if elapsed is not None:
+                self.calls += 1
+                self.total_time += elapsed
+            self.rows += rows
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                'calls': self.calls,
+                'rows': self.rows,
+                'total_ms': round(self.total_time * 1000, 3),
+                'avg_ms': round(self.total_time * 1000 / self.calls, 3) if self.calls else 0.0,
+            }
+
+    def _columns(self, cursor):
+        if self.columns is None:
+            self.columns = [col[0] for col in cursor.description]
+        return self.columns
+
+    def _ensure_prepared(self, cursor):
+        raw_connection = cursor.db.connection
+        with _prepared_lock:
+            names = _prepared.setdefault(raw_connection, set())
+            if self.name in names:
+                return
+        try:
+            cursor.execute(self.prepare_sql)
+        except DatabaseError as e:
+            # Already prepared on this session, e.g. after _forget().
+            if (pgcode(e) != errorcodes.DUPLICATE_PREPARED_STATEMENT
+                    or cursor.db.in_atomic_block):
+                raise
+        with _prepared_lock:
+            names.add(self.name)
+
+
+def _forget(raw_connection):
+    with _prepared_lock:
+        _prepared.pop(raw_connection, None)
+
+
+def register(name, sql):
+    """Create and register a statement; names must be unique"""
+    with _registry_lock:
+        if name in _registry:
+            raise ValueError(f'Statement {name!r} is already registered')
+        statement = _registry[name] = Statement(name, sql)
+        return statement
+
+
+def get_or_register(name, sql):
+    """Return the statement called ``name``, registering it on first use"""
+    with _registry_lock:
+        statement = _registry.get(name)
+        if statement is None:
+            statement = _registry[name] = Statement(name, sql)
+        return statement
+
+
+def registered_statements():
+    with _registry_lock:
+        return dict(_registry)
+
+
+def prepare_all(raw_connection):
+    """
+    PREPARE every registered statement on a raw DB-API connection. One that
+    fails, e.g. because its table is missing on a replica, is logged and
+    left to be prepared on first use; the rest are still prepared.
+    """
+    if not prepared_statements_enabled():
+        return
+    for statement in registered_statements().values():
+        try:
+            statement.prepare(raw_connection)
+        except DriverError as e:
+            logger.warning("Could not prepare statement %s: %s", statement.name, e)
+            # Outside autocommit the failure aborted the transaction
+            if not raw_connection.autocommit:
+                raw_connection.rollback()
+
+
+def statement_stats():
+    return {name: statement.stats() for name, statement in registered_statements().items()}
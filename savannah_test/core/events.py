@@ -0,0 +1,252 @@
+"""
+Server-Sent Events fed by PostgreSQL LISTEN/NOTIFY.
+
+Triggers publish row changes with ``pg_notify(channel, json)``, the JSON
+carrying at least ``op`` and ``id``. Every event loop (one per ASGI worker
+process) LISTENs on a channel with one dedicated asyncpg connection per
+database and fans each notification out to its subscribers. A
+notification is encoded as an SSE frame once however many clients get it,
+and idle subscribers cost a small queue and a parked task, never a query.
+
+The most recent frames are kept so that a client reconnecting with
+Last-Event-ID is sent what it missed. If its id is no longer kept, or a
+listener lost its connection in between, it is sent a ``reset`` event
+instead and should reload.
+"""
+import asyncio
+import json
+import logging
+import weakref
+from collections import deque
+
+from core.db.aio import connect_kwargs
+
+logger = logging.getLogger(__name__)
+
+HEARTBEAT_FRAME = b": keepalive\n\n"
+RESET_FRAME = b"event: reset\ndata: {}\n\n"
+
+# Seconds between attempts to reconnect a lost listener
+RECONNECT_DELAYS = (1, 2, 5, 10, 30)
+
+# event loop -> {channel: NotifyBroker}
+_brokers = weakref.WeakKeyDictionary()
+
+
+def sse_frame(event_id, event, data):
+    """One SSE message; ``data`` is single-line JSON text"""
+    return f"id: {event_id}\nevent: {event}\ndata: {data}\n\n".encode()
+
+
+class Subscription:
+    """
+    One client's bounded queue of frames. A client that falls
+    ``queue_size`` frames behind is dropped rather than buffered without
+    limit; it reconnects with Last-Event-ID and catches up from the history.
+
+    It joins the broker when frames() is first iterated and leaves it on
+    close(), so a response body that is never read holds nothing, and one
+    that stops being read is let go by the response's close() rather than
+    whenever the generator happens to be finalized.
+    """
+
+    def __init__(self, broker, last_event_id=None):
+        self.broker = broker
+        self.last_event_id = last_event_id
+        self.queue = asyncio.Queue(broker.queue_size)
+        self.overflowed = False
+        self.closed = False
+        self._loop = asyncio.get_running_loop()
+
+    def put(self, frame):
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    def close(self):
+        """Leave the broker; safe to call more than once and from any thread"""
+        self.closed = True
+        try:
+            on_loop = asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            on_loop = False
+        if on_loop:
+            self.broker.unsubscribe(self)
+            return
+        try:
+            self._loop.call_soon_threadsafe(self.broker.unsubscribe, self)
+        except RuntimeError:
+            pass  # The loop is closed, and its broker with it
+
+    async def frames(self, heartbeat, max_age):
+        """
+        The SSE body: the frames missed since ``last_event_id``, then frames
+        as they arrive with a comment every ``heartbeat`` seconds of
+        silence, for at most ``max_age`` seconds, after which the client
+        reconnects by itself. Servers that don't cancel the response when
+        the client goes away (Django < 5) thus still let go of it within
+        ``max_age``.
+        """
+        if self.closed:
+            return
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + max_age
+        replay = self.broker.add(self)
+        try:
+            yield f"retry: {int(heartbeat * 1000)}\n\n".encode()
+            for frame in replay:
+                yield frame
+            while True:
+                if self.overflowed and self.queue.empty():
+                    return
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    return
+                try:
+                    yield await asyncio.wait_for(self.queue.get(), min(heartbeat, remaining))
+                except asyncio.TimeoutError:
+                    yield HEARTBEAT_FRAME
+        finally:
+            self.close()
+
+
+class NotifyBroker:
+    """LISTENs on ``channel`` in every database of ``aliases`` and fans out"""
+
+    def __init__(self, channel, aliases, history_size, queue_size, heartbeat):
+        self.channel = channel
+        self.aliases = list(aliases)
+        self.queue_size = queue_size
+        self.heartbeat = heartbeat
+        self.history = deque(maxlen=history_size)
+        self.subscribers = set()
+        self._started = None
+        self._watchers = []
+
+    async def start(self):
+        """Connect the listeners once; raises if a database can't be reached"""
+        if self._started is None:
+            self._started = asyncio.ensure_future(self._connect_all())
+        task = self._started
+        try:
+            await asyncio.shield(task)
+        except Exception:
+            if self._started is task:
+                self._started = None
+            raise
+
+    async def _connect_all(self):
+        connections = []
+        try:
+            for alias in self.aliases:
+                connections.append(await self._connect(alias))
+        except BaseException:
+            await asyncio.gather(*(connection.close() for connection in connections), return_exceptions=True)
+            raise
+        loop = asyncio.get_running_loop()
+        self._watchers = [
+            loop.create_task(self._watch(alias, connection))
+            for alias, connection in zip(self.aliases, connections)
+        ]
+
+    async def _connect(self, alias):
+        import asyncpg
+
+        connection = await asyncpg.connect(**connect_kwargs(alias))
+        await connection.add_listener(self.channel, self._notified)
+        return connection
+
+    async def _watch(self, alias, connection):
+        """Keep ``alias`` listening: check the connection, reconnect when lost"""
+        failures = 0
+        while True:
+            try:
+                await asyncio.sleep(self.heartbeat)
+                await asyncio.wait_for(connection.fetchval('SELECT 1'), self.heartbeat)
+                continue
+            except asyncio.CancelledError:
+                await connection.close()
+                raise
+            except Exception:
+                logger.warning("Lost LISTEN %s connection to %s", self.channel, alias, exc_info=True)
+                connection.terminate()
+
+            while True:
+                await asyncio.sleep(RECONNECT_DELAYS[min(failures, len(RECONNECT_DELAYS) - 1)])
+                try:
+                    connection = await self._connect(alias)
+                    break
+                except Exception:
+                    failures += 1
+                    logger.warning("Can't LISTEN %s on %s", self.channel, alias, exc_info=True)
+            failures = 0
+            # Whatever was published while disconnected is gone
+            self.reset()
+
+    async def stop(self):
+        for watcher in self._watchers:
+            watcher.cancel()
+        await asyncio.gather(*self._watchers, return_exceptions=True)
+        self._watchers = []
+        self._started = None
+
+    def _notified(self, connection, pid, channel, payload):
+        try:
+            change = json.loads(payload)
+            event_id = f"{change['op']}:{change['id']}"
+        except (ValueError, KeyError, TypeError):
+            logger.warning("Ignoring malformed %s notification: %r", channel, payload)
+            return
+        self.publish(event_id, sse_frame(event_id, change['op'], payload))
+
+    def publish(self, event_id, frame):
+        self.history.append((event_id, frame))
+        for subscription in self.subscribers:
+            subscription.put(frame)
+
+    def reset(self):
+        """Tell every client to reload, and forget what couldn't be resumed from"""
+        self.history.clear()
+        for subscription in self.subscribers:
+            subscription.put(RESET_FRAME)
+
+    def missed(self, last_event_id):
+        """Frames published after ``last_event_id``, or [RESET_FRAME] if it isn't kept"""
+        for position in range(len(self.history) - 1, -1, -1):
+            if self.history[position][0] == last_event_id:
+                return [frame for _, frame in list(self.history)[position + 1:]]
+        return [RESET_FRAME]
+
+    async def subscribe(self, last_event_id=None):
+        """A Subscription for a new client, once the listeners are connected"""
+        await self.start()
+        return Subscription(self, last_event_id)
+
+    def add(self, subscription):
+        """Start sending to ``subscription``; returns the frames to replay to it first"""
+        # No await here: nothing can be published in between.
+        last_event_id = subscription.last_event_id
+        replay = [] if last_event_id is None else self.missed(last_event_id)
+        self.subscribers.add(subscription)
+        return replay
+
+    def unsubscribe(self, subscription):
+        self.subscribers.discard(subscription)
+
+
+def get_broker(channel, aliases, history_size, queue_size, heartbeat):
+    """The NotifyBroker for ``channel`` on the running event loop"""
+    brokers = _brokers.setdefault(asyncio.get_running_loop(), {})
+    broker = brokers.get(channel)
+    if broker is None:
+        broker = brokers[channel] = NotifyBroker(channel, aliases, history_size, queue_size, heartbeat)
+    return broker
+
+
+async def close_brokers():
+    """Stop every broker started on the running event loop"""
+    brokers = _brokers.pop(asyncio.get_running_loop(), {}).values()
+    await asyncio.gather(*(broker.stop() for broker in brokers))
@@ -0,0 +1,93 @@
+"""
+Import-time profiling with ``python -X importtime``, used by the
+profile_startup management command.
+
+The target modules are imported in a fresh interpreter, so the numbers
+match what a newly started worker pays.
+"""
+import os
+import subprocess
+import sys
+import time
+from dataclasses import dataclass
+
+from django.conf import settings
+
+PROJECT_PACKAGES = ('core', 'customers', 'orders', 'savannah_test')
+
+BOOT = """
+import importlib
+import django
+django.setup()
+for module in {modules!r}:
+    importlib.import_module(module)
+"""
+
+
+@dataclass
+class ImportRecord:
+    name: str
+    depth: int
+    self_us: int
+    cumulative_us: int
+
+    @property
+    def package(self):
+        return self.name.split('.')[0]
+
+
+@dataclass
+class StartupProfile:
+    records: list
+    wall_ms: float
+
+    @property
+    def total_ms(self):
+        """Time spent importing, i.e. the sum over the outermost imports"""
+        return sum(r.cumulative_us for r in self.records if r.depth == 0) / 1000
+
+    def project_modules(self, packages=PROJECT_PACKAGES):
+        """Project modules, most expensive first by cumulative time"""
+        records = [r for r in self.records if r.package in packages]
+        return sorted(records, key=lambda r: r.cumulative_us, reverse=True)
+
+    def packages(self):
+        """{top-level package: self time in microseconds}, most expensive first"""
+        totals = {}
+        for record in self.records:
+            totals[record.package] = totals.get(record.package, 0) + record.self_us
+        return dict(sorted(totals.items(), key=lambda item: item[1], reverse=True))
+
+
+def parse(stderr):
+    """Parse -X importtime output into ImportRecords, in the order printed"""
+    records = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        if not self_us.strip().isdigit():
+            continue  # the column header
+        indent = len(name) - len(name.lstrip())
+        records.append(ImportRecord(
+            name=name.strip(),
+            depth=(indent - 1) // 2,
+            self_us=int(self_us),
+            cumulative_us=int(cumulative_us),
+        ))
+    return records
+
+
+def profile(modules):
+    """Set Django up in a new interpreter, import `modules` and profile it all"""
+    started = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', BOOT.format(modules=list(modules))],
+        capture_output=True, text=True, env=os.environ.copy(), cwd=settings.BASE_DIR,
+    )
+    wall_ms = (time.perf_counter() - started) * 1000
+    if completed.returncode:
+        # The last line of the traceback names the import that failed
+        lines = completed.stderr.strip().splitlines() or [f'exited with status {completed.returncode}']
+        raise RuntimeError(lines[-1])
+    return StartupProfile(records=parse(completed.stderr), wall_ms=wall_ms)
@@ -0,0 +1,80 @@
+"""
+Management command to profile and budget the app's import time
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.importtime import profile
+
+
+def default_modules():
+    """The WSGI application and the URLconf, i.e. everything a worker imports"""
+    return [settings.WSGI_APPLICATION.rsplit('.', 1)[0], settings.ROOT_URLCONF]
+
+
+class Command(BaseCommand):
+    help = 'Report import time per project module and fail if it exceeds the budget'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--module',
+            action='append',
+            dest='modules',
+            help='Module to import after django.setup() (default: the WSGI app and URLconf)'
+        )
+        parser.add_argument(
+            '--budget',
+            type=float,
+            default=getattr(settings, 'STARTUP_IMPORT_BUDGET_MS', None),
+            help='Fail when total import time exceeds this many milliseconds (0 disables)'
+        )
+        parser.add_argument(
+            '--runs',
+            type=int,
+            default=3,
+            help='Fresh interpreters to profile; the fastest run is reported'
+        )
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=15,
+            help='Number of project modules and packages to list'
+        )
+
+    def handle(self, *args, **options):
+        if options['runs'] <= 0:
+            raise CommandError('--runs must be a positive integer')
+        modules = options['modules'] or default_modules()
+
+        try:
+            result = min(
+                (profile(modules) for _ in range(options['runs'])),
+                key=lambda run: run.total_ms
+            )
+        except RuntimeError as e:
+            raise CommandError(f"Failed to import {', '.join(modules)}: {e}")
+
+        self.stdout.write(
+            f"Imported {', '.join(modules)} in {result.total_ms:.1f} ms "
+            f"({len(result.records)} modules, {result.wall_ms:.1f} ms process)"
+        )
+
+        self.stdout.write('\nProject modules (cumulative / self ms):')
+        for record in result.project_modules()[:options['top']]:
+            self.stdout.write(
+                f"  {record.name:<40} {record.cumulative_us / 1000:>8.1f} {record.self_us / 1000:>8.1f}"
+            )
+
+        self.stdout.write('\nSlowest packages (self ms):')
+        for package, self_us in list(result.packages().items())[:options['top']]:
+            self.stdout.write(f"  {package:<40} {self_us / 1000:>8.1f}")
+
+        budget = options['budget']
+        if budget and result.total_ms > budget:
+            raise CommandError(
+                f"Import time {result.total_ms:.1f} ms exceeds the budget of {budget:.0f} ms"
+            )
+        if budget:
+            self.stdout.write(self.style.SUCCESS(
+                f"\nWithin the import-time budget of {budget:.0f} ms"
+            ))
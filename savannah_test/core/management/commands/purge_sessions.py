@@ -0,0 +1,66 @@
+"""
+Management command to delete expired sessions in small batches
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+class Command(BaseCommand):
+    help = 'Delete expired database-backed sessions in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=getattr(settings, 'SESSION_CLEANUP_BATCH_SIZE', 1000),
+            help='Number of expired sessions deleted per statement'
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=0.0,
+            help='Seconds to sleep between batches to limit database load'
+        )
+        parser.add_argument(
+            '--database',
+            type=str,
+            default='default',
+            help='Database alias holding the django_session table'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size <= 0:
+            raise CommandError('--batch-size must be a positive integer')
+
+        # Each batch is its own short autocommit statement, so cleanup never
+        # holds locks on a large part of the table at once.
+        delete_query = """
+            DELETE FROM django_session
+            WHERE session_key IN (
+                SELECT session_key FROM django_session
+                WHERE expire_date < CURRENT_TIMESTAMP
+                LIMIT %s
+            )
+        """
+
+        total_deleted = 0
+        try:
+            while True:
+                with connections[options['database']].cursor() as cursor:
+                    cursor.execute(delete_query, [batch_size])
+                    deleted = cursor.rowcount
+                total_deleted += deleted
+                if deleted < batch_size:
+                    break
+                if options['pause']:
+                    time.sleep(options['pause'])
+        except Exception as e:
+            raise CommandError(f'Error purging sessions: {e}')
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Deleted {total_deleted} expired sessions')
+        )
@@ -0,0 +1,77 @@
+"""
+Management command to delete sync tombstones older than the retention
+period in small batches. Clients whose cursor is older than that get
+410 Gone from the /changes/ endpoints and sync from scratch.
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core.db.sharding import shard_aliases
+
+
+class Command(BaseCommand):
+    help = 'Delete incremental sync tombstones older than the retention period'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=settings.SYNC_TOMBSTONE_RETENTION_DAYS,
+            help='Keep tombstones of the last N days'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of tombstones deleted per statement'
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=0.0,
+            help='Seconds to sleep between batches to limit database load'
+        )
+        parser.add_argument(
+            '--database',
+            nargs='+',
+            default=None,
+            help='Database aliases to purge (default: every shard, or default)'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size <= 0:
+            raise CommandError('--batch-size must be a positive integer')
+        if options['days'] < 0:
+            raise CommandError('--days must not be negative')
+
+        delete_query = """
+            DELETE FROM tombstones
+            WHERE (entity, id) IN (
+                SELECT entity, id FROM tombstones
+                WHERE deleted_at < CURRENT_TIMESTAMP - make_interval(days => %s)
+                LIMIT %s
+            )
+        """
+
+        total_deleted = 0
+        try:
+            for alias in options['database'] or shard_aliases() or ['default']:
+                while True:
+                    with connections[alias].cursor() as cursor:
+                        cursor.execute(delete_query, [options['days'], batch_size])
+                        deleted = cursor.rowcount
+                    total_deleted += deleted
+                    if deleted < batch_size:
+                        break
+                    if options['pause']:
+                        time.sleep(options['pause'])
+        except Exception as e:
+            raise CommandError(f'Error purging tombstones: {e}')
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Deleted {total_deleted} tombstones')
+        )
@@ -0,0 +1,90 @@
+"""
+Management command to move customers (and their orders) onto the shard
+their code hashes to under a given shard layout.
+
+Typical uses:
+  * Backfill an unsharded database into shards:
+        manage.py reshard_customers --source default --target shard_0 shard_1
+  * Grow from two to three shards (add shard_2 to DATABASES first):
+        manage.py reshard_customers --source shard_0 shard_1 --target shard_0 shard_1 shard_2
+
+Run it with writes paused, then switch CUSTOMER_SHARDS to the target layout.
+Each customer is copied before it is deleted from its source, so a rerun
+after an interruption picks up where the previous run stopped.
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core.db.sharding import relocate_customer, shard_aliases, shard_for_code
+
+
+class Command(BaseCommand):
+    help = 'Move customers and their orders to their shard under a target layout'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--source',
+            nargs='+',
+            default=None,
+            help='Database aliases to move customers out of (default: CUSTOMER_SHARDS)'
+        )
+        parser.add_argument(
+            '--target',
+            nargs='+',
+            default=None,
+            help='Shard layout to move customers into, in order (default: CUSTOMER_SHARDS)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of customers read from a source per query'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report how many customers would move'
+        )
+
+    def handle(self, *args, **options):
+        sources = options['source'] or shard_aliases()
+        targets = options['target'] or shard_aliases()
+        if not sources or not targets:
+            raise CommandError('No shards configured; pass --source and --target or set CUSTOMER_SHARDS')
+        for alias in set(sources) | set(targets):
+            if alias not in connections.databases:
+                raise CommandError(f'Unknown database alias: {alias}')
+
+        scan_query = """
+            SELECT id, code FROM customers
+            WHERE id > %s
+            ORDER BY id
+            LIMIT %s
+        """
+
+        moved = 0
+        try:
+            for source in sources:
+                last_id = '00000000-0000-0000-0000-000000000000'
+                while True:
+                    with connections[source].cursor() as cursor:
+                        cursor.execute(scan_query, [last_id, options['batch_size']])
+                        batch = cursor.fetchall()
+                    if not batch:
+                        break
+                    last_id = batch[-1][0]
+
+                    for customer_id, code in batch:
+                        target = shard_for_code(code, targets)
+                        if target == source:
+                            continue
+                        moved += 1
+                        if options['dry_run']:
+                            self.stdout.write(f'Would move {code}: {source} -> {target}')
+                        else:
+                            relocate_customer(customer_id, source, target)
+        except Exception as e:
+            raise CommandError(f'Error resharding customers: {e}')
+
+        verb = 'Would move' if options['dry_run'] else 'Moved'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {moved} customers'))
@@ -0,0 +1,109 @@
+import re
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.cache import patch_vary_headers
+
+from core.compression import (
+    ENCODERS, acompress_stream, compress_stream, compressible, compression_tier, negotiate,
+)
+from core.db.routing import is_read, pin_to_primary, read_replicas
+
+
+class ReadYourWritesMiddleware:
+    """
+    Pin clients to the primary database for a short window after a
+    successful write, so replica lag never hides their own changes.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # Under ASGI, stay async so the async views don't hop to a thread here.
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.process_response(request, await self.get_response(request))
+
+    def process_response(self, request, response):
+        if (not is_read(request)
+                and response.status_code < 400
+                and read_replicas()):
+            pin_to_primary(response)
+        return response
+
+
+class CompressionMiddleware:
+    """
+    gzip/brotli response compression, negotiated from Accept-Encoding.
+
+    Unlike django.middleware.gzip.GZipMiddleware, streaming responses are
+    compressed chunk by chunk with at most COMPRESSION_BUFFER_SIZE bytes
+    of input held back, and the level follows the body size and CPU load (see
+    core.compression.compression_tier). Bodies under COMPRESSION_MIN_SIZE
+    are sent as is, and so are partial (206) responses and anything but the
+    API media types (see core.compression.compressible). Totals are served
+    at /api/auth/compression/.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.COMPRESSION_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.process_response(request, await self.get_response(request))
+
+    def process_response(self, request, response):
+        if response.has_header('Content-Encoding') or not compressible(response.get('Content-Type', '')):
+            return response
+        # Byte ranges refer to the uncompressed body
+        if response.status_code == 206 or response.has_header('Content-Range'):
+            return response
+        if not response.streaming and len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = negotiate(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            encoder = ENCODERS[encoding](compression_tier(None))
+            stream = acompress_stream if response.is_async else compress_stream
+            response.streaming_content = stream(
+                response.streaming_content, encoder, settings.COMPRESSION_BUFFER_SIZE,
+            )
+            del response.headers['Content-Length']
+        else:
+            encoder = ENCODERS[encoding](compression_tier(len(response.content)))
+            compressed = encoder.compress(response.content) + encoder.finish()
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        # The body differs from the uncompressed one, so a strong ETag
+        # must not match it (same as GZipMiddleware).
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = re.sub(r'^"', 'W/"', etag)
+        response.headers['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,53 @@
+"""
+Helpers for the multi-get endpoints (GET ?ids= / ?codes= on the list views
+and POST .../lookup/), which answer a batch of keys with one
+``WHERE key = ANY(%s)`` query instead of one request per key.
+"""
+from django.conf import settings
+
+
+def requested_keys(request, name, parse=str):
+    """
+    The keys a client asked for, in its order and without duplicates, or
+    None if it didn't ask. They come from ?name=a,b,c on GET and from a
+    JSON list under ``name`` in POST bodies, and each is passed through
+    ``parse``. Raises ValueError for a malformed, empty or too long list.
+    """
+    if request.method == 'GET':
+        param = request.query_params.get(name)
+        if param is None:
+            return None
+        values = [value.strip() for value in param.split(',') if value.strip()]
+    else:
+        values = request.data.get(name)
+        if values is None:
+            return None
+        if not isinstance(values, list):
+            raise ValueError(f"{name} must be a list")
+
+    if not values:
+        raise ValueError(f"{name} must not be empty")
+    if len(values) > settings.MULTI_GET_MAX_KEYS:
+        raise ValueError(f"At most {settings.MULTI_GET_MAX_KEYS} {name} per request")
+
+    keys = {}
+    for value in values:
+        try:
+            key = parse(value) if isinstance(value, str) else None
+        except ValueError:
+            key = None
+        if not key:
+            raise ValueError(f"Invalid value in {name}: {value}")
+        keys.setdefault(key, None)
+    return list(keys)
+
+
+def in_request_order(rows, keys, column):
+    """
+    ``rows`` (fetched with ``column = ANY(keys)``) in the order of ``keys``,
+    and the keys no row was found for
+    """
+    by_key = {row[column]: row for row in rows}
+    found = [by_key[key] for key in keys if key in by_key]
+    missing = [str(key) for key in keys if key not in by_key]
+    return found, missing
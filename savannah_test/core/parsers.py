@@ -0,0 +1,172 @@
+"""
+JSON and MessagePack parsers, the counterparts of core.renderers, and a
+streaming parser for JSON arrays sent to batch endpoints
+"""
+import codecs
+import decimal
+import json
+import re
+import struct
+import uuid
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser, JSONParser
+
+from core.renderers import (
+    DECIMAL_EXACT, DECIMAL_STRUCT, MSGPACK_EXT_DECIMAL, MSGPACK_EXT_DECIMAL_TEXT, MSGPACK_EXT_UUID,
+    MessagePackRenderer, ORJSONRenderer, msgpack, orjson,
+)
+
+
+class ORJSONParser(JSONParser):
+    """
+    Parses JSON request bodies with orjson. Like JSONParser with STRICT_JSON
+    (the default) it rejects NaN and Infinity. Bodies in a charset other than
+    UTF-8, non-strict settings, or a missing orjson fall back to JSONParser.
+    """
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or not self.strict or codecs.lookup(encoding).name != 'utf-8':
+            return super().parse(stream, media_type, parser_context)
+
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
+
+
+def _msgpack_ext_hook(code, data):
+    if code == MSGPACK_EXT_UUID:
+        return uuid.UUID(bytes=data)
+    if code == MSGPACK_EXT_DECIMAL:
+        exponent, unscaled = DECIMAL_STRUCT.unpack(data)
+        return decimal.Decimal(unscaled).scaleb(exponent, DECIMAL_EXACT)
+    if code == MSGPACK_EXT_DECIMAL_TEXT:
+        return decimal.Decimal(data.decode('ascii'))
+    return msgpack.ExtType(code, data)
+
+
+class MessagePackParser(BaseParser):
+    """
+    Parses MessagePack request bodies (Content-Type: application/msgpack).
+    UUID and Decimal extension types and timestamps come back as UUID,
+    Decimal and aware UTC datetime objects.
+    """
+    media_type = 'application/msgpack'
+    renderer_class = MessagePackRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if msgpack is None:
+            raise ImproperlyConfigured('MessagePackParser requires the msgpack package')
+        try:
+            return msgpack.unpackb(stream.read(), ext_hook=_msgpack_ext_hook, timestamp=3)
+        except (ValueError, TypeError, struct.error, decimal.InvalidOperation, msgpack.ExtraData,
+                msgpack.FormatError, msgpack.StackError) as exc:
+            raise ParseError('MessagePack parse error - %s' % (str(exc) or type(exc).__name__))
+
+
+def _reject_constant(name):
+    raise ParseError(f'JSON parse error - {name} is not valid JSON')
+
+
+class JSONArrayStream:
+    """
+    The elements of a top-level JSON array, parsed one at a time while the
+    body is read in ``chunk_size`` pieces. Only the unconsumed part of the
+    buffer is kept, so memory depends on the largest element rather than
+    on the body. Malformed input raises ParseError when it is reached,
+    after the elements before it were handed out.
+    """
+    _whitespace = re.compile(r'[ \t\n\r]*')
+    _number_chars = frozenset('0123456789.eE+-')
+
+    def __init__(self, stream, encoding='utf-8', chunk_size=64 * 1024, max_element_size=1024 * 1024):
+        self.stream = stream
+        self.encoding = encoding
+        self.chunk_size = chunk_size
+        self.max_element_size = max_element_size
+
+    def __iter__(self):
+        decoder = json.JSONDecoder(parse_constant=_reject_constant)
+        text = codecs.getincrementaldecoder(self.encoding)(errors='strict')
+        buffer, position, finished = '', 0, self.stream is None
+
+        def fill():
+            nonlocal buffer, position, finished
+            chunk = b'' if finished else self.stream.read(self.chunk_size)
+            finished = finished or not chunk
+            try:
+                buffer = buffer[position:] + text.decode(chunk, final=finished)
+            except UnicodeDecodeError as exc:
+                raise ParseError('JSON parse error - %s' % str(exc))
+            position = 0
+
+        def next_char():
+            """Skip whitespace; the next character, or '' at the end of the body"""
+            nonlocal position
+            while True:
+                position = self._whitespace.match(buffer, position).end()
+                if position < len(buffer) or finished:
+                    return buffer[position:position + 1]
+                fill()
+
+        if next_char() != '[':
+            raise ParseError('JSON parse error - expected a JSON array')
+        position += 1
+        if next_char() == ']':
+            position += 1
+        else:
+            while True:
+                while True:
+                    try:
+                        element, end = decoder.raw_decode(buffer, position)
+                    except ValueError as exc:
+                        # Positions in the message would be buffer offsets
+                        if finished:
+                            raise ParseError('JSON parse error - %s' % getattr(exc, 'msg', str(exc)))
+                        if len(buffer) - position > self.max_element_size:
+                            raise ParseError(
+                                'JSON parse error - array element longer than %d characters or invalid'
+                                % self.max_element_size
+                            )
+                        fill()
+                        continue
+                    # A number could go on in the next chunk (1.5e3 read as 1.5)
+                    if (not finished and type(element) in (int, float)
+                            and (end == len(buffer) or buffer[end] in self._number_chars)
+                            and len(buffer) - position <= self.max_element_size):
+                        fill()
+                        continue
+                    break
+                position = end
+                yield element
+
+                separator = next_char()
+                position += 1
+                if separator == ']':
+                    break
+                if separator != ',':
+                    raise ParseError("JSON parse error - expected ',' or ']' after an array element")
+                if next_char() == ']':
+                    raise ParseError('JSON parse error - trailing comma in array')
+
+        if next_char() != '':
+            raise ParseError('JSON parse error - extra data after the array')
+
+
+class JSONArrayStreamParser(BaseParser):
+    """
+    For batch endpoints: request.data becomes a JSONArrayStream over a
+    top-level JSON array instead of the parsed body, so the view can work
+    through the elements while the rest of the body is still arriving.
+    """
+    media_type = 'application/json'
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        return JSONArrayStream(stream, encoding)
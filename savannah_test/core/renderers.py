@@ -0,0 +1,120 @@
+"""
+JSON renderer built on orjson, a drop-in for DRF's JSONRenderer, and a
+MessagePack renderer for service-to-service clients
+"""
+import datetime
+import decimal
+import struct
+import uuid
+
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# MessagePack extension types. Timestamps use the standard type -1.
+# UUID: the 16 bytes. DECIMAL: signed 8-bit exponent and signed 64-bit
+# unscaled value, big-endian. DECIMAL_TEXT: str() of Decimals that don't
+# fit (NaN, infinity, more digits or a larger exponent).
+MSGPACK_EXT_UUID = 1
+MSGPACK_EXT_DECIMAL = 2
+MSGPACK_EXT_DECIMAL_TEXT = 3
+DECIMAL_STRUCT = struct.Struct('>bq')
+
+# Exact scaling of Decimal coefficients, whatever their number of digits
+DECIMAL_EXACT = decimal.Context(prec=decimal.MAX_PREC, Emax=decimal.MAX_EMAX, Emin=decimal.MIN_EMIN)
+
+# Types orjson doesn't know (Decimal, lazy strings, timedelta, ...) go
+# through DRF's own encoder, so they come out exactly as before.
+_drf_default = JSONEncoder().default
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    Renders with orjson, which serializes UUIDs, datetimes and dicts/lists
+    in C instead of through json's Python ``default`` hook.
+
+    The output is byte-for-byte what JSONRenderer produces with DRF's default
+    settings: compact separators, UTF-8, UTC datetimes ending in "Z" and
+    Decimals as floats. JSONRenderer still handles what orjson can't
+    reproduce exactly: indented output, non-default UNICODE_JSON,
+    COMPACT_JSON or STRICT_JSON, and data orjson rejects, such as non-string
+    keys or integers over 64 bits. The known differences: NaN and infinity
+    render as null instead of raising, and floats from 1e16 up or below 1e-4
+    are written in different, equal notation (1e16 rather than 1e+16). Order
+    amounts are DECIMAL(10, 2), so neither applies to them. Without orjson
+    installed this is plain JSONRenderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if (orjson is None or self.ensure_ascii or not self.compact or not self.strict
+                or self.get_indent(accepted_media_type, renderer_context or {}) is not None):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=_drf_default, option=orjson.OPT_UTC_Z)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Same as JSONRenderer: escape the two line separators that are
+        # valid JSON but not valid JavaScript.
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+
+def _msgpack_default(obj):
+    """UUIDs and Decimals as extension types; anything else as in JSON"""
+    # Exact type checks first: this runs for every UUID and Decimal.
+    cls = type(obj)
+    if cls is uuid.UUID:
+        return msgpack.ExtType(MSGPACK_EXT_UUID, obj.bytes)
+    if cls is decimal.Decimal or isinstance(obj, decimal.Decimal):
+        exponent = obj.as_tuple().exponent
+        if isinstance(exponent, int) and -128 <= exponent < 128:
+            unscaled = int(obj.scaleb(-exponent, DECIMAL_EXACT))
+            if -2 ** 63 <= unscaled < 2 ** 63:
+                return msgpack.ExtType(MSGPACK_EXT_DECIMAL, DECIMAL_STRUCT.pack(exponent, unscaled))
+        return msgpack.ExtType(MSGPACK_EXT_DECIMAL_TEXT, str(obj).encode('ascii'))
+    if isinstance(obj, uuid.UUID):
+        return msgpack.ExtType(MSGPACK_EXT_UUID, obj.bytes)
+    if isinstance(obj, datetime.datetime) and obj.tzinfo is not None:
+        return msgpack.Timestamp.from_datetime(obj)
+    return _drf_default(obj)
+
+
+class MessagePackRenderer(BaseRenderer):
+    """
+    Renders MessagePack (Accept: application/msgpack) for internal services.
+
+    UUIDs, Decimals and aware datetimes keep their types instead of turning
+    into strings or floats: UUIDs and Decimals as the extension types above,
+    datetimes as standard MessagePack timestamps.
+    core.parsers.MessagePackParser decodes all three.
+    """
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if msgpack is None:
+            raise ImproperlyConfigured('MessagePackRenderer requires the msgpack package')
+        try:
+            # Aware datetimes are packed in C; naive ones make it raise.
+            return msgpack.packb(data, default=_msgpack_default, datetime=True)
+        except ValueError:
+            return msgpack.packb(data, default=_msgpack_default)
@@ -1,4 +1,3 @@
-import requests
 import os
 from django.conf import settings
 
@@ -19,8 +18,6 @@ def send_sms_notification(order_data):
 
 def send_sms(phone_number, message):
     """Send SMS using Mobile Sasa API"""
-    import os
-    
     # Skip SMS sending during testing
     if os.getenv('TESTING') == 'True':
         print(f"TEST MODE: Would send SMS to {phone_number}: {message}")
@@ -52,6 +49,10 @@ def send_sms(phone_number, message):
         "phone": clean_phone
     }
     
+    # Imported here so workers (and test runs, which never get this far)
+    # don't pay for loading requests at boot.
+    import requests
+
     try:
         response = requests.post(
             api_url,
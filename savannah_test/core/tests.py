@@ -0,0 +1,698 @@
+import asyncio
+import gzip
+import json
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import BytesIO, StringIO
+
+from psycopg2.errors import UndefinedTable
+
+from django.contrib.sessions.models import Session
+from django.core.management import CommandError, call_command
+from django.db import connections
+from unittest.mock import patch
+
+from django.http import HttpResponse, StreamingHttpResponse
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from core.authentication import LazyOIDCAuthentication
+from core.compression import brotli, compression_stats, compression_tier, negotiate
+from core.db import routing, sharding
+from core.db.pool import ConnectionPool, PoolTimeout
+from core.db.statements import Statement, prepare_all
+from core.importtime import StartupProfile, parse
+from core.middleware import CompressionMiddleware, ReadYourWritesMiddleware
+from core.parsers import JSONArrayStream, JSONArrayStreamParser, MessagePackParser, ORJSONParser
+from core.renderers import MessagePackRenderer, ORJSONRenderer
+
+
+class PurgeSessionsCommandTestCase(TestCase):
+    """Test cases for the batched expired-session cleanup"""
+
+    def _create_session(self, key, expires_in):
+        Session.objects.create(
+            session_key=key,
+            session_data='',
+            expire_date=timezone.now() + expires_in
+        )
+
+    def test_deletes_only_expired_sessions_across_batches(self):
+        """Test that every expired session is removed in several batches"""
+        for i in range(5):
+            self._create_session(f'expired{i}', timedelta(days=-1))
+        self._create_session('active', timedelta(days=1))
+
+        out = StringIO()
+        call_command('purge_sessions', batch_size=2, stdout=out)
+
+        self.assertIn('Deleted 5 expired sessions', out.getvalue())
+        self.assertEqual(
+            list(Session.objects.values_list('session_key', flat=True)),
+            ['active']
+        )
+
+
+class SyncHorizonTestCase(TransactionTestCase):
+    """Test cases for how far incremental sync pages may go"""
+
+    @override_settings(SYNC_SETTLE_SECONDS=0)
+    def test_open_transaction_holds_back_the_horizon(self):
+        """Test that the horizon stays before a transaction that could still commit older rows"""
+        import psycopg2
+        from core.changes import SYNC_HORIZON
+        other = psycopg2.connect(**connections['default'].get_connection_params())
+        try:
+            with other.cursor() as cursor:
+                cursor.execute("SELECT now()")
+                started = cursor.fetchone()[0]
+            with connections['default'].cursor() as cursor:
+                self.assertLess(SYNC_HORIZON.fetchvalue(cursor, [0]), started)
+
+            other.rollback()
+            with connections['default'].cursor() as cursor:
+                self.assertGreater(SYNC_HORIZON.fetchvalue(cursor, [0]), started)
+        finally:
+            other.close()
+
+
+class FakeConnection:
+    """Minimal stand-in for a psycopg2 connection"""
+
+    def __init__(self):
+        self.closed = 0
+        self.transaction_status = 0
+        self.rollbacks = 0
+
+    def cursor(self):
+        connection = self
+
+        class Cursor:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                return False
+
+            def execute(self, sql):
+                if connection.closed:
+                    raise Exception('connection already closed')
+
+        return Cursor()
+
+    def get_transaction_status(self):
+        return self.transaction_status
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.transaction_status = 0
+
+    def close(self):
+        self.closed = 1
+
+
+class ConnectionPoolTestCase(SimpleTestCase):
+    """Test cases for the process-wide connection pool"""
+
+    def _pool(self, **kwargs):
+        self.created = []
+
+        def connect():
+            connection = FakeConnection()
+            self.created.append(connection)
+            return connection
+
+        return ConnectionPool(connect, **kwargs)
+
+    def test_reuses_returned_connection(self):
+        """Test that a returned connection is handed out again"""
+        pool = self._pool(max_size=2)
+        first = pool.getconn()
+        pool.putconn(first)
+
+        self.assertIs(pool.getconn(), first)
+        self.assertEqual(len(self.created), 1)
+        self.assertEqual(pool.stats()['checkouts'], 2)
+
+    def test_rolls_back_open_transaction_on_return(self):
+        """Test that a connection left in a transaction is reset"""
+        pool = self._pool()
+        connection = pool.getconn()
+        connection.transaction_status = 2
+        pool.putconn(connection)
+
+        self.assertEqual(connection.rollbacks, 1)
+        self.assertEqual(pool.stats()['idle'], 1)
+
+    def test_replaces_closed_connection(self):
+        """Test that a connection closed while idle is not handed out"""
+        pool = self._pool()
+        connection = pool.getconn()
+        pool.putconn(connection)
+        connection.closed = 1
+
+        replacement = pool.getconn()
+        self.assertIsNot(replacement, connection)
+        self.assertEqual(pool.stats()['connections_discarded'], 1)
+
+    def test_replaces_connection_past_max_lifetime(self):
+        """Test that connections older than MAX_LIFETIME are recycled"""
+        pool = self._pool(max_lifetime=0)
+        connection = pool.getconn()
+        pool.putconn(connection)
+
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.stats()['size'], 0)
+
+    def test_times_out_when_exhausted(self):
+        """Test that checkout fails once MAX_SIZE connections are in use"""
+        pool = self._pool(max_size=1, timeout=0.01)
+        pool.getconn()
+
+        with self.assertRaises(PoolTimeout):
+            pool.getconn()
+        self.assertEqual(pool.stats()['timeouts'], 1)
+
+    def test_waiter_receives_returned_connection(self):
+        """Test that a blocked checkout is served by a concurrent return"""
+        pool = self._pool(max_size=1, timeout=5)
+        connection = pool.getconn()
+        received = []
+
+        waiter = threading.Thread(target=lambda: received.append(pool.getconn()))
+        waiter.start()
+        pool.putconn(connection)
+        waiter.join(timeout=5)
+
+        self.assertEqual(received, [connection])
+        self.assertEqual(pool.stats()['in_use'], 1)
+
+    def test_warm_opens_min_size_connections(self):
+        """Test that warming opens MIN_SIZE connections and runs the hook"""
+        pool = self._pool(min_size=3, max_size=5)
+        warmed = []
+        pool.warm(warmed.append)
+
+        self.assertEqual(len(warmed), 3)
+        self.assertEqual(pool.stats()['idle'], 3)
+
+
+@override_settings(DATABASE_READ_REPLICAS=['replica_1'], REPLICA_MAX_LAG=5)
+class ReplicaRoutingTestCase(SimpleTestCase):
+    """Test cases for read-replica routing and read-your-writes pinning"""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    @patch('core.db.routing.replica_lag', return_value=0.5)
+    def test_reads_go_to_fresh_replica(self, mock_lag):
+        """Test that safe reads use a replica within the lag budget"""
+        self.assertEqual(routing.db_alias_for(self.factory.get('/api/orders/')), 'replica_1')
+
+    @patch('core.db.routing.replica_lag', return_value=0.5)
+    def test_writes_go_to_primary(self, mock_lag):
+        """Test that unsafe methods always use the primary"""
+        self.assertEqual(routing.db_alias_for(self.factory.post('/api/orders/')), 'default')
+
+    @patch('core.db.routing.replica_lag', return_value=0.5)
+    def test_read_only_post_is_routed_like_a_read(self, mock_lag):
+        """Test that a POST marked read-only may use a replica and doesn't pin"""
+        request = self.factory.post('/api/orders/lookup/')
+        routing.mark_read_only(request)
+        middleware = ReadYourWritesMiddleware(lambda request: HttpResponse())
+
+        self.assertEqual(routing.db_alias_for(request), 'replica_1')
+        self.assertFalse(middleware(request).has_header(routing.PIN_HEADER_NAME))
+        self.assertTrue(middleware(self.factory.post('/api/orders/')).has_header(routing.PIN_HEADER_NAME))
+
+    @patch('core.db.routing.replica_lag', return_value=30)
+    def test_lagging_replica_falls_back_to_primary(self, mock_lag):
+        """Test that a replica past REPLICA_MAX_LAG is skipped"""
+        self.assertEqual(routing.db_alias_for(self.factory.get('/api/orders/')), 'default')
+
+    @patch('core.db.routing.replica_lag', return_value=None)
+    def test_unreachable_replica_falls_back_to_primary(self, mock_lag):
+        """Test that an unreachable replica is skipped"""
+        self.assertEqual(routing.db_alias_for(self.factory.get('/api/orders/')), 'default')
+
+    @patch('core.db.routing.replica_lag', return_value=0.5)
+    def test_pinned_client_reads_from_primary(self, mock_lag):
+        """Test that the pin issued after a write routes reads to the primary"""
+        response = routing.pin_to_primary(HttpResponse())
+        until = response[routing.PIN_HEADER_NAME]
+
+        by_header = self.factory.get('/api/orders/', HTTP_X_DB_PIN_UNTIL=until)
+        self.assertEqual(routing.db_alias_for(by_header), 'default')
+
+        by_cookie = self.factory.get('/api/orders/')
+        by_cookie.COOKIES[routing.PIN_COOKIE_NAME] = response.cookies[routing.PIN_COOKIE_NAME].value
+        self.assertEqual(routing.db_alias_for(by_cookie), 'default')
+
+    @patch('core.db.routing.replica_lag', return_value=0.5)
+    def test_expired_pin_is_ignored(self, mock_lag):
+        """Test that a pin in the past no longer forces the primary"""
+        request = self.factory.get('/api/orders/', HTTP_X_DB_PIN_UNTIL='1')
+        self.assertEqual(routing.db_alias_for(request), 'replica_1')
+
+
+class ShardingTestCase(SimpleTestCase):
+    """Test cases for customer shard selection and fan-out merging"""
+
+    def test_shard_for_code_is_stable(self):
+        """Test that a code always maps to the same shard"""
+        aliases = ['shard_0', 'shard_1', 'shard_2']
+        self.assertEqual(
+            sharding.shard_for_code('CUST001', aliases),
+            sharding.shard_for_code('CUST001', aliases)
+        )
+
+    def test_adding_a_shard_only_moves_keys_to_it(self):
+        """Test that growing the layout never moves customers between old shards"""
+        old = ['shard_0', 'shard_1', 'shard_2']
+        new = old + ['shard_3']
+        codes = [f'CUST{i:05d}' for i in range(2000)]
+
+        moved = [code for code in codes
+                 if sharding.shard_for_code(code, old) != sharding.shard_for_code(code, new)]
+
+        self.assertTrue(all(sharding.shard_for_code(code, new) == 'shard_3' for code in moved))
+        self.assertLess(len(moved), len(codes) * 0.35)
+
+    @patch('core.db.sharding.query_shards')
+    def test_fetch_from_shards_merges_sorted_results(self, mock_query):
+        """Test that per-shard sorted rows are k-way merged"""
+        mock_query.return_value = [
+            ('shard_0', [{'order_time': 9}, {'order_time': 4}, {'order_time': 1}]),
+            ('shard_1', [{'order_time': 7}, {'order_time': 5}]),
+        ]
+
+        rows = sharding.fetch_from_shards('SELECT ...', order_by='order_time', descending=True)
+
+        self.assertEqual([row['order_time'] for row in rows], [9, 7, 5, 4, 1])
+
+    @patch('core.db.sharding.query_shards')
+    def test_locate_returns_owning_shard(self, mock_query):
+        """Test that a point lookup reports which shard holds the row"""
+        mock_query.return_value = [('shard_0', []), ('shard_1', [{'id': 'abc'}])]
+
+        self.assertEqual(sharding.locate('SELECT ...', ['abc']), ('shard_1', {'id': 'abc'}))
+
+
+class FakeRawConnection:
+    """Stands in for a psycopg2 connection as a weak-referenceable key"""
+
+
+class FakeCursor:
+    """Records executed SQL and returns canned rows"""
+
+    def __init__(self, rows=None, columns=('id', 'code')):
+        self.db = type('FakeDB', (), {'connection': FakeRawConnection(), 'in_atomic_block': False})()
+        self.executed = []
+        self.rows = list(rows or [])
+        self.description = [(name,) for name in columns]
+
+    def execute(self, sql, params=None):
+        self.executed.append((sql, params))
+
+    def fetchall(self):
+        return self.rows
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+
+class PreparingConnection(FakeRawConnection):
+    """Runs PREPARE statements, failing those that name a missing table"""
+
+    def __init__(self):
+        self.autocommit = False
+        self.prepared = []
+        self.rollbacks = 0
+
+    def cursor(self):
+        connection = self
+
+        class Cursor:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                return False
+
+            def execute(self, sql):
+                if 'missing_table' in sql:
+                    raise UndefinedTable('relation "missing_table" does not exist')
+                connection.prepared.append(sql.split()[1])
+
+        return Cursor()
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+class StatementTestCase(SimpleTestCase):
+    """Test cases for named prepared statements"""
+
+    def test_placeholders_become_positional(self):
+        """Test that %s placeholders are numbered and %% is unescaped"""
+        statement = Statement('test_lookup', "SELECT id FROM customers WHERE code = %s AND name LIKE 'a%%' AND id = %s")
+
+        self.assertEqual(
+            statement.prepare_sql,
+            "PREPARE test_lookup AS SELECT id FROM customers WHERE code = $1 AND name LIKE 'a%' AND id = $2"
+        )
+        self.assertEqual(statement.execute_sql, 'EXECUTE test_lookup(%s, %s)')
+
+    def test_statement_is_prepared_once_per_connection(self):
+        """Test that PREPARE runs on first use of a connection only"""
+        statement = Statement('test_prepare_once', 'SELECT id, code FROM customers WHERE id = %s')
+        cursor = FakeCursor()
+
+        statement.execute(cursor, [1])
+        statement.execute(cursor, [2])
+
+        self.assertEqual([sql for sql, _ in cursor.executed], [
+            statement.prepare_sql, statement.execute_sql, statement.execute_sql,
+        ])
+
+        other = FakeCursor()
+        statement.execute(other, [3])
+        self.assertEqual(other.executed[0][0], statement.prepare_sql)
+
+    def test_prepare_all_goes_on_after_a_failure(self):
+        """Test that a statement that can't be prepared doesn't stop the others"""
+        statements = {
+            name: Statement(name, f'SELECT id FROM {table} WHERE id = %s')
+            for name, table in [('test_first', 'customers'), ('test_broken', 'missing_table'), ('test_last', 'orders')]
+        }
+        connection = PreparingConnection()
+
+        with patch('core.db.statements.registered_statements', return_value=statements), \
+                self.assertLogs('core.db.statements', 'WARNING') as logs:
+            prepare_all(connection)
+
+        self.assertEqual(connection.prepared, ['test_first', 'test_last'])
+        self.assertEqual(connection.rollbacks, 1)
+        self.assertIn('test_broken', logs.output[0])
+
+    @override_settings(DB_PREPARED_STATEMENTS=False)
+    def test_plain_sql_when_disabled(self):
+        """Test that statements run as plain SQL when prepared statements are off"""
+        statement = Statement('test_plain', 'SELECT id, code FROM customers WHERE id = %s')
+        cursor = FakeCursor()
+
+        statement.execute(cursor, [1])
+
+        self.assertEqual(cursor.executed, [(statement.sql, [1])])
+
+    def test_rows_are_mapped_to_dicts(self):
+        """Test that rows come back as dicts and are counted"""
+        statement = Statement('test_rows', 'SELECT id, code FROM customers')
+        cursor = FakeCursor(rows=[(1, 'CUST001'), (2, 'CUST002')])
+
+        rows = statement.fetchall(cursor)
+
+        self.assertEqual(rows, [{'id': 1, 'code': 'CUST001'}, {'id': 2, 'code': 'CUST002'}])
+        self.assertEqual(statement.stats()['calls'], 1)
+        self.assertEqual(statement.stats()['rows'], 2)
+
+
+class LazyOIDCAuthenticationTestCase(SimpleTestCase):
+    """Test cases for the API-only entrypoint's authentication"""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.authentication = LazyOIDCAuthentication()
+
+    @patch.object(LazyOIDCAuthentication, '_load')
+    def test_requests_without_bearer_token_skip_oidc(self, mock_load):
+        """Test that OIDC isn't loaded for anonymous or non-bearer requests"""
+        self.assertIsNone(self.authentication.authenticate(self.factory.get('/api/customers/')))
+        self.assertIsNone(self.authentication.authenticate(
+            self.factory.get('/api/customers/', HTTP_AUTHORIZATION='Basic dXNlcjpwYXNz')
+        ))
+        mock_load.assert_not_called()
+
+    @patch.object(LazyOIDCAuthentication, '_load')
+    def test_bearer_token_is_delegated_to_oidc(self, mock_load):
+        """Test that bearer tokens are verified by mozilla_django_oidc"""
+        mock_load.return_value.return_value.authenticate.return_value = ('user', 'token')
+        request = self.factory.get('/api/customers/', HTTP_AUTHORIZATION='Bearer token')
+
+        self.assertEqual(self.authentication.authenticate(request), ('user', 'token'))
+        mock_load.return_value.return_value.authenticate.assert_called_once_with(request)
+
+    def test_challenge_matches_oidc(self):
+        """Test that 401 responses carry the same challenge as OIDCAuthentication"""
+        from mozilla_django_oidc.contrib.drf import OIDCAuthentication
+
+        self.assertEqual(
+            self.authentication.authenticate_header(self.factory.get('/api/customers/')),
+            f'Bearer realm="{OIDCAuthentication.www_authenticate_realm}"'
+        )
+
+
+IMPORTTIME_OUTPUT = """\
+import time: self [us] | cumulative | imported package
+import time:       120 |        120 |   _io
+import time:       300 |       2300 |     requests
+import time:       900 |       3200 |   core.sms_service
+import time:       500 |       3700 | orders.views
+"""
+
+
+class ImportTimeTestCase(SimpleTestCase):
+    """Test cases for import-time profiling"""
+
+    def test_parse_importtime_output(self):
+        """Test that records keep their nesting and both timings"""
+        records = parse(IMPORTTIME_OUTPUT)
+
+        self.assertEqual([(r.name, r.depth) for r in records], [
+            ('_io', 1), ('requests', 2), ('core.sms_service', 1), ('orders.views', 0),
+        ])
+        profile = StartupProfile(records=records, wall_ms=10)
+        self.assertEqual(profile.total_ms, 3.7)
+        self.assertEqual([r.name for r in profile.project_modules()], ['orders.views', 'core.sms_service'])
+
+    @patch('core.management.commands.profile_startup.profile')
+    def test_command_fails_over_budget(self, mock_profile):
+        """Test that profile_startup fails when imports exceed the budget"""
+        mock_profile.return_value = StartupProfile(records=parse(IMPORTTIME_OUTPUT), wall_ms=10)
+
+        call_command('profile_startup', budget=5, runs=1, stdout=StringIO())
+        with self.assertRaisesMessage(CommandError, 'exceeds the budget of 3 ms'):
+            call_command('profile_startup', budget=3, runs=1, stdout=StringIO())
+
+
+class ORJSONRendererTestCase(SimpleTestCase):
+    """Test cases for the orjson renderer and parser"""
+
+    def _order(self, **overrides):
+        order = {
+            'id': uuid.uuid4(),
+            'customer_id': uuid.uuid4(),
+            'item': 'Café au lait \u2028 \U0001F600',
+            'amount': Decimal('1499.90'),
+            'order_time': datetime(2024, 3, 1, 9, 30, 15, 123456, tzinfo=dt_timezone.utc),
+            'customer_code': 'CUST001',
+            'customer_phone': None,
+        }
+        order.update(overrides)
+        return order
+
+    def test_output_matches_json_renderer(self):
+        """Test that orders render byte-for-byte like DRF's JSONRenderer"""
+        data = [
+            self._order(),
+            self._order(amount=Decimal('0.10'), order_time=datetime(2024, 3, 1, tzinfo=dt_timezone(timedelta(hours=3)))),
+            {'detail': 'Not found.', 'count': 2, 'ratio': 0.5, 'tags': ('a', 'b')},
+        ]
+
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_unsupported_data_falls_back(self):
+        """Test that data orjson rejects or indented output is still rendered"""
+        data = {1: 'non-string key', 'big': 2 ** 70}
+
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+        order = self._order()
+        self.assertEqual(
+            ORJSONRenderer().render(order, 'application/json; indent=2'),
+            JSONRenderer().render(order, 'application/json; indent=2')
+        )
+
+    def test_parser_is_strict(self):
+        """Test that bodies parse to Python data and NaN is rejected"""
+        parser = ORJSONParser()
+
+        self.assertEqual(parser.parse(BytesIO(b'{"amount": 10.5, "item": "Tea"}')), {'amount': 10.5, 'item': 'Tea'})
+        with self.assertRaises(ParseError):
+            parser.parse(BytesIO(b'{"amount": NaN}'))
+
+
+class MessagePackTestCase(SimpleTestCase):
+    """Test cases for the MessagePack renderer and parser"""
+
+    def test_round_trip_keeps_types(self):
+        """Test that UUIDs, Decimals and datetimes decode to the same values"""
+        order = {
+            'id': uuid.uuid4(),
+            'item': 'Café au lait',
+            'amount': Decimal('1500.00'),
+            'order_time': datetime(2024, 3, 1, 9, 30, 15, 123456, tzinfo=dt_timezone(timedelta(hours=3))),
+            'customer_phone': None,
+            'tags': [1, 2.5, True],
+        }
+        decimals = [Decimal('-0.05'), Decimal('1E+5'), Decimal('1.' + '9' * 40), Decimal('-Infinity'), Decimal('1E-200')]
+
+        data = MessagePackParser().parse(BytesIO(MessagePackRenderer().render([order, decimals])))
+
+        self.assertEqual(data[0], order)
+        self.assertIsInstance(data[0]['id'], uuid.UUID)
+        self.assertEqual(str(data[0]['amount']), '1500.00')
+        self.assertEqual([str(value) for value in data[1]], [str(value) for value in decimals])
+
+    def test_naive_datetimes_render_like_json(self):
+        """Test that values without a MessagePack type fall back to DRF's encoding"""
+        data = {'time': datetime(2024, 3, 1, 9, 30), 'day': datetime(2024, 3, 1).date()}
+
+        self.assertEqual(
+            MessagePackParser().parse(BytesIO(MessagePackRenderer().render(data))),
+            {'time': '2024-03-01T09:30:00', 'day': '2024-03-01'}
+        )
+
+    def test_invalid_body(self):
+        """Test that malformed MessagePack is a parse error"""
+        for body in [b'\xc1', b'\x93\x01', b'\xd4\x02\x00']:
+            with self.assertRaises(ParseError):
+                MessagePackParser().parse(BytesIO(body))
+
+
+class JSONArrayStreamTestCase(SimpleTestCase):
+    """Test cases for the streaming JSON array parser"""
+
+    def test_elements_match_json_at_any_chunk_size(self):
+        """Test that elements split across reads, numbers included, parse like json.loads"""
+        data = [{'item': 'Café', 'amount': -1.5e3, 'tags': [1, None, True]}, 12345, 'a,]b', [], {}, 0.25]
+        body = json.dumps(data, ensure_ascii=False, indent=1).encode()
+
+        for chunk_size in [1, 2, 3, 7, 64, 4096]:
+            self.assertEqual(list(JSONArrayStream(BytesIO(body), chunk_size=chunk_size)), data)
+        self.assertEqual(list(JSONArrayStreamParser().parse(BytesIO(b' [ ] '))), [])
+
+    def test_invalid_body_after_valid_elements(self):
+        """Test that errors surface when reached, after the elements before them"""
+        elements = iter(JSONArrayStream(BytesIO(b'[1, {"a": 2}, {"b": }]'), chunk_size=4))
+        self.assertEqual([next(elements), next(elements)], [1, {'a': 2}])
+        with self.assertRaises(ParseError):
+            next(elements)
+
+        for body in [b'', b'{"a": 1}', b'[1,]', b'[1 2]', b'[1] 2', b'[NaN]', b'[1', b'["\xff"]', b'[\xff]']:
+            with self.assertRaises(ParseError, msg=body):
+                list(JSONArrayStream(BytesIO(body), chunk_size=2))
+        with self.assertRaises(ParseError):
+            list(JSONArrayStream(BytesIO(b'["' + b'x' * 100 + b'"]'), chunk_size=8, max_element_size=50))
+
+
+@override_settings(COMPRESSION_ENABLED=True, COMPRESSION_MIN_SIZE=1024, COMPRESSION_BUFFER_SIZE=4096)
+class CompressionMiddlewareTestCase(SimpleTestCase):
+    """Test cases for gzip/brotli response compression"""
+    body = b'[' + b','.join(b'{"id": %d, "item": "Laptop", "amount": 1500.0}' % i for i in range(500)) + b']'
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        compression_stats.reset()
+
+    def _get(self, response, accept_encoding='gzip'):
+        middleware = CompressionMiddleware(lambda request: response)
+        return middleware(self.factory.get('/api/orders/', HTTP_ACCEPT_ENCODING=accept_encoding))
+
+    def _chunks(self):
+        for start in range(0, len(self.body), 1000):
+            yield self.body[start:start + 1000]
+
+    def test_negotiate(self):
+        """Test that Accept-Encoding q-values and wildcards are honoured"""
+        self.assertEqual(negotiate('gzip, deflate'), 'gzip')
+        self.assertEqual(negotiate('gzip;q=1.0, br;q=0.5'), 'gzip')
+        self.assertEqual(negotiate('GZIP;q=0, *;q=0.1'), 'br' if brotli else None)
+        self.assertIsNone(negotiate('deflate, identity'))
+        self.assertIsNone(negotiate(''))
+        if brotli:
+            self.assertEqual(negotiate('gzip, deflate, br'), 'br')
+
+    def test_compresses_json_body(self):
+        """Test that large JSON bodies are gzipped and headers updated"""
+        response = HttpResponse(self.body, content_type='application/json')
+        response['ETag'] = '"abc"'
+        with patch('core.compression.cpu_load', return_value=0.0):
+            response = self._get(response)
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(response['ETag'], 'W/"abc"')
+        self.assertEqual(int(response['Content-Length']), len(response.content))
+        self.assertEqual(gzip.decompress(response.content), self.body)
+        stats = compression_stats.stats()['gzip:2']
+        self.assertEqual(stats['bytes_in'], len(self.body))
+        self.assertEqual(stats['bytes_saved'], len(self.body) - len(response.content))
+
+    def test_skips_small_refused_and_binary_bodies(self):
+        """Test that some responses are sent uncompressed"""
+        cases = [
+            (HttpResponse(b'{"id": 1}', content_type='application/json'), 'gzip'),
+            (HttpResponse(self.body, content_type='application/json'), 'gzip;q=0, identity'),
+            (HttpResponse(self.body, content_type='image/png'), 'gzip'),
+            (StreamingHttpResponse(self._chunks(), content_type='text/event-stream'), 'gzip'),
+            (HttpResponse(self.body, content_type='text/html; charset=utf-8'), 'gzip'),
+            (HttpResponse(self.body, content_type='application/json', status=206), 'gzip'),
+        ]
+        for response, accept_encoding in cases:
+            response = self._get(response, accept_encoding)
+            self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_streaming_response_is_compressed_in_bounded_chunks(self):
+        """Test that streams are compressed chunk by chunk, flushing every buffer"""
+        response = self._get(StreamingHttpResponse(self._chunks(), content_type='application/json'))
+        parts = list(response.streaming_content)
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertGreater(len(parts), len(self.body) // 4096)
+        self.assertEqual(gzip.decompress(b''.join(parts)), self.body)
+
+    def test_async_streaming_response(self):
+        """Test that async streams stay async and are compressed"""
+        async def chunks():
+            for chunk in self._chunks():
+                yield chunk
+
+        async def consume(response):
+            return b''.join([part async for part in response.streaming_content])
+
+        response = self._get(StreamingHttpResponse(chunks(), content_type='application/json'))
+
+        self.assertTrue(response.is_async)
+        self.assertEqual(gzip.decompress(asyncio.run(consume(response))), self.body)
+
+    def test_brotli(self):
+        """Test that brotli is preferred when the client accepts it"""
+        if brotli is None:
+            self.skipTest('brotli is not installed')
+        response = self._get(HttpResponse(self.body, content_type='application/json'), 'gzip, br')
+
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(response.content), self.body)
+
+    def test_level_follows_size_and_load(self):
+        """Test that large bodies and busy CPUs get faster compression"""
+        with patch('core.compression.cpu_load', return_value=0.1):
+            self.assertEqual(compression_tier(10_000), 2)
+            self.assertEqual(compression_tier(None), 1)
+            self.assertEqual(compression_tier(50_000_000), 0)
+        with patch('core.compression.cpu_load', return_value=2.0):
+            self.assertEqual(compression_tier(10_000), 0)
@@ -1,5 +1,5 @@
 from django.urls import path
-from . import auth_views
+from . import auth_views, views
 
 urlpatterns = [
     path('login/', auth_views.oidc_login_page, name='oidc_login_page'),
@@ -9,4 +9,7 @@ urlpatterns = [
     path('setup-oidc/', auth_views.setup_oidc_application, name='setup_oidc'),
     path('oidc-info/', auth_views.oidc_info, name='oidc_info'),
     path('user/', auth_views.user_info, name='user_info'),
+    path('db-pool/', views.db_pool_stats, name='db_pool_stats'),
+    path('db-statements/', views.db_statement_stats, name='db_statement_stats'),
+    path('compression/', views.response_compression_stats, name='compression_stats'),
 ]
\ No newline at end of file
@@ -0,0 +1,37 @@
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+
+from core.compression import compression_stats
+from core.db.pool import pool_stats
+from core.db.statements import statement_stats
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def db_pool_stats(request):
+    """
+    Connection pool statistics for the worker process serving this request
+    GET /api/auth/db-pool/
+    """
+    return Response(pool_stats())
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def db_statement_stats(request):
+    """
+    Execution counters of the named SQL statements in this worker process
+    GET /api/auth/db-statements/
+    """
+    return Response(statement_stats())
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def response_compression_stats(request):
+    """
+    Bytes saved and CPU spent by response compression in this worker process
+    GET /api/auth/compression/
+    """
+    return Response(compression_stats.stats())
@@ -0,0 +1,42 @@
+"""
+Warm-up run by the application server before a process takes traffic, so
+the first requests after a deploy cost the same as steady state. See
+gunicorn.conf.py.
+"""
+import logging
+
+from django.db import connections
+from django.urls import get_resolver
+
+from core.db.statements import prepare_all
+
+logger = logging.getLogger(__name__)
+
+
+def load_urlconf():
+    """Import every view module, which also registers every named statement"""
+    return len(get_resolver().url_patterns)
+
+
+def warm_connections():
+    """
+    Fill each database's pool up to MIN_SIZE and PREPARE the named statements
+    on every pooled connection. Aliases that are unreachable are logged and
+    skipped, so a replica being down doesn't stop a worker from booting.
+    """
+    for alias in connections:
+        connection = connections[alias]
+        try:
+            connection.ensure_connection()
+            pool = getattr(connection, 'pool', None)
+            connection.close()
+            if pool is not None:
+                pool.warm(prepare_all)
+        except Exception as e:
+            logger.warning(f"Could not warm database {alias}: {e}")
+            connection.close()
+
+
+def close_connections():
+    """Drop this process's connections, e.g. in a master before it forks"""
+    connections.close_all()
@@ -0,0 +1,7 @@
+from django.urls import path
+from .async_views import CustomerListAsyncView, CustomerDetailAsyncView
+
+urlpatterns = [
+    path('', CustomerListAsyncView.as_view(), name='customer-list-async'),
+    path('<uuid:pk>/', CustomerDetailAsyncView.as_view(), name='customer-detail-async'),
+]
@@ -0,0 +1,164 @@
+from asgiref.sync import sync_to_async
+from rest_framework import status
+from django.utils import timezone
+from core.async_views import AsyncAPIView
+from core.db import aio
+from core.db.errors import is_unique_violation
+from core.db.sharding import relocate_customer, shard_for_code, sharding_enabled
+from customers.queries import (
+    CUSTOMER_DELETE, CUSTOMER_DETAIL, CUSTOMER_EXISTS, CUSTOMER_INSERT, CUSTOMER_LIST,
+    CUSTOMER_UPDATE, UPDATABLE_FIELDS, customer_update_params, deleted_orders,
+)
+from webhooks.events import ORDER_DELETED, aenqueue_many, apublish_many, shares_outbox
+
+
+class CustomerListAsyncView(AsyncAPIView):
+    """List all customers or create a new customer (async)"""
+
+    async def get(self, request):
+        try:
+            if sharding_enabled():
+                customers = await aio.fetch_from_shards(CUSTOMER_LIST, order_by='created_at', descending=True)
+            else:
+                customers = await aio.fetch(CUSTOMER_LIST, alias=await aio.alias_for(request))
+            return self.respond(customers)
+        except Exception as e:
+            return self.respond(
+                {"error": f"Failed to fetch customers: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+    async def post(self, request):
+        """Create a new customer"""
+        data = self.parse_body(request)
+        try:
+            for field in ['code', 'name', 'phone_number']:
+                if field not in data:
+                    return self.respond(
+                        {"error": f"Missing required field: {field}"},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+
+            alias = shard_for_code(data['code']) if sharding_enabled() else await aio.alias_for(request)
+            customer = await aio.fetchrow(
+                CUSTOMER_INSERT, [data['code'], data['name'], data['phone_number']], alias=alias
+            )
+
+            if not customer:
+                return self.respond(
+                    {"error": "Customer code already exists"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            return self.respond(customer, status=status.HTTP_201_CREATED)
+
+        except Exception as e:
+            return self.respond(
+                {"error": f"Failed to create customer: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
+class CustomerDetailAsyncView(AsyncAPIView):
+    """Retrieve, update or delete a customer (async)"""
+
+    async def get(self, request, pk):
+        """Get a specific customer"""
+        try:
+            if sharding_enabled():
+                _, customer = await aio.locate(CUSTOMER_DETAIL, [pk])
+            else:
+                customer = await aio.fetchrow(CUSTOMER_DETAIL, [pk], alias=await aio.alias_for(request))
+
+            if not customer:
+                return self.respond(
+                    {"error": "Customer not found"},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+
+            return self.respond(customer)
+
+        except Exception as e:
+            return self.respond(
+                {"error": f"Failed to fetch customer: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+    async def put(self, request, pk):
+        """Update a customer"""
+        data = self.parse_body(request)
+        try:
+            if not any(field in data for field in UPDATABLE_FIELDS):
+                return self.respond(
+                    {"error": "No fields to update"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            alias = await aio.alias_for(request)
+            if sharding_enabled():
+                alias, existing_customer = await aio.locate(CUSTOMER_EXISTS, [pk])
+                if not existing_customer:
+                    return self.respond(
+                        {"error": "Customer not found"},
+                        status=status.HTTP_404_NOT_FOUND
+                    )
+
+                code_shard = shard_for_code(data['code']) if 'code' in data else alias
+                if code_shard != alias:
+                    updates = {field: data[field] for field in UPDATABLE_FIELDS if field in data}
+                    updates['updated_at'] = timezone.now()
+                    customer = await sync_to_async(relocate_customer)(pk, alias, code_shard, updates)
+                    if not customer:
+                        return self.respond(
+                            {"error": "Customer not found"},
+                            status=status.HTTP_404_NOT_FOUND
+                        )
+                    return self.respond(customer)
+
+            customer = await aio.fetchrow(CUSTOMER_UPDATE, customer_update_params(data, pk), alias=alias)
+
+            if not customer:
+                return self.respond(
+                    {"error": "Customer not found"},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            return self.respond(customer)
+
+        except Exception as e:
+            if is_unique_violation(e):
+                return self.respond(
+                    {"error": "Customer code already exists"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            return self.respond(
+                {"error": f"Failed to update customer: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+    async def delete(self, request, pk):
+        """Delete a customer"""
+        try:
+            # The orders go with the customer
+            if sharding_enabled():
+                rows = await aio.fetch_from_shards(CUSTOMER_DELETE, [pk])
+                await apublish_many(ORDER_DELETED, deleted_orders(rows))
+            else:
+                alias = await aio.alias_for(request)
+                async with aio.transaction(alias) as connection:
+                    rows = await aio.fetch(CUSTOMER_DELETE, [pk], alias=alias, connection=connection)
+                    if shares_outbox(alias):
+                        await aenqueue_many(connection, ORDER_DELETED, deleted_orders(rows))
+
+            if not rows:
+                return self.respond(
+                    {"error": "Customer not found"},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+
+            return self.respond(status=status.HTTP_204_NO_CONTENT)
+
+        except Exception as e:
+            return self.respond(
+                {"error": f"Failed to delete customer: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
@@ -0,0 +1,182 @@
+"""
+Named SQL statements used by the customer views. See core.db.statements.
+"""
+from core.changes import changes_sql
+from core.db.jsonsql import json_array, json_object, utc_timestamp
+from core.db.statements import register
+
+CUSTOMER_LIST = register('customer_list', """
+    SELECT id, code, name, phone_number, created_at, updated_at
+    FROM customers
+    ORDER BY created_at DESC
+""")
+
+CUSTOMER_DETAIL = register('customer_detail', """
+    SELECT id, code, name, phone_number, created_at, updated_at
+    FROM customers
+    WHERE id = %s
+""")
+
+# Multi-get: rows come back in any order, the view restores the request's.
+CUSTOMERS_BY_IDS = register('customers_by_ids', """
+    SELECT id, code, name, phone_number, created_at, updated_at
+    FROM customers
+    WHERE id = ANY(%s)
+""")
+
+CUSTOMERS_BY_CODES = register('customers_by_codes', """
+    SELECT id, code, name, phone_number, created_at, updated_at
+    FROM customers
+    WHERE code = ANY(%s)
+""")
+
+# Customers with their last N orders (?include=recent_orders): one row per
+# order, or one with NULL order columns for a customer without orders. The
+# LATERAL subquery reads each customer's newest orders backwards from
+# idx_orders_customer_time and stops after LIMIT rows.
+RECENT_ORDERS_LATERAL_SQL = """
+    SELECT c.id, c.code, c.name, c.phone_number, c.created_at, c.updated_at,
+           r.id as order_id, r.item as order_item, r.amount as order_amount,
+           r.order_time as order_order_time, r.created_at as order_created_at
+    FROM customers c
+    LEFT JOIN LATERAL (
+        SELECT o.id, o.item, o.amount, o.order_time, o.created_at
+        FROM orders o
+        WHERE o.customer_id = c.id
+        ORDER BY o.order_time DESC
+        LIMIT %s
+    ) r ON true
+"""
+
+CUSTOMER_LIST_RECENT_ORDERS = register('customer_list_recent_orders', f"""
+    {RECENT_ORDERS_LATERAL_SQL}
+    ORDER BY c.created_at DESC, c.id, r.order_time DESC
+""")
+
+CUSTOMER_DETAIL_RECENT_ORDERS = register('customer_detail_recent_orders', f"""
+    {RECENT_ORDERS_LATERAL_SQL}
+    WHERE c.id = %s
+    ORDER BY r.order_time DESC
+""")
+
+# Incremental sync: customers changed or deleted after a cursor (core.changes)
+CUSTOMER_CHANGES = register('customer_changes', changes_sql(
+    'customers', 'customer', ['code', 'name', 'phone_number', 'created_at', 'updated_at']
+))
+
+CUSTOMER_EXISTS = register('customer_exists', """
+    SELECT id FROM customers WHERE id = %s
+""")
+
+# ON CONFLICT makes the uniqueness check and the insert one atomic
+# statement, so concurrent creates with the same code can't race.
+CUSTOMER_INSERT = register('customer_insert', """
+    INSERT INTO customers (code, name, phone_number)
+    VALUES (%s, %s, %s)
+    ON CONFLICT (code) DO NOTHING
+    RETURNING id, code, name, phone_number, created_at, updated_at
+""")
+
+# CUSTOMER_INSERT for parallel arrays of codes, names and phone numbers
+# (the bulk endpoint); a code that exists, or repeats, is inserted once.
+CUSTOMER_INSERT_MANY = register('customer_insert_many', """
+    INSERT INTO customers (code, name, phone_number)
+    SELECT * FROM unnest(%s::varchar[], %s::varchar[], %s::varchar[])
+    ON CONFLICT (code) DO NOTHING
+    RETURNING id, code, name, phone_number, created_at, updated_at
+""")
+
+# Upsert by code for the bulk endpoint, from the same arrays. Rows whose
+# name and phone number are already the same are left alone (no new row
+# version, no entry in the changes feed) and come back as unchanged; xmax
+# is 0 only for rows this statement inserted. The codes must be distinct:
+# ON CONFLICT can't touch a row twice in one statement.
+CUSTOMER_UPSERT_MANY = register('customer_upsert_many', """
+    WITH input AS (
+        SELECT * FROM unnest(%s::varchar[], %s::varchar[], %s::varchar[]) AS t(code, name, phone_number)
+    ), upserted AS (
+        INSERT INTO customers (code, name, phone_number)
+        SELECT code, name, phone_number FROM input
+        ON CONFLICT (code) DO UPDATE
+        SET name = excluded.name,
+            phone_number = excluded.phone_number,
+            updated_at = CURRENT_TIMESTAMP
+        WHERE (customers.name, customers.phone_number)
+            IS DISTINCT FROM (excluded.name, excluded.phone_number)
+        RETURNING id, code, xmax = 0 AS inserted
+    )
+    SELECT input.code,
+           coalesce(upserted.id, existing.id) AS id,
+           CASE WHEN upserted.inserted THEN 'created'
+                WHEN upserted.id IS NOT NULL THEN 'updated'
+                ELSE 'unchanged' END AS status
+    FROM input
+    LEFT JOIN upserted ON upserted.code = input.code
+    LEFT JOIN customers existing ON existing.code = input.code AND upserted.id IS NULL
+""")
+
+# One statement for any subset of fields: each field comes as a
+# (set it?, value) pair, so a partial update still reuses a single plan.
+CUSTOMER_UPDATE = register('customer_update', """
+    UPDATE customers
+    SET code = CASE WHEN %s THEN %s ELSE code END,
+        name = CASE WHEN %s THEN %s ELSE name END,
+        phone_number = CASE WHEN %s THEN %s ELSE phone_number END,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE id = %s
+    RETURNING id, code, name, phone_number, created_at, updated_at
+""")
+
+# The customer's orders go with it (ON DELETE CASCADE). They are read from
+# the statement's snapshot, taken before the delete, so that an
+# order.deleted webhook can be sent for each: one row per order, a single
+# row with NULL order columns for a customer without orders, or no rows.
+CUSTOMER_DELETE = register('customer_delete', """
+    WITH deleted AS (
+        DELETE FROM customers WHERE id = %s RETURNING id
+    )
+    SELECT deleted.id, o.id AS order_id, o.customer_id, o.item, o.amount, o.order_time, o.created_at
+    FROM deleted
+    LEFT JOIN orders o ON o.customer_id = deleted.id
+""")
+
+# The same reads returning the response body built by PostgreSQL, for
+# DB_JSON_RESPONSES. See core.db.jsonsql.
+CUSTOMER_JSON_COLUMNS_SQL = f"""
+    id, code, name, phone_number,
+    {utc_timestamp('created_at')} as created_at,
+    {utc_timestamp('updated_at')} as updated_at
+"""
+
+CUSTOMER_LIST_JSON = register('customer_list_json', json_array(f"""
+    SELECT {CUSTOMER_JSON_COLUMNS_SQL}
+    FROM customers
+    ORDER BY customers.created_at DESC
+"""))
+
+CUSTOMER_DETAIL_JSON = register('customer_detail_json', json_object(f"""
+    SELECT {CUSTOMER_JSON_COLUMNS_SQL}
+    FROM customers
+    WHERE id = %s
+"""))
+
+UPDATABLE_FIELDS = ['code', 'name', 'phone_number']
+
+
+def deleted_orders(rows):
+    """The orders in CUSTOMER_DELETE's rows, shaped like ORDER_DELETE's"""
+    return [
+        {
+            'id': row['order_id'], 'customer_id': row['customer_id'], 'item': row['item'],
+            'amount': row['amount'], 'order_time': row['order_time'], 'created_at': row['created_at'],
+        }
+        for row in rows if row['order_id'] is not None
+    ]
+
+
+def customer_update_params(data, pk):
+    """Parameters for CUSTOMER_UPDATE from the fields present in ``data``"""
+    params = []
+    for field in UPDATABLE_FIELDS:
+        params += [field in data, data.get(field)]
+    return params + [pk]
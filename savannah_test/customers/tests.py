@@ -1,5 +1,7 @@
+import json
 import uuid
-from django.test import TestCase, TransactionTestCase
+from io import BytesIO
+from django.test import TestCase, TransactionTestCase, override_settings
 from django.urls import reverse
 from django.contrib.auth.models import User
 from rest_framework.test import APITestCase, APIClient
@@ -7,6 +9,9 @@ from rest_framework import status
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.db import connections
 
+from core.parsers import MessagePackParser
+from webhooks.tests import WEBHOOK_TABLES
+
 
 class CustomerAPITestCase(APITestCase):
     """Test cases for Customer API endpoints"""
@@ -62,6 +67,40 @@ class CustomerAPITestCase(APITestCase):
         }
         
         self.test_customer_id = self._create_test_customer()
+        self._create_sync_tables()
+        with connections['default'].cursor() as cursor:
+            for statement in WEBHOOK_TABLES:
+                cursor.execute(statement)
+
+    def _create_sync_tables(self):
+        """Create the tombstones table and triggers used by incremental sync"""
+        with connections['default'].cursor() as cursor:
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS tombstones (
+                    entity VARCHAR(20) NOT NULL,
+                    id UUID NOT NULL,
+                    deleted_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (entity, id)
+                )
+            """)
+            cursor.execute("""
+                CREATE OR REPLACE FUNCTION record_tombstones() RETURNS TRIGGER AS $$
+                BEGIN
+                    IF current_setting('sync.skip_tombstones', true) = 'on' THEN RETURN NULL; END IF;
+                    INSERT INTO tombstones (entity, id)
+                    SELECT TG_ARGV[0], id FROM deleted_rows
+                    ON CONFLICT (entity, id) DO UPDATE SET deleted_at = EXCLUDED.deleted_at;
+                    RETURN NULL;
+                END;
+                $$ LANGUAGE plpgsql
+            """)
+            for table, entity in [('customers', 'customer'), ('orders', 'order')]:
+                cursor.execute(f"DROP TRIGGER IF EXISTS record_{entity}_tombstones ON {table}")
+                cursor.execute(f"""
+                    CREATE TRIGGER record_{entity}_tombstones
+                    AFTER DELETE ON {table} REFERENCING OLD TABLE AS deleted_rows
+                    FOR EACH STATEMENT EXECUTE FUNCTION record_tombstones('{entity}')
+                """)
     
     def _create_test_customer(self):
         """Helper method to create a test customer in the database"""
@@ -123,6 +162,77 @@ class CustomerAPITestCase(APITestCase):
         self.assertIn('error', response.data)
         self.assertIn('already exists', response.data['error'])
     
+    @override_settings(BULK_CHUNK_SIZE=2)
+    def test_bulk_create_customers(self):
+        """Test bulk creation with duplicate codes and invalid elements reported by index"""
+        self.client.post(reverse('customer-list'), self.customer_data, format='json')
+        customers = [
+            {'code': 'BULK001', 'name': 'Bulk One', 'phone_number': '+254711111111'},
+            {'code': 'CUST001', 'name': 'Existing', 'phone_number': '+254722222222'},
+            {'code': 'BULK002', 'name': 'Bulk Two', 'phone_number': '+254733333333'},
+            {'code': 'BULK002', 'name': 'Bulk Two again', 'phone_number': '+254733333333'},
+            {'code': 'BULK003', 'name': 'No phone'},
+        ]
+        response = self.client.post(
+            reverse('customer-bulk'), json.dumps(customers), content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(response.data['error_count'], 3)
+        self.assertEqual(
+            [(error['index'], error['error']) for error in response.data['errors']],
+            [
+                (1, 'Customer code already exists'),
+                (3, 'Customer code already exists'),
+                (4, 'phone_number must be a string of 1 to 20 characters'),
+            ]
+        )
+        with connections['default'].cursor() as cursor:
+            cursor.execute("SELECT code, name FROM customers WHERE code LIKE 'BULK%%' ORDER BY code")
+            self.assertEqual(cursor.fetchall(), [('BULK001', 'Bulk One'), ('BULK002', 'Bulk Two')])
+
+        response = self.client.post(reverse('customer-bulk'), '[{"code": "BULK004"', content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['created'], 0)
+
+    @override_settings(BULK_CHUNK_SIZE=3)
+    def test_bulk_upsert_customers(self):
+        """Test that PUT upserts by code and reports created, updated and unchanged records"""
+        existing = self.client.post(reverse('customer-list'), self.customer_data, format='json').data
+        customers = [
+            dict(self.customer_data),
+            {'code': 'BULK001', 'name': 'Bulk One', 'phone_number': '+254711111111'},
+            {'code': 'BULK001', 'name': 'Bulk One Renamed', 'phone_number': '+254711111111'},
+            {'code': 'CUST001', 'name': 'John Updated', 'phone_number': '+254712345678'},
+            {'code': 'BULK002', 'name': ''},
+        ]
+        url = reverse('customer-bulk')
+        response = self.client.put(url, json.dumps(customers), content_type='application/json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(result['index'], result['code'], result['status']) for result in response.data['results']],
+            [(0, 'CUST001', 'unchanged'), (1, 'BULK001', 'created'), (2, 'BULK001', 'updated'), (3, 'CUST001', 'updated')]
+        )
+        self.assertEqual(response.data['results'][0]['id'], existing['id'])
+        self.assertEqual(
+            (response.data['created'], response.data['updated'], response.data['unchanged']), (1, 2, 1)
+        )
+        self.assertEqual([error['index'] for error in response.data['errors']], [4])
+        with connections['default'].cursor() as cursor:
+            cursor.execute("SELECT code, name FROM customers WHERE code IN ('BULK001', 'CUST001') ORDER BY code")
+            self.assertEqual(cursor.fetchall(), [('BULK001', 'Bulk One Renamed'), ('CUST001', 'John Updated')])
+            # A no-op update would still write a new row version, at a new ctid
+            cursor.execute("SELECT ctid::text FROM customers WHERE code = 'CUST001'")
+            ctid = cursor.fetchone()[0]
+
+        response = self.client.put(url, json.dumps(customers[3:4]), content_type='application/json')
+        self.assertEqual(response.data['results'][0]['status'], 'unchanged')
+        with connections['default'].cursor() as cursor:
+            cursor.execute("SELECT ctid::text FROM customers WHERE code = 'CUST001'")
+            self.assertEqual(cursor.fetchone()[0], ctid)
+
     def test_list_customers(self):
         """Test listing all customers"""
         url = reverse('customer-list')
@@ -145,6 +255,91 @@ class CustomerAPITestCase(APITestCase):
         self.assertEqual(response.data['name'], 'Test Customer')
         self.assertEqual(response.data['phone_number'], '+254700000000')
     
+    def test_multi_get_customers(self):
+        """Test that ?codes=, ?ids= and POST lookup/ return customers in request order"""
+        response = self.client.get(reverse('customer-list'), {'codes': 'NOPE,TESTCUST'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([customer['code'] for customer in response.data['customers']], ['TESTCUST'])
+        self.assertEqual(response.data['missing'], ['NOPE'])
+
+        response = self.client.post(
+            reverse('customer-lookup'), {'ids': [str(self.test_customer_id)]}, format='json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['customers'][0]['name'], 'Test Customer')
+        self.assertEqual(response.data['missing'], [])
+
+        response = self.client.get(reverse('customer-list'), {'codes': 'TESTCUST', 'ids': str(self.test_customer_id)})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_customer_recent_orders(self):
+        """Test ?include=recent_orders on customer detail and list, newest first and limited"""
+        with connections['default'].cursor() as cursor:
+            for days, item in enumerate(['Newest', 'Middle', 'Oldest']):
+                cursor.execute(
+                    "INSERT INTO orders (customer_id, item, amount, order_time) "
+                    "VALUES (%s, %s, 10.00, NOW() - make_interval(days => %s))",
+                    [self.test_customer_id, item, days]
+                )
+
+        url = reverse('customer-detail', args=[self.test_customer_id])
+        response = self.client.get(url, {'include': 'recent_orders', 'limit': 2})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['code'], 'TESTCUST')
+        self.assertEqual([order['item'] for order in response.data['recent_orders']], ['Newest', 'Middle'])
+
+        self.client.post(reverse('customer-list'), self.customer_data, format='json')
+        response = self.client.get(reverse('customer-list'), {'include': 'recent_orders'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        customers = {customer['code']: customer for customer in response.data}
+        self.assertEqual(len(customers['TESTCUST']['recent_orders']), 3)
+        self.assertEqual(customers['CUST001']['recent_orders'], [])
+
+        for params in ({'include': 'orders'}, {'include': 'recent_orders', 'limit': 0}):
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(SYNC_SETTLE_SECONDS=0)
+    def test_customer_changes(self):
+        """Test paging customer changes with a cursor, and tombstones for cascaded deletes"""
+        self.client.post(reverse('customer-list'), self.customer_data, format='json')
+        with connections['default'].cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO orders (customer_id, item, amount) VALUES (%s, 'Synced', 1.00) RETURNING id",
+                [self.test_customer_id]
+            )
+            order_id = str(cursor.fetchone()[0])
+        url = reverse('customer-changes')
+
+        response = self.client.get(url, {'limit': 1})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['customers']), 1)
+        self.assertTrue(response.data['has_more'])
+
+        response = self.client.get(url, {'cursor': response.data['next_cursor']})
+        self.assertEqual(len(response.data['customers']), 1)
+        self.assertFalse(response.data['has_more'])
+        cursor = response.data['next_cursor']
+
+        self.client.delete(reverse('customer-detail', args=[self.test_customer_id]))
+        response = self.client.get(url)
+        self.assertEqual(response.data['deleted'], [str(self.test_customer_id)])
+        self.assertEqual([customer['code'] for customer in response.data['customers']], ['CUST001'])
+        response = self.client.get(reverse('order-changes'))
+        self.assertEqual(response.data['deleted'], [order_id])
+        self.assertEqual(response.data['orders'], [])
+
+        response = self.client.get(url, {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(url, {'updated_since': '2000-01-01T00:00:00Z'})
+        self.assertEqual(response.status_code, status.HTTP_410_GONE)
+        response = self.client.get(url, {'cursor': cursor, 'limit': 0})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_get_customer_detail_not_found(self):
         """Test retrieving a non-existent customer"""
         fake_id = str(uuid.uuid4())
@@ -264,4 +459,67 @@ class CustomerViewTestCase(TestCase):
             actual_columns = [col[0] for col in columns]
             
             for expected_col in expected_columns:
-                self.assertIn(expected_col, actual_columns)
\ No newline at end of file
+                self.assertIn(expected_col, actual_columns)
+
+class CustomerAsyncAPITestCase(TransactionTestCase):
+    """Test cases for the async (ASGI) customer endpoints"""
+
+    def setUp(self):
+        """Create the tables; asyncpg can't see rows inside a test transaction"""
+        with connections['default'].cursor() as cursor:
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS \"uuid-ossp\"")
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS customers (
+                    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+                    code VARCHAR(50) UNIQUE NOT NULL,
+                    name VARCHAR(100) NOT NULL,
+                    phone_number VARCHAR(20) NOT NULL,
+                    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            cursor.execute("DELETE FROM customers WHERE code = 'ASYNC001'")
+
+    def tearDown(self):
+        with connections['default'].cursor() as cursor:
+            cursor.execute("DELETE FROM customers WHERE code = 'ASYNC001'")
+
+    async def test_create_get_and_delete_customer(self):
+        """Test the async create, retrieve and delete round trip"""
+        from core.db.aio import close_pools
+        try:
+            response = await self.async_client.post(
+                '/api/async/customers/',
+                {'code': 'ASYNC001', 'name': 'Async Customer', 'phone_number': '+254711111111'},
+                content_type='application/json'
+            )
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            customer = response.json()
+            self.assertEqual(customer['code'], 'ASYNC001')
+
+            response = await self.async_client.get(f"/api/async/customers/{customer['id']}/")
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.json(), customer)
+
+            response = await self.async_client.get(
+                f"/api/async/customers/{customer['id']}/", headers={'Accept': 'application/msgpack'}
+            )
+            self.assertEqual(response['Content-Type'], 'application/msgpack')
+            packed = MessagePackParser().parse(BytesIO(response.content))
+            self.assertEqual(str(packed['id']), customer['id'])
+            self.assertEqual(packed['code'], 'ASYNC001')
+
+            response = await self.async_client.delete(f"/api/async/customers/{customer['id']}/")
+            self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+            response = await self.async_client.get(f"/api/async/customers/{customer['id']}/")
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        finally:
+            await close_pools()
+
+    async def test_unauthenticated_access(self):
+        """Test that the async endpoints require authentication"""
+        response = await self.async_client.get(
+            '/api/async/customers/', headers={'X-Disable-Auth': 'true'}
+        )
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
@@ -1,7 +1,13 @@
 from django.urls import path
-from .views import CustomerListView, CustomerDetailView
+from .views import (
+    CustomerListView, CustomerDetailView, CustomerLookupView, CustomerChangesView,
+    CustomerBulkView,
+)
 
 urlpatterns = [
     path('', CustomerListView.as_view(), name='customer-list'),
     path('<uuid:pk>/', CustomerDetailView.as_view(), name='customer-detail'),
+    path('bulk/', CustomerBulkView.as_view(), name='customer-bulk'),
+    path('lookup/', CustomerLookupView.as_view(), name='customer-lookup'),
+    path('changes/', CustomerChangesView.as_view(), name='customer-changes'),
 ]
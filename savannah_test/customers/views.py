@@ -1,29 +1,165 @@
+import uuid
+
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ParseError
 from rest_framework.response import Response
 from django.http import JsonResponse
-from django.db import connections
+from django.db import IntegrityError, connections, transaction
 from django.conf import settings
+from django.utils import timezone
+from core.bulk import BulkResult, chunks
+from core.changes import changes_page, expired, fetch_changes, requested_limit, requested_position
+from core.db.errors import is_unique_violation
+from core.db.jsonsql import DBJSONResponse, db_json_enabled
+from core.db.routing import db_alias_for, mark_read_only
+from core.db.sharding import (
+    connection_for_code, fetch_from_shards, locate, relocate_customer,
+    shard_for_code, sharding_enabled,
+)
+from core.multiget import in_request_order, requested_keys
+from core.parsers import JSONArrayStream, JSONArrayStreamParser
+from customers.queries import (
+    CUSTOMER_CHANGES, CUSTOMER_DELETE, CUSTOMER_DETAIL, CUSTOMER_DETAIL_JSON, CUSTOMER_DETAIL_RECENT_ORDERS,
+    CUSTOMER_EXISTS, CUSTOMER_INSERT, CUSTOMER_INSERT_MANY, CUSTOMER_LIST, CUSTOMER_LIST_JSON,
+    CUSTOMER_LIST_RECENT_ORDERS, CUSTOMER_UPDATE, CUSTOMER_UPSERT_MANY, CUSTOMERS_BY_CODES, CUSTOMERS_BY_IDS,
+    UPDATABLE_FIELDS, customer_update_params, deleted_orders,
+)
+from webhooks.events import ORDER_DELETED, enqueue_many, publish_many, shares_outbox
 
 from rest_framework.views import APIView
 
+
+def requested_customer_keys(request):
+    """
+    (statement, keys, key column) for a multi-get by ?ids= or ?codes= (or
+    the same keys in a POST body), or None. Raises ValueError for bad keys.
+    """
+    ids = requested_keys(request, 'ids', uuid.UUID)
+    codes = requested_keys(request, 'codes')
+    if ids is not None and codes is not None:
+        raise ValueError("Use either ids or codes, not both")
+    if ids is not None:
+        return CUSTOMERS_BY_IDS, ids, 'id'
+    if codes is not None:
+        return CUSTOMERS_BY_CODES, codes, 'code'
+    return None
+
+
+def lookup_customers(request, query, keys, column):
+    """
+    Response for a multi-get: the customers with the given ids or codes in
+    one query, in the order asked for, plus the keys that weren't found
+    """
+    if sharding_enabled():
+        customers = fetch_from_shards(query, [keys])
+    else:
+        with connections[db_alias_for(request)].cursor() as cursor:
+            customers = query.fetchall(cursor, [keys])
+    customers, missing = in_request_order(customers, keys, column)
+    return Response({'customers': customers, 'missing': missing})
+
+
+CUSTOMER_FIELDS = ('id', 'code', 'name', 'phone_number', 'created_at', 'updated_at')
+
+# Column of the *_RECENT_ORDERS statements -> key in each recent order
+RECENT_ORDER_COLUMNS = {
+    'order_id': 'id',
+    'order_item': 'item',
+    'order_amount': 'amount',
+    'order_order_time': 'order_time',
+    'order_created_at': 'created_at',
+}
+
+
+def requested_recent_orders(request):
+    """
+    How many recent orders to include per customer for
+    ?include=recent_orders&limit=N, or None without ?include=. Raises
+    ValueError for other includes or a limit out of range.
+    """
+    include = request.query_params.get('include')
+    if include is None:
+        return None
+    if include != 'recent_orders':
+        raise ValueError(f"Unknown include: {include}. Allowed: recent_orders")
+
+    limit = request.query_params.get('limit')
+    if limit is None:
+        return settings.RECENT_ORDERS_DEFAULT_LIMIT
+    try:
+        limit = int(limit)
+    except ValueError:
+        limit = 0
+    if not 1 <= limit <= settings.RECENT_ORDERS_MAX_LIMIT:
+        raise ValueError(f"limit must be between 1 and {settings.RECENT_ORDERS_MAX_LIMIT}")
+    return limit
+
+
+def with_recent_orders(rows):
+    """
+    Fold the rows of a *_RECENT_ORDERS statement, one per (customer,
+    order), into customers with a ``recent_orders`` list, keeping the order
+    customers first appear in. Customers without orders get an empty list.
+    """
+    customers = {}
+    for row in rows:
+        customer = customers.get(row['id'])
+        if customer is None:
+            customer = customers[row['id']] = {field: row[field] for field in CUSTOMER_FIELDS}
+            customer['recent_orders'] = []
+        if row['order_id'] is not None:
+            customer['recent_orders'].append(
+                {field: row[column] for column, field in RECENT_ORDER_COLUMNS.items()}
+            )
+    return list(customers.values())
+
+
 class CustomerListView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     
-    def get_db_connection(self):
-        return connections['default']
+    def get_db_connection(self, customer_code=None):
+        """Get database connection: the customer's shard, or routed by request"""
+        if customer_code is not None and sharding_enabled():
+            return connection_for_code(customer_code)
+        return connections[db_alias_for(self.request)]
     
     def get(self, request):
+        """
+        List all customers, or only those named by ?ids= or ?codes=.
+        ?include=recent_orders&limit=N adds each customer's latest orders.
+        """
+        try:
+            lookup = requested_customer_keys(request)
+            recent_orders = requested_recent_orders(request)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
         try:
-            query = """
-                SELECT id, code, name, phone_number, created_at, updated_at 
-                FROM customers 
-                ORDER BY created_at DESC
-            """
+            if lookup is not None:
+                return lookup_customers(request, *lookup)
+            
+            if recent_orders is not None:
+                if sharding_enabled():
+                    rows = fetch_from_shards(
+                        CUSTOMER_LIST_RECENT_ORDERS, [recent_orders],
+                        order_by='created_at', descending=True,
+                    )
+                else:
+                    with self.get_db_connection().cursor() as cursor:
+                        rows = CUSTOMER_LIST_RECENT_ORDERS.fetchall(cursor, [recent_orders])
+                return Response(with_recent_orders(rows))
+            
+            if sharding_enabled():
+                customers = fetch_from_shards(CUSTOMER_LIST, order_by='created_at', descending=True)
+                return Response(customers)
+            
+            if db_json_enabled(request):
+                with self.get_db_connection().cursor() as cursor:
+                    return DBJSONResponse(CUSTOMER_LIST_JSON.fetchvalue(cursor))
+            
             with self.get_db_connection().cursor() as cursor:
-                cursor.execute(query)
-                columns = [col[0] for col in cursor.description]
-                customers = [dict(zip(columns, row)) for row in cursor.fetchall()]
+                customers = CUSTOMER_LIST.fetchall(cursor)
             return Response(customers)
         except Exception as e:
             return Response(
@@ -44,29 +180,17 @@ class CustomerListView(APIView):
                         status=status.HTTP_400_BAD_REQUEST
                     )
             
-            check_query = "SELECT id FROM customers WHERE code = %s"
-            with self.get_db_connection().cursor() as cursor:
-                cursor.execute(check_query, [data['code']])
-                existing_customer = cursor.fetchone()
+            with self.get_db_connection(data['code']).cursor() as cursor:
+                customer = CUSTOMER_INSERT.fetchone(
+                    cursor, [data['code'], data['name'], data['phone_number']]
+                )
             
-            if existing_customer:
+            if not customer:
                 return Response(
                     {"error": "Customer code already exists"},
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            insert_query = """
-                INSERT INTO customers (code, name, phone_number) 
-                VALUES (%s, %s, %s) 
-                RETURNING id, code, name, phone_number, created_at, updated_at
-            """
-            
-            with self.get_db_connection().cursor() as cursor:
-                cursor.execute(insert_query, [data['code'], data['name'], data['phone_number']])
-                columns = [col[0] for col in cursor.description]
-                customer_row = cursor.fetchone()
-                customer = dict(zip(columns, customer_row))
-            
             return Response(customer, status=status.HTTP_201_CREATED)
             
         except Exception as e:
@@ -76,34 +200,253 @@ class CustomerListView(APIView):
             )
 
 
+# Column lengths of the customers table
+CUSTOMER_FIELD_LENGTHS = {'code': 50, 'name': 100, 'phone_number': 20}
+
+
+def validate_customer(element):
+    """(code, name, phone_number) of a bulk element; raises ValueError"""
+    if not isinstance(element, dict):
+        raise ValueError("Element must be a JSON object")
+    values = []
+    for field, length in CUSTOMER_FIELD_LENGTHS.items():
+        value = element.get(field)
+        if not isinstance(value, str) or not 0 < len(value.strip()) <= length:
+            raise ValueError(f"{field} must be a string of 1 to {length} characters")
+        values.append(value.strip())
+    return tuple(values)
+
+
+def upsert_rounds(rows):
+    """
+    Split (index, code, name, phone_number) rows into lists with distinct
+    codes, the nth occurrence of a code in the nth list, so that running
+    them in order applies repeated codes in the order they were sent
+    """
+    rounds, seen = [], {}
+    for row in rows:
+        occurrence = seen[row[1]] = seen.get(row[1], -1) + 1
+        if occurrence == len(rounds):
+            rounds.append([])
+        rounds[occurrence].append(row)
+    return rounds
+
+
+class CustomerBulkView(APIView):
+    """Create or upsert customers from a JSON array of any length (see core.bulk)"""
+    permission_classes = [permissions.IsAuthenticated]
+    parser_classes = [JSONArrayStreamParser]
+    
+    def insert_chunk(self, request, start, chunk, result):
+        """Validate and insert one chunk, one CUSTOMER_INSERT_MANY per database"""
+        by_alias, failed = {}, {}
+        for index, element in enumerate(chunk, start):
+            try:
+                customer = validate_customer(element)
+            except ValueError as e:
+                failed[index] = str(e)
+                continue
+            alias = shard_for_code(customer[0]) if sharding_enabled() else db_alias_for(request)
+            by_alias.setdefault(alias, []).append((index, *customer))
+        
+        for alias, rows in by_alias.items():
+            indexes, codes, names, phone_numbers = (list(column) for column in zip(*rows))
+            with connections[alias].cursor() as cursor:
+                created = {
+                    customer['code'] for customer in
+                    CUSTOMER_INSERT_MANY.fetchall(cursor, [codes, names, phone_numbers])
+                }
+            result.add('created', len(created))
+            for index, code in zip(indexes, codes):
+                # A code repeated in the chunk is created by its first element
+                if code in created:
+                    created.discard(code)
+                else:
+                    failed[index] = "Customer code already exists"
+        
+        for index in sorted(failed):
+            result.error(index, failed[index])
+    
+    def upsert_chunk(self, request, start, chunk, result):
+        """Validate and upsert one chunk, one CUSTOMER_UPSERT_MANY per database and round"""
+        by_alias, failed, upserted = {}, {}, {}
+        for index, element in enumerate(chunk, start):
+            try:
+                customer = validate_customer(element)
+            except ValueError as e:
+                failed[index] = str(e)
+                continue
+            alias = shard_for_code(customer[0]) if sharding_enabled() else db_alias_for(request)
+            by_alias.setdefault(alias, []).append((index, *customer))
+        
+        for alias, rows in by_alias.items():
+            for batch in upsert_rounds(rows):
+                indexes, codes, names, phone_numbers = (list(column) for column in zip(*batch))
+                with connections[alias].cursor() as cursor:
+                    by_code = {
+                        row['code']: row for row in
+                        CUSTOMER_UPSERT_MANY.fetchall(cursor, [codes, names, phone_numbers])
+                    }
+                for index, code in zip(indexes, codes):
+                    upserted[index] = by_code[code]
+        
+        for index in sorted(failed.keys() | upserted.keys()):
+            if index in failed:
+                result.error(index, failed[index])
+            else:
+                row = upserted[index]
+                result.record(index, row['status'], code=row['code'], id=row['id'])
+    
+    def post(self, request):
+        """
+        Create the customers in a JSON array of {code, name, phone_number}
+        objects, BULK_CHUNK_SIZE at a time as the body arrives. Returns how
+        many were created and the elements that were not.
+        """
+        elements = request.data
+        if not isinstance(elements, JSONArrayStream):
+            return Response({"error": "Body must be a JSON array"}, status=status.HTTP_400_BAD_REQUEST)
+        
+        result = BulkResult('created')
+        try:
+            for start, chunk in chunks(elements):
+                self.insert_chunk(request, start, chunk, result)
+            return Response(result.body())
+        except ParseError as e:
+            return Response(
+                {"error": str(e.detail), **result.body()},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        except Exception as e:
+            return Response(
+                {"error": f"Failed to create customers: {str(e)}", **result.body()},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+    
+    def put(self, request):
+        """
+        Create or update, by code, the customers in a JSON array of {code,
+        name, phone_number} objects, BULK_CHUNK_SIZE at a time as the body
+        arrives. Returns counts and each element's status: created, updated,
+        or unchanged when the stored name and phone number already match.
+        """
+        elements = request.data
+        if not isinstance(elements, JSONArrayStream):
+            return Response({"error": "Body must be a JSON array"}, status=status.HTTP_400_BAD_REQUEST)
+        
+        result = BulkResult('created', 'updated', 'unchanged', results=True)
+        try:
+            for start, chunk in chunks(elements):
+                self.upsert_chunk(request, start, chunk, result)
+            return Response(result.body())
+        except ParseError as e:
+            return Response(
+                {"error": str(e.detail), **result.body()},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        except Exception as e:
+            return Response(
+                {"error": f"Failed to upsert customers: {str(e)}", **result.body()},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
+class CustomerLookupView(APIView):
+    """Multi-get for more keys than fit in a URL"""
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def post(self, request):
+        """Get the customers listed in {"ids": [...]} or {"codes": [...]}"""
+        try:
+            lookup = requested_customer_keys(request)
+            if lookup is None:
+                raise ValueError("Missing required field: ids or codes")
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            mark_read_only(request)
+            return lookup_customers(request, *lookup)
+        except Exception as e:
+            return Response(
+                {"error": f"Failed to fetch customers: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
+class CustomerChangesView(APIView):
+    """Customers changed or deleted since a cursor, for incremental sync"""
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get(self, request):
+        """
+        One page of changes after ?cursor= (or ?updated_since=, or from the
+        start), oldest first: {"customers": [...], "deleted": [ids],
+        "next_cursor": ..., "has_more": ...}
+        """
+        try:
+            position = requested_position(request)
+            limit = requested_limit(request)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if expired(position):
+            return Response(
+                {"error": "Cursor is older than the tombstone retention; sync from scratch"},
+                status=status.HTTP_410_GONE
+            )
+        
+        try:
+            rows = fetch_changes(CUSTOMER_CHANGES, position, limit)
+            return Response(changes_page(rows, 'customers', position, limit))
+        except Exception as e:
+            return Response(
+                {"error": f"Failed to fetch customer changes: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
 class CustomerDetailView(APIView):
     """Retrieve, update or delete a customer"""
     permission_classes = [permissions.IsAuthenticated]
     
-    def get_db_connection(self):
-        """Get database connection using settings configuration"""
-        return connections['default']
+    def get_db_connection(self, alias=None):
+        """Get database connection: a specific shard, or routed by request"""
+        return connections[alias or db_alias_for(self.request)]
     
     def get(self, request, pk):
-        """Get a specific customer"""
+        """Get a specific customer, with ?include=recent_orders&limit=N its latest orders"""
         try:
-            query = """
-                SELECT id, code, name, phone_number, created_at, updated_at 
-                FROM customers 
-                WHERE id = %s
-            """
-            with self.get_db_connection().cursor() as cursor:
-                cursor.execute(query, [pk])
-                customer_row = cursor.fetchone()
-                
-                if not customer_row:
-                    return Response(
-                        {"error": "Customer not found"},
-                        status=status.HTTP_404_NOT_FOUND
-                    )
-                
-                columns = [col[0] for col in cursor.description]
-                customer = dict(zip(columns, customer_row))
+            recent_orders = requested_recent_orders(request)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            if recent_orders is not None:
+                params = [recent_orders, pk]
+                if sharding_enabled():
+                    # A customer's orders live on its shard, so one shard has all the rows
+                    rows = fetch_from_shards(CUSTOMER_DETAIL_RECENT_ORDERS, params)
+                else:
+                    with self.get_db_connection().cursor() as cursor:
+                        rows = CUSTOMER_DETAIL_RECENT_ORDERS.fetchall(cursor, params)
+                customer = with_recent_orders(rows)[0] if rows else None
+            elif sharding_enabled():
+                _, customer = locate(CUSTOMER_DETAIL, [pk])
+            elif db_json_enabled(request):
+                with self.get_db_connection().cursor() as cursor:
+                    customer = CUSTOMER_DETAIL_JSON.fetchvalue(cursor, [pk])
+                if customer:
+                    return DBJSONResponse(customer)
+            else:
+                with self.get_db_connection().cursor() as cursor:
+                    customer = CUSTOMER_DETAIL.fetchone(cursor, [pk])
+            
+            if not customer:
+                return Response(
+                    {"error": "Customer not found"},
+                    status=status.HTTP_404_NOT_FOUND
+                )
             
             return Response(customer)
             
@@ -118,59 +461,58 @@ class CustomerDetailView(APIView):
         try:
             data = request.data
             
-            check_query = "SELECT id FROM customers WHERE id = %s"
-            with self.get_db_connection().cursor() as cursor:
-                cursor.execute(check_query, [pk])
-                existing_customer = cursor.fetchone()
-            
-            if not existing_customer:
+            if not any(field in data for field in UPDATABLE_FIELDS):
                 return Response(
-                    {"error": "Customer not found"},
-                    status=status.HTTP_404_NOT_FOUND
+                    {"error": "No fields to update"},
+                    status=status.HTTP_400_BAD_REQUEST
                 )
             
-            if 'code' in data:
-                code_check_query = "SELECT id FROM customers WHERE code = %s AND id != %s"
-                with self.get_db_connection().cursor() as cursor:
-                    cursor.execute(code_check_query, [data['code'], pk])
-                    code_exists = cursor.fetchone()
-                
-                if code_exists:
+            shard = None
+            if sharding_enabled():
+                shard, existing_customer = locate(CUSTOMER_EXISTS, [pk])
+                if not existing_customer:
                     return Response(
-                        {"error": "Customer code already exists"},
-                        status=status.HTTP_400_BAD_REQUEST
+                        {"error": "Customer not found"},
+                        status=status.HTTP_404_NOT_FOUND
                     )
+                
+                code_shard = shard_for_code(data['code']) if 'code' in data else shard
+                if code_shard != shard:
+                    # The new code hashes to another shard: move the customer and
+                    # its orders there instead of updating in place.
+                    updates = {field: data[field] for field in UPDATABLE_FIELDS if field in data}
+                    updates['updated_at'] = timezone.now()
+                    customer = relocate_customer(pk, shard, code_shard, updates)
+                    if not customer:
+                        return Response(
+                            {"error": "Customer not found"},
+                            status=status.HTTP_404_NOT_FOUND
+                        )
+                    return Response(customer)
             
-            update_fields = []
-            update_values = []
-            
-            for field in ['code', 'name', 'phone_number']:
-                if field in data:
-                    update_fields.append(f"{field} = %s")
-                    update_values.append(data[field])
+            # Existence and code uniqueness are decided by the UPDATE itself:
+            # no row back means no such customer, a unique violation means
+            # the code is taken.
+            with self.get_db_connection(shard).cursor() as cursor:
+                customer = CUSTOMER_UPDATE.fetchone(cursor, customer_update_params(data, pk))
             
-            if not update_fields:
+            if not customer:
                 return Response(
-                    {"error": "No fields to update"},
-                    status=status.HTTP_400_BAD_REQUEST
+                    {"error": "Customer not found"},
+                    status=status.HTTP_404_NOT_FOUND
                 )
-            
-            update_values.append(pk)
-            
-            update_query = f"""
-                UPDATE customers 
-                SET {', '.join(update_fields)}, updated_at = CURRENT_TIMESTAMP
-                WHERE id = %s 
-                RETURNING id, code, name, phone_number, created_at, updated_at
-            """
-            
-            with self.get_db_connection().cursor() as cursor:
-                cursor.execute(update_query, update_values)
-                columns = [col[0] for col in cursor.description]
-                customer_row = cursor.fetchone()
-                customer = dict(zip(columns, customer_row))
             return Response(customer)
             
+        except IntegrityError as e:
+            if is_unique_violation(e):
+                return Response(
+                    {"error": "Customer code already exists"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            return Response(
+                {"error": f"Failed to update customer: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
         except Exception as e:
             return Response(
                 {"error": f"Failed to update customer: {str(e)}"},
@@ -180,21 +522,23 @@ class CustomerDetailView(APIView):
     def delete(self, request, pk):
         """Delete a customer"""
         try:
-            check_query = "SELECT id FROM customers WHERE id = %s"
-            with self.get_db_connection().cursor() as cursor:
-                cursor.execute(check_query, [pk])
-                existing_customer = cursor.fetchone()
+            # The orders go with the customer
+            if sharding_enabled():
+                rows = fetch_from_shards(CUSTOMER_DELETE, [pk])
+                publish_many(ORDER_DELETED, deleted_orders(rows))
+            else:
+                alias = db_alias_for(request)
+                with transaction.atomic(using=alias), self.get_db_connection(alias).cursor() as cursor:
+                    rows = CUSTOMER_DELETE.fetchall(cursor, [pk])
+                    if shares_outbox(alias):
+                        enqueue_many(cursor, ORDER_DELETED, deleted_orders(rows))
             
-            if not existing_customer:
+            if not rows:
                 return Response(
                     {"error": "Customer not found"},
                     status=status.HTTP_404_NOT_FOUND
                 )
             
-            delete_query = "DELETE FROM customers WHERE id = %s"
-            with self.get_db_connection().cursor() as cursor:
-                cursor.execute(delete_query, [pk])
-            
             return Response(status=status.HTTP_204_NO_CONTENT)
             
         except Exception as e:
@@ -0,0 +1,57 @@
+"""
+Gunicorn settings for production.
+
+    gunicorn -c gunicorn.conf.py
+
+The app is loaded once in the master (preload_app) so workers share the
+imported code copy-on-write. Each worker then fills its connection pool and
+prepares the hot SQL statements before it accepts a request, and is
+recycled after a bounded number of requests. Every setting can be
+overridden from the environment (GUNICORN_*) or the command line.
+"""
+import multiprocessing
+import os
+
+wsgi_app = 'savannah_test.wsgi:application'
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+
+preload_app = True
+worker_class = 'gthread'
+# Threads release the GIL while waiting on PostgreSQL and the SMS gateway,
+# so a few per worker keep each core busy. Keep DB_POOL_MAX_SIZE >= threads.
+workers = int(os.getenv('GUNICORN_WORKERS', max(2, multiprocessing.cpu_count())))
+threads = int(os.getenv('GUNICORN_THREADS', '4'))
+
+# Recycle workers gradually (the jitter keeps them from restarting together)
+# and let in-flight requests finish on restart or deploy.
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '2000'))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', '200'))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '30'))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', '5'))
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+
+
+def when_ready(server):
+    """Master: import all views before forking, then drop any DB connections"""
+    from core.warmup import close_connections, load_urlconf
+
+    load_urlconf()
+    close_connections()
+
+
+def post_fork(server, worker):
+    """Worker: open pooled connections and prepare statements before serving"""
+    from core.warmup import warm_connections
+
+    warm_connections()
+    server.log.info(f"Worker {worker.pid} warmed its database connections")
+
+
+def worker_exit(server, worker):
+    from core.db.pool import close_all_pools
+
+    close_all_pools()
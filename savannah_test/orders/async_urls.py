@@ -0,0 +1,9 @@
+from django.urls import path
+from .async_views import OrderListAsyncView, OrderDetailAsyncView, OrderByCustomerAsyncView
+
+urlpatterns = [
+    path('', OrderListAsyncView.as_view(), name='order-list-async'),
+    path('<uuid:pk>/', OrderDetailAsyncView.as_view(), name='order-detail-async'),
+    path('by-customer/', OrderByCustomerAsyncView.as_view(), name='order-by-customer-async'),
+    path('customer/<uuid:customer_id>/', OrderByCustomerAsyncView.as_view(), name='orders-by-customer-async'),
+]
@@ -0,0 +1,185 @@
+import asyncio
+import logging
+
+from rest_framework import status
+from core.async_views import AsyncAPIView
+from core.db import aio
+from core.db.errors import is_foreign_key_violation
+from core.db.sharding import shard_for_code, sharding_enabled
+from core.sms_service import send_sms_notification
+from webhooks.events import ORDER_CREATED, ORDER_DELETED, aenqueue, apublish, shares_outbox
+from orders.queries import (
+    CUSTOMER_BY_CODE, CUSTOMER_BY_ID, ORDER_DELETE, ORDER_DETAIL, ORDER_INSERT, ORDER_LIST,
+    ORDERS_BY_CUSTOMER_CODE, ORDERS_BY_CUSTOMER_ID,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _log_sms_failure(future):
+    if not future.cancelled() and future.exception() is not None:
+        logger.error("SMS notification failed", exc_info=future.exception())
+
+
+class OrderListAsyncView(AsyncAPIView):
+    """List all orders or create a new order (async)"""
+
+    async def get(self, request):
+        """Get all orders with customer details"""
+        try:
+            if sharding_enabled():
+                orders = await aio.fetch_from_shards(ORDER_LIST, order_by='order_time', descending=True)
+            else:
+                orders = await aio.fetch(ORDER_LIST, alias=await aio.alias_for(request))
+            return self.respond(orders)
+        except Exception as e:
+            return self.respond(
+                {"error": f"Failed to fetch orders: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+    async def post(self, request):
+        """Create a new order"""
+        data = self.parse_body(request)
+        try:
+            for field in ['customer_code', 'item', 'amount']:
+                if field not in data:
+                    return self.respond(
+                        {"error": f"Missing required field: {field}"},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+
+            if sharding_enabled():
+                alias = shard_for_code(data['customer_code'])
+            else:
+                alias = await aio.alias_for(request)
+            async with aio.transaction(alias) as connection:
+                order_response = await aio.fetchrow(
+                    ORDER_INSERT, [data['customer_code'], data['item'], float(data['amount'])],
+                    alias=alias, connection=connection
+                )
+                if order_response and shares_outbox(alias):
+                    await aenqueue(connection, ORDER_CREATED, order_response)
+
+            if not order_response:
+                return self.respond(
+                    {"error": "Customer not found"},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+
+            # The SMS gateway is a blocking HTTP call; send it from a worker
+            # thread without holding up the response.
+            sms = asyncio.get_running_loop().run_in_executor(None, send_sms_notification, order_response)
+            sms.add_done_callback(_log_sms_failure)
+            if not shares_outbox(alias):
+                await apublish(ORDER_CREATED, order_response)
+
+            return self.respond(order_response, status=status.HTTP_201_CREATED)
+
+        except Exception as e:
+            # The customer was deleted concurrently, after the CTE saw it.
+            if is_foreign_key_violation(e):
+                return self.respond(
+                    {"error": "Customer not found"},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            return self.respond(
+                {"error": f"Failed to create order: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
+class OrderDetailAsyncView(AsyncAPIView):
+    """Retrieve or delete an order (async)"""
+
+    async def get(self, request, pk):
+        """Get a specific order"""
+        try:
+            if sharding_enabled():
+                _, order = await aio.locate(ORDER_DETAIL, [pk])
+            else:
+                order = await aio.fetchrow(ORDER_DETAIL, [pk], alias=await aio.alias_for(request))
+
+            if not order:
+                return self.respond(
+                    {"error": "Order not found"},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+
+            return self.respond(order)
+
+        except Exception as e:
+            return self.respond(
+                {"error": f"Failed to fetch order: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+    async def delete(self, request, pk):
+        """Delete an order"""
+        try:
+            if sharding_enabled():
+                alias, deleted_order = await aio.locate(ORDER_DELETE, [pk])
+            else:
+                alias = await aio.alias_for(request)
+                async with aio.transaction(alias) as connection:
+                    deleted_order = await aio.fetchrow(ORDER_DELETE, [pk], alias=alias, connection=connection)
+                    if deleted_order and shares_outbox(alias):
+                        await aenqueue(connection, ORDER_DELETED, deleted_order)
+
+            if not deleted_order:
+                return self.respond(
+                    {"error": "Order not found"},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+
+            if not shares_outbox(alias):
+                await apublish(ORDER_DELETED, deleted_order)
+            return self.respond(status=status.HTTP_204_NO_CONTENT)
+
+        except Exception as e:
+            return self.respond(
+                {"error": f"Failed to delete order: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
+class OrderByCustomerAsyncView(AsyncAPIView):
+    """Get orders by customer ID or customer code (async)"""
+
+    async def get(self, request, customer_id=None):
+        """Get orders by customer ID or customer code"""
+        try:
+            alias = await aio.alias_for(request)
+            if customer_id:
+                if sharding_enabled():
+                    alias, customer = await aio.locate(CUSTOMER_BY_ID, [customer_id])
+                else:
+                    customer = await aio.fetchrow(CUSTOMER_BY_ID, [customer_id], alias=alias)
+                orders_query, query_param = ORDERS_BY_CUSTOMER_ID, customer_id
+            else:
+                customer_code = request.GET.get('customer_code')
+                if not customer_code:
+                    return self.respond(
+                        {"error": "customer_code parameter is required"},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+
+                if sharding_enabled():
+                    alias = shard_for_code(customer_code)
+                customer = await aio.fetchrow(CUSTOMER_BY_CODE, [customer_code], alias=alias)
+                orders_query, query_param = ORDERS_BY_CUSTOMER_CODE, customer_code
+
+            if not customer:
+                return self.respond(
+                    {"error": "Customer not found"},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+
+            orders = await aio.fetch(orders_query, [query_param], alias=alias)
+            return self.respond(orders)
+
+        except Exception as e:
+            return self.respond(
+                {"error": f"Failed to fetch orders: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
@@ -0,0 +1,154 @@
+"""
+Opt-in group commit for order creation (ORDER_GROUP_COMMIT).
+
+Every order created on its own is a one-row transaction, and under a burst
+of POST /api/orders/ calls the database spends its time flushing WAL for
+each commit. With group commit the request threads hand their rows to one
+writer thread per database alias, which inserts everything that arrived
+within ORDER_GROUP_COMMIT_WINDOW_MS of the first row (or as soon as
+ORDER_GROUP_COMMIT_MAX_ROWS are waiting) with a single ORDER_INSERT_MANY:
+one statement and one commit for the whole batch. Rows that arrive while a
+batch is being written wait for the next one.
+
+Order ids are generated here, so each caller gets back the row with its
+own id, or None when its customer doesn't exist. If the batch statement
+fails, e.g. one amount is out of range or a customer was deleted
+concurrently, the batch is retried one row at a time so that the error
+reaches only the callers it belongs to.
+
+On the primary the batch's order.created webhook deliveries are queued in
+the same transaction as its rows (see webhooks.events), so callers there
+don't publish them again.
+
+A caller waits at most the window plus the time to write one batch and
+whatever batch was already in flight.
+"""
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.db import connections, transaction
+
+from orders.queries import ORDER_INSERT, ORDER_INSERT_MANY
+from webhooks.events import ORDER_CREATED, enqueue_many, shares_outbox
+
+logger = logging.getLogger(__name__)
+
+_committers = {}
+_committers_lock = threading.Lock()
+
+
+class GroupCommitter:
+    """Writer thread batching the order inserts for one database alias"""
+
+    def __init__(self, alias, window=None, max_rows=None):
+        self.alias = alias
+        self.window = (settings.ORDER_GROUP_COMMIT_WINDOW_MS if window is None else window) / 1000
+        self.max_rows = max_rows or settings.ORDER_GROUP_COMMIT_MAX_ROWS
+        self.queues_events = shares_outbox(alias)
+        self._pending = []
+        self._first_at = None
+        self._condition = threading.Condition()
+        self._thread = None
+        self.batches = 0
+        self.rows = 0
+
+    def submit(self, customer_code, item, amount):
+        """Queue an order; the Future resolves to its row, or None without a customer"""
+        future = Future()
+        with self._condition:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name=f'group-commit-{self.alias}', daemon=True
+                )
+                self._thread.start()
+            if not self._pending:
+                self._first_at = time.monotonic()
+            self._pending.append((uuid.uuid4(), customer_code, item, amount, future))
+            if len(self._pending) == 1 or len(self._pending) >= self.max_rows:
+                self._condition.notify()
+        return future
+
+    def insert(self, customer_code, item, amount):
+        """Insert an order with the next batch and wait for it; ORDER_INSERT's result"""
+        return self.submit(customer_code, item, amount).result()
+
+    def _next_batch(self):
+        with self._condition:
+            while not self._pending:
+                self._condition.wait()
+            deadline = self._first_at + self.window
+            while len(self._pending) < self.max_rows:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            # Rows left over have waited for this batch already, so
+            # _first_at stays put and they go out with the next one at once.
+            batch, self._pending = self._pending[:self.max_rows], self._pending[self.max_rows:]
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                self.write(batch)
+            except Exception as e:
+                logger.exception("Group commit of %d orders failed", len(batch))
+                for *_, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            finally:
+                connections[self.alias].close_if_unusable_or_obsolete()
+
+    def write(self, batch):
+        """Insert ``batch`` in one statement, or row by row if that fails"""
+        ids, codes, items, amounts, futures = zip(*batch)
+        try:
+            with transaction.atomic(using=self.alias), connections[self.alias].cursor() as cursor:
+                rows = ORDER_INSERT_MANY.fetchall(
+                    cursor, [list(ids), list(codes), list(items), list(amounts), [None] * len(batch)]
+                )
+                self._queue_events(cursor, rows)
+        except Exception as e:
+            if len(batch) == 1:
+                futures[0].set_exception(e)
+                return
+            logger.warning("Group commit of %d orders failed, retrying one by one: %s", len(batch), e)
+            connections[self.alias].close_if_unusable_or_obsolete()
+            for _, customer_code, item, amount, future in batch:
+                try:
+                    with transaction.atomic(using=self.alias), connections[self.alias].cursor() as cursor:
+                        row = ORDER_INSERT.fetchone(cursor, [customer_code, item, amount])
+                        self._queue_events(cursor, [row] if row else [])
+                    future.set_result(row)
+                except Exception as error:
+                    future.set_exception(error)
+            return
+
+        with self._condition:
+            self.batches += 1
+            self.rows += len(rows)
+        by_id = {row['id']: row for row in rows}
+        for order_id, future in zip(ids, futures):
+            future.set_result(by_id.get(order_id))
+
+    def _queue_events(self, cursor, rows):
+        if self.queues_events:
+            enqueue_many(cursor, ORDER_CREATED, rows)
+
+
+def get_committer(alias):
+    """This process's GroupCommitter for ``alias``"""
+    with _committers_lock:
+        if alias not in _committers:
+            _committers[alias] = GroupCommitter(alias)
+        return _committers[alias]
+
+
+def insert_order(alias, customer_code, item, amount):
+    """ORDER_INSERT on ``alias``, sharing a statement and commit with concurrent calls"""
+    return get_committer(alias).insert(customer_code, item, amount)
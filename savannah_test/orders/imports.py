@@ -0,0 +1,416 @@
+"""
+Bulk order imports from CSV or NDJSON files (POST /api/orders/imports/).
+
+The upload is streamed to a file in IMPORT_DIR and an import_jobs row is
+queued; nothing else happens in the request. `manage.py
+process_order_imports` then works through the queued jobs:
+
+- the file is parsed as a stream, IMPORT_CHUNK_ROWS records at a time;
+- each chunk is validated, in IMPORT_VALIDATION_PROCESSES worker
+  processes when set, while the next one is parsed;
+- the chunk's customer codes are resolved with one ``code = ANY(%s)``
+  lookup, skipping the ones already known;
+- the valid rows are COPYed into a temporary staging table and moved into
+  orders with one INSERT ... SELECT, in the same transaction that records
+  the chunk's rejects and the job's progress. Rows whose customer was
+  deleted after the lookup are rejected like unknown customers, so
+  imported plus rejected rows always add up to the rows read.
+
+Every record gets a fixed order id derived from the job id and its row
+number, and the INSERT skips ids that exist. A job taken over from a dead
+worker (no progress for IMPORT_STALE_SECONDS) therefore resumes after the
+last saved chunk without importing anything twice.
+
+Imported orders are not sent to /api/orders/stream/ or to webhooks; they
+do show up in /api/orders/changes/.
+
+Records have customer_code, item and amount, and optionally order_time
+(ISO 8601; the import time when empty). CSV files need a header line.
+"""
+import csv
+import io
+import json
+import logging
+import os
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timezone as dt_timezone
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils.dateparse import parse_datetime
+from django.utils.timezone import is_naive, make_aware
+
+from core.db.routing import PRIMARY_ALIAS
+from core.db.sharding import shard_for_code, sharding_enabled
+from core.renderers import orjson
+from orders.queries import (
+    CUSTOMER_IDS_BY_CODES, IMPORT_JOB_CLAIM, IMPORT_JOB_FINISH, IMPORT_JOB_INSERT, IMPORT_JOB_PROGRESS,
+)
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ('csv', 'ndjson')
+
+# Content-Type of a raw upload -> format
+CONTENT_TYPES = {
+    'text/csv': 'csv',
+    'application/x-ndjson': 'ndjson',
+    'application/jsonl': 'ndjson',
+}
+
+REQUIRED_FIELDS = ('customer_code', 'item', 'amount')
+
+MAX_AMOUNT = Decimal('99999999.99')
+
+# Stored form of a rejected record is cut to this many characters
+MAX_REJECT_DATA = 1000
+
+# Customer ids kept between chunks, per database alias
+CUSTOMER_CACHE_SIZE = 100000
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+STAGING_SQL = """
+    CREATE TEMPORARY TABLE IF NOT EXISTS import_staging (
+        id UUID,
+        customer_id UUID,
+        item VARCHAR(200),
+        amount DECIMAL(10, 2),
+        order_time TIMESTAMP WITH TIME ZONE
+    ) ON COMMIT DELETE ROWS
+"""
+
+# Moves the staged rows into orders and returns the ids of those whose
+# customer is gone, deleted since its id was looked up
+LOAD_SQL = """
+    WITH staged AS (
+        SELECT s.id, s.customer_id, s.item, s.amount, s.order_time, c.id IS NULL AS unknown
+        FROM import_staging s
+        LEFT JOIN customers c ON c.id = s.customer_id
+    ), inserted AS (
+        INSERT INTO orders (id, customer_id, item, amount, order_time)
+        SELECT id, customer_id, item, amount, coalesce(order_time, now())
+        FROM staged
+        WHERE NOT unknown
+        ON CONFLICT (id) DO NOTHING
+    )
+    SELECT id FROM staged WHERE unknown
+"""
+
+REJECT_SQL = """
+    INSERT INTO import_rejects (job_id, row_number, error, data)
+    VALUES (%s, %s, %s, %s)
+    ON CONFLICT DO NOTHING
+"""
+
+
+class ImportFileError(Exception):
+    """The file can't be imported at all, e.g. a CSV header is missing a column"""
+
+
+def store_upload(chunks, file_format):
+    """
+    Write the uploaded ``chunks`` (bytes) to IMPORT_DIR and queue a job
+    for them; returns the job. Only copies bytes, so it costs what
+    receiving the upload costs.
+    """
+    job_id = uuid.uuid4()
+    os.makedirs(settings.IMPORT_DIR, exist_ok=True)
+    path = os.path.join(settings.IMPORT_DIR, f'{job_id}.{file_format}')
+    size = 0
+    try:
+        with open(path, 'wb') as file:
+            for chunk in chunks:
+                file.write(chunk)
+                size += len(chunk)
+        with connections[PRIMARY_ALIAS].cursor() as cursor:
+            return IMPORT_JOB_INSERT.fetchone(cursor, [job_id, file_format, path, size])
+    except BaseException:
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+
+
+class _CountingLines:
+    """Lines of a binary file as text, counting the bytes consumed"""
+
+    def __init__(self, file):
+        self.file = file
+        self.bytes_read = 0
+
+    def __iter__(self):
+        for number, line in enumerate(self.file):
+            self.bytes_read += len(line)
+            text = line.decode('utf-8', errors='replace')
+            yield text.lstrip('\ufeff') if number == 0 else text
+
+
+def _csv_records(lines):
+    reader = csv.DictReader(lines)
+    missing = [field for field in REQUIRED_FIELDS if field not in (reader.fieldnames or [])]
+    if missing:
+        raise ImportFileError(f"CSV header is missing: {', '.join(missing)}")
+    for record in reader:
+        yield record, None
+
+
+def _json_loads(line):
+    return orjson.loads(line) if orjson is not None else json.loads(line)
+
+
+def _json_dumps(data):
+    """Compact JSON of a rejected row; values JSON has no type for become strings"""
+    if orjson is not None:
+        return orjson.dumps(data, default=str, option=orjson.OPT_NON_STR_KEYS).decode()
+    return json.dumps(data, default=str, ensure_ascii=False, separators=(',', ':'))
+
+
+def _ndjson_records(lines):
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            record = _json_loads(line)
+        except ValueError:
+            yield line.rstrip('\r\n'), "Invalid JSON"
+            continue
+        if not isinstance(record, dict):
+            yield line.rstrip('\r\n'), "Expected a JSON object"
+            continue
+        yield record, None
+
+
+def read_chunks(file, file_format, skip=0, chunk_rows=None):
+    """
+    Chunks of (row_number, record, parse error) from an open binary
+    file, after the first ``skip`` records, each with the number of
+    bytes consumed by the end of it
+    """
+    chunk_rows = chunk_rows or settings.IMPORT_CHUNK_ROWS
+    lines = _CountingLines(file)
+    records = enumerate((_csv_records if file_format == 'csv' else _ndjson_records)(lines), start=1)
+    for _ in islice(records, skip):
+        pass
+    while True:
+        chunk = [(number, record, error) for number, (record, error) in islice(records, chunk_rows)]
+        if not chunk:
+            return
+        yield chunk, lines.bytes_read
+
+
+def _text(value, limit):
+    if not isinstance(value, str):
+        return None
+    value = value.strip()
+    return value if 0 < len(value) <= limit else None
+
+
+def validate_record(record):
+    """(customer_code, item, amount, order_time) of a record; raises ValueError"""
+    customer_code = _text(record.get('customer_code'), 50)
+    if customer_code is None:
+        raise ValueError("customer_code must be a string of 1 to 50 characters")
+    item = _text(record.get('item'), 200)
+    if item is None:
+        raise ValueError("item must be a string of 1 to 200 characters")
+
+    amount = record.get('amount')
+    try:
+        amount = Decimal(str(amount).strip()).quantize(Decimal('0.01'))
+    except (InvalidOperation, ValueError):
+        raise ValueError("amount must be a number")
+    if not amount.is_finite() or abs(amount) > MAX_AMOUNT:
+        raise ValueError(f"amount must be at most {MAX_AMOUNT} in absolute value")
+
+    order_time = record.get('order_time')
+    if order_time in (None, ''):
+        order_time = None
+    else:
+        try:
+            order_time = parse_datetime(str(order_time).strip())
+        except ValueError:
+            order_time = None
+        if order_time is None:
+            raise ValueError("order_time must be an ISO 8601 timestamp")
+        if is_naive(order_time):
+            order_time = make_aware(order_time, dt_timezone.utc)
+    return customer_code, item, amount, order_time
+
+
+def _unknown_customer(row):
+    """The reject for a valid row whose customer doesn't exist"""
+    order_id, number, code, item, amount, order_time = row
+    data = {'customer_code': code, 'item': item, 'amount': amount, 'order_time': order_time}
+    return number, f"Unknown customer: {code}", _json_dumps(data)
+
+
+def validate_chunk(job_id, chunk):
+    """
+    Split a chunk into valid rows (order id, row number, customer_code,
+    item, amount, order_time) and rejects (row number, error, data).
+    A plain function of its arguments, so it can run in another process.
+    """
+    valid, rejects = [], []
+    for number, record, error in chunk:
+        if error is None:
+            try:
+                valid.append((uuid.uuid5(job_id, str(number)), number, *validate_record(record)))
+                continue
+            except ValueError as e:
+                error = str(e)
+        data = record if isinstance(record, str) else _json_dumps(record)
+        rejects.append((number, error, data[:MAX_REJECT_DATA]))
+    return valid, rejects
+
+
+class ImportRunner:
+    """Processes queued import jobs; see the module docstring"""
+
+    def __init__(self, processes=None, chunk_rows=None):
+        self.processes = settings.IMPORT_VALIDATION_PROCESSES if processes is None else processes
+        self.chunk_rows = chunk_rows or settings.IMPORT_CHUNK_ROWS
+        self._customers = {}
+        self._stopped = False
+
+    def stop(self):
+        """Stop after the current chunk; the job is picked up again later"""
+        self._stopped = True
+
+    def run_once(self):
+        """Process the next job, if any; returns its id"""
+        with connections[PRIMARY_ALIAS].cursor() as cursor:
+            job = IMPORT_JOB_CLAIM.fetchone(cursor, [settings.IMPORT_STALE_SECONDS])
+        if job is None:
+            return None
+        try:
+            finished = self.process(job)
+        except ImportFileError as e:
+            self._finish(job, 'failed', str(e))
+        except Exception as e:
+            logger.exception("Order import %s failed", job['id'])
+            self._finish(job, 'failed', f"{type(e).__name__}: {e}")
+        else:
+            if finished:
+                self._finish(job, 'done', None)
+                os.remove(job['path'])
+            else:
+                with connections[PRIMARY_ALIAS].cursor() as cursor:
+                    cursor.execute("UPDATE import_jobs SET status = 'queued' WHERE id = %s", [job['id']])
+        return job['id']
+
+    def _finish(self, job, status, error):
+        with connections[PRIMARY_ALIAS].cursor() as cursor:
+            IMPORT_JOB_FINISH.execute(cursor, [status, error, job['id']])
+
+    def process(self, job):
+        """Import a claimed job's remaining records; False if stopped before the end"""
+        rows_read, rejected = job['rows_read'], job['rows_rejected']
+        with open(job['path'], 'rb') as file:
+            chunks = read_chunks(file, job['format'], skip=rows_read, chunk_rows=self.chunk_rows)
+            for (valid, rejects), bytes_read, size in self._validated(job['id'], chunks):
+                rows_read += size
+                self.load(job['id'], valid, rejects, bytes_read, rows_read, rejected)
+                rejected += len(rejects)
+                if self._stopped:
+                    return False
+        return True
+
+    def _validated(self, job_id, chunks):
+        """Validated chunks in file order, validating ahead in the process pool if there is one"""
+        if not self.processes:
+            for chunk, bytes_read in chunks:
+                yield validate_chunk(job_id, chunk), bytes_read, len(chunk)
+            return
+        with ProcessPoolExecutor(self.processes) as executor:
+            pending = deque()
+            for chunk, bytes_read in chunks:
+                pending.append((executor.submit(validate_chunk, job_id, chunk), bytes_read, len(chunk)))
+                if len(pending) > self.processes:
+                    future, bytes_read, size = pending.popleft()
+                    yield future.result(), bytes_read, size
+            while pending:
+                future, bytes_read, size = pending.popleft()
+                yield future.result(), bytes_read, size
+
+    def customer_ids(self, alias, codes):
+        """customer code -> id on ``alias`` for those of ``codes`` that exist"""
+        cache = self._customers.setdefault(alias, {})
+        codes = set(codes)
+        unknown = codes - cache.keys()
+        if unknown:
+            if len(cache) + len(unknown) > CUSTOMER_CACHE_SIZE:
+                # Start over, but with every code of this chunk: the ones
+                # that were cached are needed as much as the new ones
+                cache.clear()
+                unknown = codes
+            with connections[alias].cursor() as cursor:
+                for row in CUSTOMER_IDS_BY_CODES.fetchall(cursor, [list(unknown)]):
+                    cache[row['code']] = row['id']
+        return cache
+
+    def load(self, job_id, valid, rejects, bytes_read, rows_read, rejected):
+        """
+        Insert a validated chunk and save the job's progress, with the
+        ``rejected`` rows so far; returns the number of orders inserted.
+        Rows whose customer doesn't exist are added to ``rejects``.
+        """
+        if sharding_enabled():
+            by_alias = {}
+            for row in valid:
+                by_alias.setdefault(shard_for_code(row[2]), []).append(row)
+        else:
+            by_alias = {PRIMARY_ALIAS: valid} if valid else {}
+
+        imported = 0
+        staged = {}
+        for alias, rows in by_alias.items():
+            customers = self.customer_ids(alias, [row[2] for row in rows])
+            staged[alias] = []
+            for row in rows:
+                if row[2] in customers:
+                    staged[alias].append((customers[row[2]], row))
+                else:
+                    rejects.append(_unknown_customer(row))
+
+        with transaction.atomic(using=PRIMARY_ALIAS):
+            for alias, rows in staged.items():
+                # On the primary this joins the progress transaction;
+                # a shard commits its rows on its own.
+                with transaction.atomic(using=alias):
+                    unknown = self._copy(alias, rows)
+                # Rows skipped as already there were loaded by an earlier
+                # run whose progress was lost, so they count as imported.
+                imported += len(rows) - len(unknown)
+                cache = self._customers[alias]
+                for _, row in rows:
+                    if row[0] in unknown:
+                        rejects.append(_unknown_customer(row))
+                        cache.pop(row[2], None)
+            stored = max(0, settings.IMPORT_MAX_STORED_REJECTS - rejected)
+            with connections[PRIMARY_ALIAS].cursor() as cursor:
+                if rejects and stored:
+                    cursor.executemany(REJECT_SQL, [(job_id, *reject) for reject in sorted(rejects)[:stored]])
+                IMPORT_JOB_PROGRESS.execute(
+                    cursor, [bytes_read, rows_read, imported, len(rejects), job_id]
+                )
+        return imported
+
+    def _copy(self, alias, rows):
+        """Load (customer id, valid row) pairs; the order ids left out for want of a customer"""
+        if not rows:
+            return set()
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for customer_id, (order_id, _, _, item, amount, order_time) in rows:
+            writer.writerow((order_id, customer_id, item, amount, order_time.isoformat() if order_time else None))
+        buffer.seek(0)
+        with connections[alias].cursor() as cursor:
+            cursor.execute("SET LOCAL orders.skip_notify = 'on'")
+            cursor.execute(STAGING_SQL)
+            cursor.copy_expert('COPY import_staging FROM STDIN WITH (FORMAT csv)', buffer)
+            cursor.execute(LOAD_SQL)
+            return {row[0] for row in cursor.fetchall()}
@@ -0,0 +1,61 @@
+"""
+Management command processing queued order imports (orders.imports)
+"""
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.imports import ImportRunner
+
+
+class Command(BaseCommand):
+    help = 'Load queued CSV/NDJSON order imports until stopped (SIGTERM or Ctrl-C)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes',
+            type=int,
+            default=settings.IMPORT_VALIDATION_PROCESSES,
+            help='Processes validating chunks in parallel (0 validates in this one)'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=settings.IMPORT_POLL_INTERVAL,
+            help='Seconds between looks for queued jobs'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Process the queued jobs, then exit'
+        )
+
+    def handle(self, *args, **options):
+        if options['processes'] < 0:
+            raise CommandError('--processes must not be negative')
+
+        runner = ImportRunner(processes=options['processes'])
+        stopped = []
+
+        def stop(signum, frame):
+            stopped.append(signum)
+            runner.stop()
+
+        signal.signal(signal.SIGTERM, stop)
+        processed = 0
+        try:
+            while not stopped:
+                job_id = runner.run_once()
+                if job_id is not None:
+                    processed += 1
+                    self.stdout.write(f'Processed import {job_id}')
+                elif options['once']:
+                    break
+                else:
+                    time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(f'Processed {processed} imports'))
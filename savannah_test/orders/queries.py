@@ -0,0 +1,290 @@
+"""
+Named SQL statements used by the order views. See core.db.statements.
+"""
+from functools import lru_cache
+
+from core.changes import changes_sql
+from core.db.jsonsql import json_array, json_float, json_object, utc_timestamp
+from core.db.statements import get_or_register, register
+
+ORDER_COLUMNS_SQL = """
+    o.id, o.item, o.amount, o.order_time, o.created_at,
+    c.id as customer_id, c.code as customer_code,
+    c.name as customer_name, c.phone_number as customer_phone
+"""
+
+ORDER_LIST = register('order_list', f"""
+    SELECT {ORDER_COLUMNS_SQL}
+    FROM orders o
+    JOIN customers c ON o.customer_id = c.id
+    ORDER BY o.order_time DESC
+""")
+
+ORDER_DETAIL = register('order_detail', f"""
+    SELECT {ORDER_COLUMNS_SQL}
+    FROM orders o
+    JOIN customers c ON o.customer_id = c.id
+    WHERE o.id = %s
+""")
+
+# Multi-get: rows come back in any order, the view restores the request's.
+ORDERS_BY_IDS = register('orders_by_ids', f"""
+    SELECT {ORDER_COLUMNS_SQL}
+    FROM orders o
+    JOIN customers c ON o.customer_id = c.id
+    WHERE o.id = ANY(%s)
+""")
+
+ORDERS_BY_CUSTOMER_ID = register('orders_by_customer_id', f"""
+    SELECT {ORDER_COLUMNS_SQL}
+    FROM orders o
+    JOIN customers c ON o.customer_id = c.id
+    WHERE c.id = %s
+    ORDER BY o.order_time DESC
+""")
+
+ORDERS_BY_CUSTOMER_CODE = register('orders_by_customer_code', f"""
+    SELECT {ORDER_COLUMNS_SQL}
+    FROM orders o
+    JOIN customers c ON o.customer_id = c.id
+    WHERE c.code = %s
+    ORDER BY o.order_time DESC
+""")
+
+# Incremental sync: orders changed or deleted after a cursor (core.changes).
+# Only the order's own columns: a customer edit doesn't touch its orders'
+# updated_at, so joined customer fields could go stale on the client.
+ORDER_CHANGES = register('order_changes', changes_sql(
+    'orders', 'order', ['customer_id', 'item', 'amount', 'order_time', 'created_at', 'updated_at']
+))
+
+CUSTOMER_BY_ID = register('order_customer_by_id', """
+    SELECT id, code FROM customers WHERE id = %s
+""")
+
+CUSTOMER_BY_CODE = register('order_customer_by_code', """
+    SELECT id FROM customers WHERE code = %s
+""")
+
+# Resolve the customer and insert the order in one statement, so the
+# customer can't disappear between the lookup and the insert. The casts
+# let PREPARE type the parameters of the INSERT ... SELECT.
+ORDER_INSERT = register('order_insert', """
+    WITH customer AS (
+        SELECT id, code, name, phone_number
+        FROM customers
+        WHERE code = %s
+    ), inserted AS (
+        INSERT INTO orders (customer_id, item, amount)
+        SELECT id, %s::varchar, %s::numeric FROM customer
+        RETURNING id, customer_id, item, amount, order_time, created_at
+    )
+    SELECT
+        i.id, i.customer_id, i.item, i.amount, i.order_time, i.created_at,
+        c.code as customer_code, c.name as customer_name,
+        c.phone_number as customer_phone
+    FROM inserted i
+    JOIN customer c ON c.id = i.customer_id
+""")
+
+# ORDER_INSERT for many orders in one statement and one commit, from
+# parallel arrays of ids, customer codes, items, amounts and order times
+# (NULL for now), used by orders.groupcommit and the bulk endpoint. The
+# ids are generated by the caller so that every returned row can be
+# matched to its request; codes with no customer insert nothing.
+ORDER_INSERT_MANY = register('order_insert_many', """
+    WITH input AS (
+        SELECT *
+        FROM unnest(%s::uuid[], %s::varchar[], %s::varchar[], %s::numeric[], %s::timestamptz[])
+            AS t(id, customer_code, item, amount, order_time)
+    ), customer AS (
+        SELECT DISTINCT c.id, c.code, c.name, c.phone_number
+        FROM customers c
+        JOIN input ON input.customer_code = c.code
+    ), inserted AS (
+        INSERT INTO orders (id, customer_id, item, amount, order_time)
+        SELECT input.id, c.id, input.item, input.amount, coalesce(input.order_time, now())
+        FROM input JOIN customer c ON c.code = input.customer_code
+        RETURNING id, customer_id, item, amount, order_time, created_at
+    )
+    SELECT
+        i.id, i.customer_id, i.item, i.amount, i.order_time, i.created_at,
+        c.code as customer_code, c.name as customer_name,
+        c.phone_number as customer_phone
+    FROM inserted i
+    JOIN customer c ON c.id = i.customer_id
+""")
+
+ORDER_DELETE = register('order_delete', """
+    DELETE FROM orders WHERE id = %s
+    RETURNING id, customer_id, item, amount, order_time, created_at
+""")
+
+# The same reads returning the response body built by PostgreSQL, for
+# DB_JSON_RESPONSES. See core.db.jsonsql.
+ORDER_JSON_COLUMNS_SQL = f"""
+    o.id, o.item, {json_float('o.amount')} as amount,
+    {utc_timestamp('o.order_time')} as order_time,
+    {utc_timestamp('o.created_at')} as created_at,
+    c.id as customer_id, c.code as customer_code,
+    c.name as customer_name, c.phone_number as customer_phone
+"""
+
+ORDER_LIST_JSON = register('order_list_json', json_array(f"""
+    SELECT {ORDER_JSON_COLUMNS_SQL}
+    FROM orders o
+    JOIN customers c ON o.customer_id = c.id
+    ORDER BY o.order_time DESC
+"""))
+
+ORDER_DETAIL_JSON = register('order_detail_json', json_object(f"""
+    SELECT {ORDER_JSON_COLUMNS_SQL}
+    FROM orders o
+    JOIN customers c ON o.customer_id = c.id
+    WHERE o.id = %s
+"""))
+
+ORDERS_BY_CUSTOMER_ID_JSON = register('orders_by_customer_id_json', json_array(f"""
+    SELECT {ORDER_JSON_COLUMNS_SQL}
+    FROM orders o
+    JOIN customers c ON o.customer_id = c.id
+    WHERE c.id = %s
+    ORDER BY o.order_time DESC
+"""))
+
+ORDERS_BY_CUSTOMER_CODE_JSON = register('orders_by_customer_code_json', json_array(f"""
+    SELECT {ORDER_JSON_COLUMNS_SQL}
+    FROM orders o
+    JOIN customers c ON o.customer_id = c.id
+    WHERE c.code = %s
+    ORDER BY o.order_time DESC
+"""))
+
+# Columns a client can narrow list responses to with ?fields=, in response
+# order: field -> (SQL, SQL formatted for DB_JSON_RESPONSES). customer_id is
+# the order's own column, so only the customer_* fields need the join.
+ORDER_FIELDS = {
+    'id': ('o.id', 'o.id'),
+    'item': ('o.item', 'o.item'),
+    'amount': ('o.amount', json_float('o.amount')),
+    'order_time': ('o.order_time', utc_timestamp('o.order_time')),
+    'created_at': ('o.created_at', utc_timestamp('o.created_at')),
+    'customer_id': ('o.customer_id', 'o.customer_id'),
+    'customer_code': ('c.code', 'c.code'),
+    'customer_name': ('c.name', 'c.name'),
+    'customer_phone': ('c.phone_number', 'c.phone_number'),
+}
+CUSTOMER_JOIN_FIELDS = {'customer_code', 'customer_name', 'customer_phone'}
+
+_PROJECTION_FILTERS = {
+    'list': '',
+    'customer': 'WHERE o.customer_id = %s',
+    'ids': 'WHERE o.id = ANY(%s)',
+}
+
+
+def order_projection(kind, fields, as_json=False):
+    """
+    Statement listing only ``fields`` of the orders, newest first. ``kind``
+    is 'list' for every order, 'customer' for one customer's orders by id or
+    'ids' for the orders whose ids are in an array.
+
+    Each field combination is registered (and prepared) once, under a name
+    derived from it. Leaving out the customer_* fields also leaves out the
+    join, so narrow requests can be answered from the indexes alone.
+    """
+    return _order_projection(kind, tuple(field for field in ORDER_FIELDS if field in fields), as_json)
+
+
+@lru_cache(maxsize=None)
+def _order_projection(kind, fields, as_json):
+    mask = sum(1 << i for i, field in enumerate(ORDER_FIELDS) if field in fields)
+    name = f"order_{kind}_fields_{mask:03x}{'_json' if as_json else ''}"
+
+    columns = ', '.join(f'{ORDER_FIELDS[field][1 if as_json else 0]} as {field}' for field in fields)
+    join = 'JOIN customers c ON o.customer_id = c.id' if CUSTOMER_JOIN_FIELDS.intersection(fields) else ''
+    sql = f"""
+    SELECT {columns}
+    FROM orders o
+    {join}
+    {_PROJECTION_FILTERS[kind]}
+    ORDER BY o.order_time DESC
+"""
+    return get_or_register(name, json_array(sql) if as_json else sql)
+
+# Channel the notify_order_change trigger (database/*.sql) publishes order
+# inserts and deletes on, as JSON: op, id, customer_id, item, amount, order_time
+ORDER_EVENTS_CHANNEL = 'order_events'
+
+# Order import jobs (orders.imports)
+IMPORT_JOB_COLUMNS_SQL = """
+    id, format, status, total_bytes, bytes_read, rows_read, rows_imported,
+    rows_rejected, error, created_at, started_at, finished_at,
+    CASE WHEN total_bytes > 0 THEN round(bytes_read::numeric / total_bytes, 4) ELSE 1 END AS progress,
+    CASE WHEN started_at IS NULL THEN NULL ELSE round(rows_read / greatest(
+        extract(epoch FROM coalesce(finished_at, heartbeat_at) - started_at), 0.001
+    ))::bigint END AS rows_per_second
+"""
+
+IMPORT_JOB_INSERT = register('import_job_insert', f"""
+    INSERT INTO import_jobs (id, format, path, total_bytes)
+    VALUES (%s, %s, %s, %s)
+    RETURNING {IMPORT_JOB_COLUMNS_SQL}
+""")
+
+IMPORT_JOB_DETAIL = register('import_job_detail', f"""
+    SELECT {IMPORT_JOB_COLUMNS_SQL}
+    FROM import_jobs
+    WHERE id = %s
+""")
+
+IMPORT_JOB_LIST = register('import_job_list', f"""
+    SELECT {IMPORT_JOB_COLUMNS_SQL}
+    FROM import_jobs
+    ORDER BY created_at DESC
+    LIMIT 100
+""")
+
+# The oldest queued job, or a running one whose worker stopped reporting
+# progress more than %s seconds ago
+IMPORT_JOB_CLAIM = register('import_job_claim', """
+    UPDATE import_jobs
+    SET status = 'running', started_at = coalesce(started_at, now()), heartbeat_at = now()
+    WHERE id = (
+        SELECT id FROM import_jobs
+        WHERE status = 'queued'
+           OR (status = 'running' AND heartbeat_at < now() - make_interval(secs => %s))
+        ORDER BY created_at
+        LIMIT 1
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING id, format, path, bytes_read, rows_read, rows_imported, rows_rejected
+""")
+
+# Parameters: bytes_read, rows_read, rows imported and rejected since the
+# last update, job id
+IMPORT_JOB_PROGRESS = register('import_job_progress', """
+    UPDATE import_jobs
+    SET bytes_read = %s, rows_read = %s,
+        rows_imported = rows_imported + %s, rows_rejected = rows_rejected + %s,
+        heartbeat_at = now()
+    WHERE id = %s
+""")
+
+IMPORT_JOB_FINISH = register('import_job_finish', """
+    UPDATE import_jobs
+    SET status = %s, error = %s, finished_at = now(), heartbeat_at = now()
+    WHERE id = %s
+""")
+
+IMPORT_REJECTS = register('import_rejects', """
+    SELECT row_number, error, data
+    FROM import_rejects
+    WHERE job_id = %s
+    ORDER BY row_number
+    LIMIT %s
+""")
+
+CUSTOMER_IDS_BY_CODES = register('customer_ids_by_codes', """
+    SELECT code, id FROM customers WHERE code = ANY(%s)
+""")
@@ -0,0 +1,69 @@
+"""
+GET /api/orders/stream/: order inserts and deletes as Server-Sent Events,
+pushed from the database with LISTEN/NOTIFY (see core.events).
+
+It only works under an ASGI server (asgi.py or asgi_api.py), where every
+worker process holds one LISTEN connection per database for all its
+subscribers. Under WSGI it answers 501: Django runs the view in an event
+loop that is gone once the view returns, taking the listener with it, and
+StreamingHttpResponse reads an async iterator to the end before sending
+anything, so clients would get nothing for ORDER_STREAM_MAX_AGE and then
+everything at once while the stream held a worker thread.
+"""
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from rest_framework import status
+
+from core.async_views import AsyncAPIView
+from core.db.routing import PRIMARY_ALIAS
+from core.db.sharding import shard_aliases
+from core.events import get_broker
+from orders.queries import ORDER_EVENTS_CHANNEL
+
+
+def order_broker():
+    # NOTIFY only reaches listeners on the server it ran on, so listen to
+    # the primary or every shard, never a replica.
+    return get_broker(
+        ORDER_EVENTS_CHANNEL,
+        shard_aliases() or [PRIMARY_ALIAS],
+        history_size=settings.ORDER_STREAM_HISTORY,
+        queue_size=settings.ORDER_STREAM_CLIENT_BUFFER,
+        heartbeat=settings.ORDER_STREAM_HEARTBEAT,
+    )
+
+
+class OrderStreamView(AsyncAPIView):
+    """Stream order changes as they are committed"""
+
+    async def get(self, request):
+        """
+        ``insert`` and ``delete`` events whose data is the order. Send
+        Last-Event-ID (as EventSource does on reconnect) to resume.
+        """
+        if not isinstance(request, ASGIRequest):
+            return self.respond(
+                {"error": "The order stream needs an ASGI server, e.g. uvicorn savannah_test.asgi:application"},
+                status=status.HTTP_501_NOT_IMPLEMENTED
+            )
+        
+        broker = order_broker()
+        try:
+            subscription = await broker.subscribe(request.headers.get('Last-Event-ID'))
+        except Exception as e:
+            return self.respond(
+                {"error": f"Failed to subscribe to orders: {str(e)}"},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+
+        response = StreamingHttpResponse(
+            subscription.frames(settings.ORDER_STREAM_HEARTBEAT, settings.ORDER_STREAM_MAX_AGE),
+            content_type='text/event-stream',
+        )
+        # However the response ends, even unread, the subscription goes with it
+        response._resource_closers.append(subscription.close)
+        response['Cache-Control'] = 'no-cache'
+        # Stop nginx from buffering the stream
+        response['X-Accel-Buffering'] = 'no'
+        return response
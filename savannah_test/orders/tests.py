@@ -1,7 +1,10 @@
+import os
 import uuid
 import json
+from decimal import Decimal
+from io import BytesIO
 from unittest.mock import patch, MagicMock
-from django.test import TestCase, TransactionTestCase
+from django.test import TestCase, TransactionTestCase, override_settings
 from django.urls import reverse
 from django.contrib.auth.models import User
 from rest_framework.test import APITestCase, APIClient
@@ -9,6 +12,8 @@ from rest_framework import status
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.db import connections
 
+from webhooks.tests import WEBHOOK_TABLES
+
 
 class OrderAPITestCase(APITestCase):
     """Test cases for Order API endpoints"""
@@ -40,6 +45,8 @@ class OrderAPITestCase(APITestCase):
     def _create_test_customer(self):
         """Helper method to create a test customer in the database"""
         with connections['default'].cursor() as cursor:
+            for statement in WEBHOOK_TABLES:
+                cursor.execute(statement)
             cursor.execute(
                 """
                 INSERT INTO customers (code, name, phone_number) 
@@ -237,6 +244,173 @@ class OrderAPITestCase(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
         self.assertIn('error', response.data)
     
+    def test_list_orders_with_fields(self):
+        """Test that ?fields= narrows list responses to the requested fields"""
+        url = reverse('order-list')
+        response = self.client.get(url, {'fields': 'amount,id, order_time'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertGreaterEqual(len(response.data), 1)
+        for order in response.data:
+            self.assertEqual(list(order), ['id', 'amount', 'order_time'])
+
+        url = reverse('orders-by-customer', args=[self.test_customer_id])
+        response = self.client.get(url, {'fields': 'item,customer_code'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, [{'item': 'Test Item', 'customer_code': 'TESTCUST'}])
+
+    def test_list_orders_with_unknown_fields(self):
+        """Test that unknown or empty ?fields= are rejected"""
+        url = reverse('order-list')
+
+        for fields in ['id,password', ',']:
+            response = self.client.get(url, {'fields': fields})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('error', response.data)
+
+    def test_order_only_fields_skip_customer_join(self):
+        """Test that the customers join is only added for customer_* fields"""
+        from orders.queries import order_projection
+
+        self.assertNotIn('JOIN', order_projection('customer', ['id', 'amount', 'customer_id']).sql)
+        self.assertIn('JOIN', order_projection('list', ['id', 'customer_name']).sql)
+
+    def test_list_orders_with_embedded_customers(self):
+        """Test that ?embed=customers side-loads each customer once"""
+        customer = {'code': 'TESTCUST', 'name': 'Test Customer', 'phone_number': '+254700000000'}
+        url = reverse('orders-by-customer', args=[self.test_customer_id])
+        response = self.client.get(url, {'embed': 'customers'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['customers'], {str(self.test_customer_id): customer})
+        self.assertEqual(len(response.data['orders']), 1)
+        self.assertNotIn('customer_code', response.data['orders'][0])
+        self.assertEqual(response.data['orders'][0]['customer_id'], self.test_customer_id)
+
+        response = self.client.get(reverse('order-list'), {'embed': 'customers', 'fields': 'id,amount'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['customers'][str(self.test_customer_id)], customer)
+        for order in response.data['orders']:
+            self.assertEqual(list(order), ['id', 'amount', 'customer_id'])
+
+    def test_list_orders_as_msgpack(self):
+        """Test that Accept: application/msgpack returns typed MessagePack"""
+        from core.parsers import MessagePackParser
+
+        url = reverse('orders-by-customer', args=[self.test_customer_id])
+        response = self.client.get(url, HTTP_ACCEPT='application/msgpack')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        orders = MessagePackParser().parse(BytesIO(response.content))
+        self.assertEqual(orders[0]['customer_id'], self.test_customer_id)
+        self.assertEqual(orders[0]['amount'], Decimal('100.00'))
+        self.assertEqual(orders[0]['item'], 'Test Item')
+
+    def test_multi_get_orders(self):
+        """Test that ?ids= and POST lookup/ keep the request order and report missing ids"""
+        second_id = self._create_test_order()
+        missing_id = str(uuid.uuid4())
+        ids = [str(second_id), missing_id, str(self.test_order_id), str(second_id)]
+
+        response = self.client.get(reverse('order-list'), {'ids': ','.join(ids), 'fields': 'item'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([order['id'] for order in response.data['orders']], [second_id, self.test_order_id])
+        self.assertEqual(list(response.data['orders'][0]), ['id', 'item'])
+        self.assertEqual(response.data['missing'], [missing_id])
+
+        response = self.client.post(reverse('order-lookup'), {'ids': ids}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([order['id'] for order in response.data['orders']], [second_id, self.test_order_id])
+        self.assertEqual(response.data['orders'][0]['customer_code'], 'TESTCUST')
+        self.assertEqual(response.data['missing'], [missing_id])
+
+    @override_settings(MULTI_GET_MAX_KEYS=2)
+    def test_multi_get_orders_invalid(self):
+        """Test that malformed, empty or oversized id lists are rejected"""
+        too_many = ','.join(str(uuid.uuid4()) for _ in range(3))
+        for ids in ['not-a-uuid', ',', too_many]:
+            response = self.client.get(reverse('order-list'), {'ids': ids})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        for body in [{}, {'ids': str(self.test_order_id)}, {'ids': [1]}]:
+            response = self.client.post(reverse('order-lookup'), body, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('error', response.data)
+
+    @override_settings(BULK_CHUNK_SIZE=2)
+    def test_bulk_create_orders(self):
+        """Test that a bulk body is inserted chunk by chunk, reporting failed elements by index"""
+        orders = [
+            {'customer_code': 'TESTCUST', 'item': 'Bulk 1', 'amount': '10.50'},
+            {'customer_code': 'TESTCUST', 'item': 'Bulk 2', 'amount': 3, 'order_time': '2024-03-01T09:30:00Z'},
+            {'customer_code': 'MISSING', 'item': 'Bulk 3', 'amount': '1.00'},
+            {'customer_code': 'TESTCUST', 'item': 'Bulk 4', 'amount': 'ten'},
+            'not an object',
+        ]
+        url = reverse('order-bulk')
+        response = self.client.post(url, json.dumps(orders), content_type='application/json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(response.data['error_count'], 3)
+        self.assertEqual([error['index'] for error in response.data['errors']], [2, 3, 4])
+        self.assertEqual(response.data['errors'][0]['error'], 'Customer not found')
+        with connections['default'].cursor() as cursor:
+            cursor.execute("SELECT item, amount, order_time FROM orders WHERE item LIKE 'Bulk %%' ORDER BY item")
+            rows = cursor.fetchall()
+        self.assertEqual([(item, amount) for item, amount, _ in rows], [('Bulk 1', Decimal('10.50')), ('Bulk 2', Decimal('3.00'))])
+        self.assertEqual(rows[1][2].isoformat(), '2024-03-01T09:30:00+00:00')
+
+        # Chunks before a syntax error are kept
+        body = json.dumps(orders[:2])[:-1] + ', {"item": }]'
+        response = self.client.post(url, body, content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['created'], 2)
+
+        for body in ['', '{"customer_code": "TESTCUST"}']:
+            response = self.client.post(url, body, content_type='application/json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('error', response.data)
+
+    def test_list_orders_with_unknown_embed(self):
+        """Test that ?embed= only accepts customers"""
+        response = self.client.get(reverse('order-list'), {'embed': 'items'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('error', response.data)
+
+    def test_database_built_json_matches_rendered_json(self):
+        """Test that DB_JSON_RESPONSES returns the same bytes as the renderer"""
+        urls = [
+            reverse('order-list'),
+            reverse('order-detail', args=[self.test_order_id]),
+            reverse('orders-by-customer', args=[self.test_customer_id]),
+            reverse('order-by-customer') + '?customer_code=TESTCUST',
+            reverse('order-list') + '?fields=id,amount,order_time',
+            reverse('order-by-customer') + '?customer_code=TESTCUST&fields=item,customer_phone',
+        ]
+        rendered = [self.client.get(url).content for url in urls]
+
+        with override_settings(DB_JSON_RESPONSES=True):
+            for url, expected in zip(urls, rendered):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertEqual(response.content, expected)
+
+    @override_settings(DB_JSON_RESPONSES=True)
+    def test_database_built_json_not_found(self):
+        """Test that DB_JSON_RESPONSES still answers 404 for unknown orders"""
+        url = reverse('order-detail', args=[uuid.uuid4()])
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertIn('error', response.data)
+
     def test_unauthenticated_access(self):
         """Test that unauthenticated requests are rejected"""
         self.client.credentials(HTTP_X_DISABLE_AUTH='true')
@@ -360,4 +534,436 @@ class OrderViewTestCase(TestCase):
             fk = foreign_keys[0]
             self.assertEqual(fk[1], 'customer_id')  
             self.assertEqual(fk[2], 'customers')   
-            self.assertEqual(fk[3], 'id')        
\ No newline at end of file
+            self.assertEqual(fk[3], 'id')        
+
+class OrderStreamTestCase(TransactionTestCase):
+    """Test cases for the order event stream (LISTEN/NOTIFY over SSE)"""
+
+    def setUp(self):
+        """Create the tables and the notify trigger; NOTIFY is only sent on commit"""
+        with connections['default'].cursor() as cursor:
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS \"uuid-ossp\"")
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS customers (
+                    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+                    code VARCHAR(50) UNIQUE NOT NULL,
+                    name VARCHAR(100) NOT NULL,
+                    phone_number VARCHAR(20) NOT NULL,
+                    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS orders (
+                    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+                    customer_id UUID NOT NULL REFERENCES customers(id) ON DELETE CASCADE,
+                    item VARCHAR(200) NOT NULL,
+                    amount DECIMAL(10, 2) NOT NULL,
+                    order_time TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+                    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            cursor.execute("""
+                CREATE OR REPLACE FUNCTION notify_order_change() RETURNS TRIGGER AS $$
+                DECLARE changed orders;
+                BEGIN
+                    IF TG_OP = 'DELETE' THEN changed := OLD; ELSE changed := NEW; END IF;
+                    PERFORM pg_notify('order_events', json_build_object(
+                        'op', lower(TG_OP), 'id', changed.id, 'customer_id', changed.customer_id,
+                        'item', changed.item, 'amount', changed.amount, 'order_time', changed.order_time
+                    )::text);
+                    RETURN NULL;
+                END;
+                $$ LANGUAGE plpgsql
+            """)
+            cursor.execute("DROP TRIGGER IF EXISTS notify_order_change ON orders")
+            cursor.execute("""
+                CREATE TRIGGER notify_order_change
+                AFTER INSERT OR DELETE ON orders FOR EACH ROW EXECUTE FUNCTION notify_order_change()
+            """)
+            cursor.execute("DELETE FROM customers WHERE code = 'STREAM001'")
+            cursor.execute(
+                "INSERT INTO customers (code, name, phone_number) VALUES ('STREAM001', 'Stream', '+254722222222') "
+                "RETURNING id"
+            )
+            self.customer_id = cursor.fetchone()[0]
+
+    def tearDown(self):
+        with connections['default'].cursor() as cursor:
+            cursor.execute("DELETE FROM customers WHERE code = 'STREAM001'")
+
+    def _insert_order(self):
+        with connections['default'].cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO orders (customer_id, item, amount) VALUES (%s, 'Streamed', 5.00) RETURNING id",
+                [self.customer_id]
+            )
+            return str(cursor.fetchone()[0])
+
+    def _delete_order(self, order_id):
+        with connections['default'].cursor() as cursor:
+            cursor.execute("DELETE FROM orders WHERE id = %s", [order_id])
+
+    async def _stream(self, **headers):
+        response = await self.async_client.get('/api/orders/stream/', headers=headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        frames = aiter(response.streaming_content)
+        self.assertTrue((await anext(frames)).startswith(b'retry: '))
+        return frames
+
+    def test_stream_needs_asgi(self):
+        """Test that a WSGI request gets 501 instead of a stream that never flushes"""
+        response = self.client.get('/api/orders/stream/')
+
+        self.assertEqual(response.status_code, status.HTTP_501_NOT_IMPLEMENTED)
+        self.assertIn('ASGI', json.loads(response.content)['error'])
+
+    async def test_stream_and_resume_order_events(self):
+        """Test that inserts and deletes are pushed, and Last-Event-ID replays missed ones"""
+        import asyncio
+        from asgiref.sync import sync_to_async
+        from core.db.aio import close_pools
+        from core.events import RESET_FRAME, close_brokers
+        try:
+            frames = await self._stream()
+            order_id = await sync_to_async(self._insert_order)()
+            frame = await asyncio.wait_for(anext(frames), 5)
+            self.assertIn(f'id: insert:{order_id}\nevent: insert\n'.encode(), frame)
+            data = json.loads(frame.split(b'data: ')[1])
+            self.assertEqual(data['item'], 'Streamed')
+            self.assertEqual(data['customer_id'], str(self.customer_id))
+            await frames.aclose()
+
+            await sync_to_async(self._delete_order)(order_id)
+            frames = await self._stream(**{'Last-Event-ID': f'insert:{order_id}'})
+            frame = await asyncio.wait_for(anext(frames), 5)
+            self.assertTrue(frame.startswith(f'id: delete:{order_id}\nevent: delete\n'.encode()))
+            await frames.aclose()
+
+            frames = await self._stream(**{'Last-Event-ID': 'insert:gone'})
+            self.assertEqual(await asyncio.wait_for(anext(frames), 5), RESET_FRAME)
+            await frames.aclose()
+        finally:
+            await close_brokers()
+            await close_pools()
+
+
+    async def test_stream_unsubscribes_when_closed_unread(self):
+        """Test that a stream joins the broker when read and leaves when the response closes"""
+        import asyncio
+        from asgiref.sync import sync_to_async
+        from core.db.aio import close_pools
+        from core.events import close_brokers
+        from orders.streams import order_broker
+        try:
+            unread = await self.async_client.get('/api/orders/stream/')
+            broker = order_broker()
+            self.assertEqual(broker.subscribers, set())
+            await sync_to_async(unread.close)()
+
+            response = await self.async_client.get('/api/orders/stream/')
+            frames = aiter(response.streaming_content)
+            await anext(frames)
+            self.assertEqual(len(broker.subscribers), 1)
+            # ASGIHandler closes the response from a worker thread
+            await sync_to_async(response.close)()
+            await asyncio.sleep(0)
+            self.assertEqual(broker.subscribers, set())
+        finally:
+            await close_brokers()
+            await close_pools()
+
+
+class OrderGroupCommitTestCase(TransactionTestCase):
+    """Test cases for group commit; the writer thread only sees committed rows"""
+
+    def setUp(self):
+        with connections['default'].cursor() as cursor:
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS \"uuid-ossp\"")
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS customers (
+                    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+                    code VARCHAR(50) UNIQUE NOT NULL,
+                    name VARCHAR(100) NOT NULL,
+                    phone_number VARCHAR(20) NOT NULL,
+                    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS orders (
+                    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+                    customer_id UUID NOT NULL REFERENCES customers(id) ON DELETE CASCADE,
+                    item VARCHAR(200) NOT NULL,
+                    amount DECIMAL(10, 2) NOT NULL,
+                    order_time TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+                    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            for statement in WEBHOOK_TABLES:
+                cursor.execute(statement)
+            cursor.execute("DELETE FROM customers WHERE code = 'GROUP001'")
+            cursor.execute(
+                "INSERT INTO customers (code, name, phone_number) VALUES ('GROUP001', 'Group', '+254744444444')"
+            )
+
+    def tearDown(self):
+        with connections['default'].cursor() as cursor:
+            cursor.execute("DELETE FROM customers WHERE code = 'GROUP001'")
+
+    def test_concurrent_orders_share_one_insert(self):
+        """Test that a full batch is one statement and every caller gets its own row"""
+        from orders.groupcommit import GroupCommitter
+        committer = GroupCommitter('default', window=5000, max_rows=4)
+        futures = [committer.submit('GROUP001', f'Item {number}', 10.0 + number) for number in range(3)]
+        futures.append(committer.submit('MISSING', 'Nobody', 1.0))
+
+        rows = [future.result(timeout=5) for future in futures]
+
+        self.assertEqual(committer.batches, 1)
+        self.assertEqual([row['item'] for row in rows[:3]], ['Item 0', 'Item 1', 'Item 2'])
+        self.assertEqual([row['amount'] for row in rows[:3]], [Decimal('10.00'), Decimal('11.00'), Decimal('12.00')])
+        self.assertEqual({row['customer_code'] for row in rows[:3]}, {'GROUP001'})
+        self.assertIsNone(rows[3])
+
+    def test_failed_row_only_fails_its_caller(self):
+        """Test that a failing batch is retried row by row"""
+        from django.db import DataError
+        from orders.groupcommit import GroupCommitter
+        committer = GroupCommitter('default', window=5000, max_rows=3)
+        good = committer.submit('GROUP001', 'Fine', 5.0)
+        bad = committer.submit('GROUP001', 'Too much', 10.0 ** 12)
+        also_good = committer.submit('GROUP001', 'Also fine', 6.0)
+
+        self.assertEqual(good.result(timeout=5)['item'], 'Fine')
+        self.assertEqual(also_good.result(timeout=5)['item'], 'Also fine')
+        with self.assertRaises(DataError):
+            bad.result(timeout=5)
+        self.assertEqual(committer.batches, 0)
+
+    @override_settings(ORDER_GROUP_COMMIT=True, ORDER_GROUP_COMMIT_WINDOW_MS=1)
+    @patch('core.sms_service.send_sms')
+    def test_create_order_with_group_commit(self, mock_send_sms):
+        """Test that the create endpoint goes through the group committer when enabled"""
+        mock_send_sms.return_value = {'status': 'success'}
+        user = User.objects.create_user(username='groupuser', password='testpass123')
+        client = APIClient()
+        client.force_authenticate(user)
+
+        response = client.post(
+            reverse('order-list'), {'customer_code': 'GROUP001', 'item': 'Grouped', 'amount': '9.50'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['item'], 'Grouped')
+
+        response = client.post(
+            reverse('order-list'), {'customer_code': 'MISSING', 'item': 'Grouped', 'amount': '9.50'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class OrderImportTestCase(TransactionTestCase):
+    """Test cases for bulk order import jobs"""
+
+    def setUp(self):
+        import tempfile
+        with connections['default'].cursor() as cursor:
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS \"uuid-ossp\"")
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS customers (
+                    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+                    code VARCHAR(50) UNIQUE NOT NULL,
+                    name VARCHAR(100) NOT NULL,
+                    phone_number VARCHAR(20) NOT NULL,
+                    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS orders (
+                    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+                    customer_id UUID NOT NULL REFERENCES customers(id) ON DELETE CASCADE,
+                    item VARCHAR(200) NOT NULL,
+                    amount DECIMAL(10, 2) NOT NULL,
+                    order_time TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+                    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS import_jobs (
+                    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+                    format VARCHAR(10) NOT NULL,
+                    path VARCHAR(500) NOT NULL,
+                    status VARCHAR(10) NOT NULL DEFAULT 'queued',
+                    total_bytes BIGINT NOT NULL,
+                    bytes_read BIGINT NOT NULL DEFAULT 0,
+                    rows_read BIGINT NOT NULL DEFAULT 0,
+                    rows_imported BIGINT NOT NULL DEFAULT 0,
+                    rows_rejected BIGINT NOT NULL DEFAULT 0,
+                    error TEXT,
+                    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+                    started_at TIMESTAMP WITH TIME ZONE,
+                    heartbeat_at TIMESTAMP WITH TIME ZONE,
+                    finished_at TIMESTAMP WITH TIME ZONE
+                )
+            """)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS import_rejects (
+                    job_id UUID NOT NULL REFERENCES import_jobs(id) ON DELETE CASCADE,
+                    row_number BIGINT NOT NULL,
+                    error TEXT NOT NULL,
+                    data TEXT,
+                    PRIMARY KEY (job_id, row_number)
+                )
+            """)
+            cursor.execute("DELETE FROM import_jobs")
+            cursor.execute("DELETE FROM customers WHERE code LIKE 'IMPORT%%'")
+            cursor.execute(
+                "INSERT INTO customers (code, name, phone_number) VALUES ('IMPORT001', 'Import', '+254755555555')"
+            )
+
+        self.import_dir = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(IMPORT_DIR=self.import_dir.name)
+        self.settings_override.enable()
+        admin = User.objects.create_user(username='importadmin', password='testpass123', is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(admin)
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.import_dir.cleanup()
+        with connections['default'].cursor() as cursor:
+            cursor.execute("DELETE FROM import_jobs")
+            cursor.execute("DELETE FROM customers WHERE code LIKE 'IMPORT%%'")
+
+    def _imported_orders(self):
+        with connections['default'].cursor() as cursor:
+            cursor.execute(
+                "SELECT o.item, o.amount, o.order_time FROM orders o "
+                "JOIN customers c ON c.id = o.customer_id WHERE c.code = 'IMPORT001' ORDER BY o.item"
+            )
+            return cursor.fetchall()
+
+    def test_csv_import_job(self):
+        """Test that an upload is queued at once and loaded by the runner, rejects included"""
+        from orders.imports import ImportRunner
+        body = (
+            'customer_code,item,amount,order_time\n'
+            'IMPORT001,"Desk, oak",120.50,2020-05-01T09:30:00Z\n'
+            'IMPORT001,Chair,45,\n'
+            'NOBODY,Lamp,10,\n'
+            'IMPORT001,Shelf,lots,\n'
+            'IMPORT001,Rug,30,yesterday\n'
+        ).encode()
+        response = self.client.generic('POST', reverse('order-import-list'), body, content_type='text/csv')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['status'], 'queued')
+        self.assertEqual(response.data['total_bytes'], len(body))
+        job_id = response.data['id']
+
+        self.assertEqual(ImportRunner(processes=0, chunk_rows=2).run_once(), job_id)
+
+        job = self.client.get(reverse('order-import-detail', kwargs={'pk': job_id})).data
+        self.assertEqual(job['status'], 'done')
+        self.assertEqual((job['rows_read'], job['rows_imported'], job['rows_rejected']), (5, 2, 3))
+        self.assertEqual(job['bytes_read'], len(body))
+        self.assertEqual(job['progress'], 1)
+        self.assertIsNotNone(job['rows_per_second'])
+        self.assertEqual(
+            [(reject['row_number'], reject['error']) for reject in job['rejects']],
+            [(3, 'Unknown customer: NOBODY'), (4, 'amount must be a number'),
+             (5, 'order_time must be an ISO 8601 timestamp')]
+        )
+        orders = self._imported_orders()
+        self.assertEqual([(item, amount) for item, amount, _ in orders],
+                         [('Chair', Decimal('45.00')), ('Desk, oak', Decimal('120.50'))])
+        self.assertEqual(orders[1][2].isoformat(), '2020-05-01T09:30:00+00:00')
+
+    @patch('orders.imports.CUSTOMER_CACHE_SIZE', 2)
+    def test_customer_cache_overflow_keeps_chunk_codes(self):
+        """Test that clearing a full customer cache doesn't reject the chunk's cached codes"""
+        from orders.imports import ImportRunner
+        with connections['default'].cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO customers (code, name, phone_number) VALUES "
+                "('IMPORT002', 'Import', '+254755555556'), ('IMPORT003', 'Import', '+254755555557')"
+            )
+        body = (
+            'customer_code,item,amount\n'
+            'IMPORT001,First,1\nIMPORT002,Second,2\n'
+            'IMPORT001,Third,3\nIMPORT003,Fourth,4\n'
+            'IMPORT002,Fifth,5\nIMPORT003,Sixth,6\n'
+        ).encode()
+        response = self.client.generic('POST', reverse('order-import-list'), body, content_type='text/csv')
+        job_id = response.data['id']
+
+        ImportRunner(processes=0, chunk_rows=2).run_once()
+
+        job = self.client.get(reverse('order-import-detail', kwargs={'pk': job_id})).data
+        self.assertEqual((job['rows_imported'], job['rows_rejected']), (6, 0))
+        self.assertEqual(job['rejects'], [])
+
+    def test_rerun_does_not_duplicate(self):
+        """Test that a job processed again from the start imports nothing twice"""
+        from orders.imports import ImportRunner
+        body = b'{"customer_code": "IMPORT001", "item": "Once", "amount": 5}\nnot json\n'
+        response = self.client.generic(
+            'POST', reverse('order-import-list'), body, content_type='application/x-ndjson'
+        )
+        job_id = response.data['id']
+        runner = ImportRunner(processes=0)
+        runner.run_once()
+
+        # As if the worker had died before saving any progress
+        with connections['default'].cursor() as cursor:
+            cursor.execute(
+                "UPDATE import_jobs SET status = 'queued', rows_read = 0, rows_imported = 0, "
+                "rows_rejected = 0 WHERE id = %s", [job_id]
+            )
+        # The file is deleted once a job is done
+        with open(os.path.join(self.import_dir.name, f'{job_id}.ndjson'), 'wb') as file:
+            file.write(body)
+        runner.run_once()
+
+        self.assertEqual(len(self._imported_orders()), 1)
+        job = self.client.get(reverse('order-import-detail', kwargs={'pk': job_id})).data
+        self.assertEqual(
+            (job['status'], job['rows_read'], job['rows_imported'], job['rows_rejected']), ('done', 2, 1, 1)
+        )
+
+    def test_customer_deleted_after_lookup_is_rejected(self):
+        """Test that rows whose cached customer was deleted are rejected, not silently dropped"""
+        from core.db.routing import PRIMARY_ALIAS
+        from orders.imports import ImportRunner
+        with connections['default'].cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO customers (code, name, phone_number) VALUES ('IMPORT002', 'Import', '+254755555556')"
+            )
+        runner = ImportRunner(processes=0, chunk_rows=2)
+        self.assertIn('IMPORT002', runner.customer_ids(PRIMARY_ALIAS, ['IMPORT002']))
+        with connections['default'].cursor() as cursor:
+            cursor.execute("DELETE FROM customers WHERE code = 'IMPORT002'")
+        body = b'customer_code,item,amount\nIMPORT002,Gone,1\nIMPORT001,Kept,2\nIMPORT002,Later,3\n'
+        response = self.client.generic('POST', reverse('order-import-list'), body, content_type='text/csv')
+        job_id = response.data['id']
+
+        runner.run_once()
+
+        job = self.client.get(reverse('order-import-detail', kwargs={'pk': job_id})).data
+        self.assertEqual((job['rows_read'], job['rows_imported'], job['rows_rejected']), (3, 1, 2))
+        self.assertEqual(
+            [(reject['row_number'], reject['error']) for reject in job['rejects']],
+            [(1, 'Unknown customer: IMPORT002'), (3, 'Unknown customer: IMPORT002')]
+        )
+        self.assertEqual([row[0] for row in self._imported_orders()], ['Kept'])
+
+    def test_upload_validation(self):
+        """Test that unknown formats and empty uploads are rejected"""
+        response = self.client.generic('POST', reverse('order-import-list'), b'a,b', content_type='text/plain')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.generic('POST', reverse('order-import-list'), b'', content_type='text/csv')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
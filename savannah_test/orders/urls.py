@@ -1,9 +1,19 @@
 from django.urls import path
-from .views import OrderListView, OrderDetailView, OrderByCustomerView
+from .views import (
+    OrderListView, OrderDetailView, OrderByCustomerView, OrderLookupView, OrderChangesView,
+    OrderImportListView, OrderImportDetailView, OrderBulkView,
+)
+from .streams import OrderStreamView
 
 urlpatterns = [
     path('', OrderListView.as_view(), name='order-list'),
     path('<uuid:pk>/', OrderDetailView.as_view(), name='order-detail'),
+    path('bulk/', OrderBulkView.as_view(), name='order-bulk'),
+    path('lookup/', OrderLookupView.as_view(), name='order-lookup'),
+    path('changes/', OrderChangesView.as_view(), name='order-changes'),
+    path('stream/', OrderStreamView.as_view(), name='order-stream'),
+    path('imports/', OrderImportListView.as_view(), name='order-import-list'),
+    path('imports/<uuid:pk>/', OrderImportDetailView.as_view(), name='order-import-detail'),
     path('by-customer/', OrderByCustomerView.as_view(), name='order-by-customer'),
     path('customer/<uuid:customer_id>/', OrderByCustomerView.as_view(), name='orders-by-customer'),
 ]
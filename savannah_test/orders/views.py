@@ -1,37 +1,169 @@
+import os
+import uuid
+
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ParseError
 from rest_framework.response import Response
-from django.db import connections
+from django.db import IntegrityError, connections, transaction
 from django.conf import settings
+from core.bulk import BulkResult, chunks
+from core.changes import changes_page, expired, fetch_changes, requested_limit, requested_position
+from core.db.errors import is_foreign_key_violation
+from core.db.jsonsql import DBJSONResponse, db_json_enabled
+from core.db.routing import PRIMARY_ALIAS, db_alias_for, mark_read_only
+from core.db.sharding import (
+    connection_for_code, fetch_from_shards, locate, shard_for_code, sharding_enabled,
+)
+from core.multiget import in_request_order, requested_keys
+from core.parsers import JSONArrayStream, JSONArrayStreamParser
 from core.sms_service import send_sms_notification
+from orders.groupcommit import insert_order
+from orders.imports import (
+    CONTENT_TYPES as IMPORT_CONTENT_TYPES, UPLOAD_CHUNK_SIZE, store_upload, validate_record,
+)
+from webhooks.events import ORDER_CREATED, ORDER_DELETED, enqueue, publish, shares_outbox
+from orders.queries import (
+    CUSTOMER_BY_CODE, CUSTOMER_BY_ID, ORDER_CHANGES, ORDER_DELETE, ORDER_DETAIL, ORDER_DETAIL_JSON, ORDER_INSERT,
+    ORDER_INSERT_MANY, ORDER_LIST, ORDER_LIST_JSON, ORDERS_BY_CUSTOMER_CODE, ORDERS_BY_CUSTOMER_CODE_JSON,
+    ORDERS_BY_CUSTOMER_ID, ORDERS_BY_CUSTOMER_ID_JSON, ORDERS_BY_IDS, CUSTOMER_JOIN_FIELDS, ORDER_FIELDS,
+    IMPORT_JOB_DETAIL, IMPORT_JOB_LIST, IMPORT_REJECTS,
+    order_projection,
+)
 
 from rest_framework.views import APIView
 
+
+def requested_fields(request):
+    """
+    Fields named by ?fields=a,b,... in response order, or None when the
+    parameter is absent. Raises ValueError for unknown or missing names.
+    """
+    param = request.query_params.get('fields')
+    if param is None:
+        return None
+    names = {name.strip() for name in param.split(',') if name.strip()}
+    if not names:
+        raise ValueError("fields must name at least one field")
+    unknown = names - ORDER_FIELDS.keys()
+    if unknown:
+        raise ValueError(
+            f"Unknown field(s): {', '.join(sorted(unknown))}. "
+            f"Allowed fields: {', '.join(ORDER_FIELDS)}"
+        )
+    return [field for field in ORDER_FIELDS if field in names]
+
+
+def requested_embed(request):
+    """
+    True for ?embed=customers, False when the parameter is absent.
+    Raises ValueError for anything else.
+    """
+    param = request.query_params.get('embed')
+    if param is None:
+        return False
+    if param != 'customers':
+        raise ValueError(f"Unknown embed: {param}. Allowed: customers")
+    return True
+
+
+def selected_fields(fields, embed):
+    """
+    Columns to query for ?fields= and ?embed=: embedding needs customer_id
+    and every customer_* field. None means all of them.
+    """
+    if fields is None or not embed:
+        return fields
+    needed = set(fields) | CUSTOMER_JOIN_FIELDS | {'customer_id'}
+    return [field for field in ORDER_FIELDS if field in needed]
+
+
+def embed_customers(orders):
+    """
+    Side-load customers: the customer_* fields move out of every order, in
+    one pass, into a "customers" map with one entry per customer id.
+    """
+    customers = {}
+    for order in orders:
+        code = order.pop('customer_code')
+        name = order.pop('customer_name')
+        phone_number = order.pop('customer_phone')
+        if order['customer_id'] not in customers:
+            customers[order['customer_id']] = {'code': code, 'name': name, 'phone_number': phone_number}
+    return {
+        'orders': orders,
+        'customers': {str(customer_id): customer for customer_id, customer in customers.items()},
+    }
+
+
+def lookup_orders(request, ids, fields=None, embed=False):
+    """
+    Response for a multi-get: the orders with the given ids in one query,
+    in the order asked for, plus the ids that weren't found. ``id`` is
+    always included so the orders can be matched to the request.
+    """
+    selected = selected_fields(fields, embed)
+    if selected is not None and 'id' not in selected:
+        selected = [field for field in ORDER_FIELDS if field == 'id' or field in selected]
+
+    if sharding_enabled():
+        orders = fetch_from_shards(ORDERS_BY_IDS, [ids])
+        if selected is not None:
+            orders = [{field: order[field] for field in selected} for order in orders]
+    else:
+        query = ORDERS_BY_IDS if selected is None else order_projection('ids', selected)
+        with connections[db_alias_for(request)].cursor() as cursor:
+            orders = query.fetchall(cursor, [ids])
+
+    orders, missing = in_request_order(orders, ids, 'id')
+    body = embed_customers(orders) if embed else {'orders': orders}
+    body['missing'] = missing
+    return Response(body)
+
+
 class OrderListView(APIView):
     """List all orders or create a new order"""
     permission_classes = [permissions.IsAuthenticated]
     
-    def get_db_connection(self):
-        """Get database connection using settings configuration"""
-        return connections['default']
+    def get_db_connection(self, customer_code=None):
+        """Get database connection: the customer's shard, or routed by request"""
+        if customer_code is not None and sharding_enabled():
+            return connection_for_code(customer_code)
+        return connections[db_alias_for(self.request)]
     
     def get(self, request):
-        """Get all orders with customer details"""
-        try:
-            query = """
-                SELECT 
-                    o.id, o.item, o.amount, o.order_time, o.created_at,
-                    c.id as customer_id, c.code as customer_code, 
-                    c.name as customer_name, c.phone_number as customer_phone
-                FROM orders o
-                JOIN customers c ON o.customer_id = c.id
-                ORDER BY o.order_time DESC
-            """
+        """
+        Get all orders with customer details, or only the ?fields= given;
+        with ?embed=customers the customers are side-loaded and with
+        ?ids=a,b,... only those orders are returned (see lookup_orders)
+        """
+        try:
+            fields = requested_fields(request)
+            embed = requested_embed(request)
+            ids = requested_keys(request, 'ids', uuid.UUID)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        selected = selected_fields(fields, embed)
+        
+        try:
+            if ids is not None:
+                return lookup_orders(request, ids, fields, embed)
+            
+            if sharding_enabled():
+                orders = fetch_from_shards(ORDER_LIST, order_by='order_time', descending=True)
+                if selected is not None:
+                    orders = [{field: order[field] for field in selected} for order in orders]
+                return Response(embed_customers(orders) if embed else orders)
+            
+            if db_json_enabled(request) and not embed:
+                query = ORDER_LIST_JSON if fields is None else order_projection('list', fields, as_json=True)
+                with self.get_db_connection().cursor() as cursor:
+                    return DBJSONResponse(query.fetchvalue(cursor))
+            
+            query = ORDER_LIST if selected is None else order_projection('list', selected)
             with self.get_db_connection().cursor() as cursor:
-                cursor.execute(query)
-                columns = [col[0] for col in cursor.description]
-                orders = [dict(zip(columns, row)) for row in cursor.fetchall()]
-            return Response(orders)
+                orders = query.fetchall(cursor)
+            return Response(embed_customers(orders) if embed else orders)
         except Exception as e:
             return Response(
                 {"error": f"Failed to fetch orders: {str(e)}"},
@@ -51,43 +183,41 @@ class OrderListView(APIView):
                         status=status.HTTP_400_BAD_REQUEST
                     )
             
-            customer_query = "SELECT id, name, phone_number FROM customers WHERE code = %s"
-            with self.get_db_connection().cursor() as cursor:
-                cursor.execute(customer_query, [data['customer_code']])
-                customer_row = cursor.fetchone()
-                
-                if not customer_row:
-                    return Response(
-                        {"error": "Customer not found"},
-                        status=status.HTTP_404_NOT_FOUND
+            alias = shard_for_code(data['customer_code']) if sharding_enabled() else db_alias_for(request)
+            if settings.ORDER_GROUP_COMMIT:
+                order_response = insert_order(alias, data['customer_code'], data['item'], float(data['amount']))
+            else:
+                with transaction.atomic(using=alias), connections[alias].cursor() as cursor:
+                    order_response = ORDER_INSERT.fetchone(
+                        cursor, [data['customer_code'], data['item'], float(data['amount'])]
                     )
-                
-                columns = [col[0] for col in cursor.description]
-                customer = dict(zip(columns, customer_row))
-            
-            insert_query = """
-                INSERT INTO orders (customer_id, item, amount) 
-                VALUES (%s, %s, %s) 
-                RETURNING id, customer_id, item, amount, order_time, created_at
-            """
+                    if order_response and shares_outbox(alias):
+                        enqueue(cursor, ORDER_CREATED, order_response)
             
-            with self.get_db_connection().cursor() as cursor:
-                cursor.execute(insert_query, [customer['id'], data['item'], float(data['amount'])])
-                columns = [col[0] for col in cursor.description]
-                order_row = cursor.fetchone()
-                order = dict(zip(columns, order_row))
-            
-            order_response = {
-                **order,
-                'customer_code': data['customer_code'],
-                'customer_name': customer['name'],
-                'customer_phone': customer['phone_number']
-            }
+            if not order_response:
+                return Response(
+                    {"error": "Customer not found"},
+                    status=status.HTTP_404_NOT_FOUND
+                )
             
             send_sms_notification(order_response)
+            # On the primary the event was queued with the order
+            if not shares_outbox(alias):
+                publish(ORDER_CREATED, order_response)
             
             return Response(order_response, status=status.HTTP_201_CREATED)
             
+        except IntegrityError as e:
+            # The customer was deleted concurrently, after the CTE saw it.
+            if is_foreign_key_violation(e):
+                return Response(
+                    {"error": "Customer not found"},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            return Response(
+                {"error": f"Failed to create order: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
         except Exception as e:
             return Response(
                 {"error": f"Failed to create order: {str(e)}"},
@@ -95,38 +225,155 @@ class OrderListView(APIView):
             )
 
 
+class OrderBulkView(APIView):
+    """Create orders from a JSON array of any length (see core.bulk)"""
+    permission_classes = [permissions.IsAuthenticated]
+    parser_classes = [JSONArrayStreamParser]
+    
+    def insert_chunk(self, request, start, chunk, result):
+        """Validate and insert one chunk, one ORDER_INSERT_MANY per database"""
+        by_alias, failed = {}, {}
+        for index, element in enumerate(chunk, start):
+            if not isinstance(element, dict):
+                failed[index] = "Element must be a JSON object"
+                continue
+            try:
+                customer_code, item, amount, order_time = validate_record(element)
+            except ValueError as e:
+                failed[index] = str(e)
+                continue
+            alias = shard_for_code(customer_code) if sharding_enabled() else db_alias_for(request)
+            by_alias.setdefault(alias, []).append(
+                (index, uuid.uuid4(), customer_code, item, amount, order_time)
+            )
+        
+        for alias, rows in by_alias.items():
+            indexes, ids, codes, items, amounts, order_times = (list(column) for column in zip(*rows))
+            with connections[alias].cursor() as cursor:
+                created = {
+                    order['id'] for order in
+                    ORDER_INSERT_MANY.fetchall(cursor, [ids, codes, items, amounts, order_times])
+                }
+            result.add('created', len(created))
+            for index, order_id in zip(indexes, ids):
+                if order_id not in created:
+                    failed[index] = "Customer not found"
+        
+        for index in sorted(failed):
+            result.error(index, failed[index])
+    
+    def post(self, request):
+        """
+        Create the orders in a JSON array of {customer_code, item, amount,
+        order_time?} objects, BULK_CHUNK_SIZE at a time as the body arrives.
+        Returns how many were created and the elements that were not; no
+        SMS or webhooks are sent for them.
+        """
+        elements = request.data
+        if not isinstance(elements, JSONArrayStream):
+            return Response({"error": "Body must be a JSON array"}, status=status.HTTP_400_BAD_REQUEST)
+        
+        result = BulkResult('created')
+        try:
+            for start, chunk in chunks(elements):
+                self.insert_chunk(request, start, chunk, result)
+            return Response(result.body())
+        except ParseError as e:
+            return Response(
+                {"error": str(e.detail), **result.body()},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        except Exception as e:
+            return Response(
+                {"error": f"Failed to create orders: {str(e)}", **result.body()},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
+class OrderLookupView(APIView):
+    """Multi-get for more ids than fit in a URL"""
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def post(self, request):
+        """Get the orders listed in {"ids": [...]}; supports ?fields= and ?embed="""
+        try:
+            fields = requested_fields(request)
+            embed = requested_embed(request)
+            ids = requested_keys(request, 'ids', uuid.UUID)
+            if ids is None:
+                raise ValueError("Missing required field: ids")
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            mark_read_only(request)
+            return lookup_orders(request, ids, fields, embed)
+        except Exception as e:
+            return Response(
+                {"error": f"Failed to fetch orders: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
+class OrderChangesView(APIView):
+    """Orders changed or deleted since a cursor, for incremental sync"""
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get(self, request):
+        """
+        One page of changes after ?cursor= (or ?updated_since=, or from the
+        start), oldest first: {"orders": [...], "deleted": [ids],
+        "next_cursor": ..., "has_more": ...}
+        """
+        try:
+            position = requested_position(request)
+            limit = requested_limit(request)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if expired(position):
+            return Response(
+                {"error": "Cursor is older than the tombstone retention; sync from scratch"},
+                status=status.HTTP_410_GONE
+            )
+        
+        try:
+            rows = fetch_changes(ORDER_CHANGES, position, limit)
+            return Response(changes_page(rows, 'orders', position, limit))
+        except Exception as e:
+            return Response(
+                {"error": f"Failed to fetch order changes: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
 class OrderDetailView(APIView):
     """Retrieve or delete an order"""
     permission_classes = [permissions.IsAuthenticated]
     
-    def get_db_connection(self):
-        """Get database connection using settings configuration"""
-        return connections['default']
+    def get_db_connection(self, alias=None):
+        """Get database connection: a specific shard, or routed by request"""
+        return connections[alias or db_alias_for(self.request)]
     
     def get(self, request, pk):
         """Get a specific order"""
         try:
-            query = """
-                SELECT 
-                    o.id, o.item, o.amount, o.order_time, o.created_at,
-                    c.id as customer_id, c.code as customer_code, 
-                    c.name as customer_name, c.phone_number as customer_phone
-                FROM orders o
-                JOIN customers c ON o.customer_id = c.id
-                WHERE o.id = %s
-            """
-            with self.get_db_connection().cursor() as cursor:
-                cursor.execute(query, [pk])
-                order_row = cursor.fetchone()
-                
-                if not order_row:
-                    return Response(
-                        {"error": "Order not found"},
-                        status=status.HTTP_404_NOT_FOUND
-                    )
-                
-                columns = [col[0] for col in cursor.description]
-                order = dict(zip(columns, order_row))
+            if sharding_enabled():
+                _, order = locate(ORDER_DETAIL, [pk])
+            elif db_json_enabled(request):
+                with self.get_db_connection().cursor() as cursor:
+                    order = ORDER_DETAIL_JSON.fetchvalue(cursor, [pk])
+                if order:
+                    return DBJSONResponse(order)
+            else:
+                with self.get_db_connection().cursor() as cursor:
+                    order = ORDER_DETAIL.fetchone(cursor, [pk])
+            
+            if not order:
+                return Response(
+                    {"error": "Order not found"},
+                    status=status.HTTP_404_NOT_FOUND
+                )
             
             return Response(order)
             
@@ -139,21 +386,23 @@ class OrderDetailView(APIView):
     def delete(self, request, pk):
         """Delete an order"""
         try:
-            check_query = "SELECT id FROM orders WHERE id = %s"
-            with self.get_db_connection().cursor() as cursor:
-                cursor.execute(check_query, [pk])
-                existing_order = cursor.fetchone()
+            if sharding_enabled():
+                alias, deleted_order = locate(ORDER_DELETE, [pk])
+            else:
+                alias = db_alias_for(request)
+                with transaction.atomic(using=alias), connections[alias].cursor() as cursor:
+                    deleted_order = ORDER_DELETE.fetchone(cursor, [pk])
+                    if deleted_order and shares_outbox(alias):
+                        enqueue(cursor, ORDER_DELETED, deleted_order)
             
-            if not existing_order:
+            if not deleted_order:
                 return Response(
                     {"error": "Order not found"},
                     status=status.HTTP_404_NOT_FOUND
                 )
             
-            delete_query = "DELETE FROM orders WHERE id = %s"
-            with self.get_db_connection().cursor() as cursor:
-                cursor.execute(delete_query, [pk])
-            
+            if not shares_outbox(alias):
+                publish(ORDER_DELETED, deleted_order)
             return Response(status=status.HTTP_204_NO_CONTENT)
             
         except Exception as e:
@@ -167,18 +416,26 @@ class OrderByCustomerView(APIView):
     """Get orders by customer code"""
     permission_classes = [permissions.IsAuthenticated]
     
-    def get_db_connection(self):
-        """Get database connection using settings configuration"""
-        return connections['default']
+    def get_db_connection(self, alias=None):
+        """Get database connection: a specific shard, or routed by request"""
+        return connections[alias or db_alias_for(self.request)]
     
     def get(self, request, customer_id=None):
-        """Get orders by customer ID or customer code"""
+        """Get orders by customer ID or customer code; supports ?fields= and ?embed="""
         try:
+            fields = requested_fields(request)
+            embed = requested_embed(request)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            shard = None
             if customer_id:
-                customer_query = "SELECT id, code FROM customers WHERE id = %s"
-                with self.get_db_connection().cursor() as cursor:
-                    cursor.execute(customer_query, [customer_id])
-                    customer = cursor.fetchone()
+                if sharding_enabled():
+                    shard, customer = locate(CUSTOMER_BY_ID, [customer_id])
+                else:
+                    with self.get_db_connection().cursor() as cursor:
+                        customer = CUSTOMER_BY_ID.fetchone(cursor, [customer_id])
                 
                 if not customer:
                     return Response(
@@ -186,16 +443,8 @@ class OrderByCustomerView(APIView):
                         status=status.HTTP_404_NOT_FOUND
                     )
                 
-                orders_query = """
-                    SELECT 
-                        o.id, o.item, o.amount, o.order_time, o.created_at,
-                        c.id as customer_id, c.code as customer_code, 
-                        c.name as customer_name, c.phone_number as customer_phone
-                    FROM orders o
-                    JOIN customers c ON o.customer_id = c.id
-                    WHERE c.id = %s
-                    ORDER BY o.order_time DESC
-                """
+                orders_query = ORDERS_BY_CUSTOMER_ID
+                orders_json_query = ORDERS_BY_CUSTOMER_ID_JSON
                 query_param = customer_id
                 
             else:
@@ -206,10 +455,10 @@ class OrderByCustomerView(APIView):
                         status=status.HTTP_400_BAD_REQUEST
                     )
                 
-                customer_query = "SELECT id FROM customers WHERE code = %s"
-                with self.get_db_connection().cursor() as cursor:
-                    cursor.execute(customer_query, [customer_code])
-                    customer = cursor.fetchone()
+                if sharding_enabled():
+                    shard = shard_for_code(customer_code)
+                with self.get_db_connection(shard).cursor() as cursor:
+                    customer = CUSTOMER_BY_CODE.fetchone(cursor, [customer_code])
                 
                 if not customer:
                     return Response(
@@ -217,26 +466,107 @@ class OrderByCustomerView(APIView):
                         status=status.HTTP_404_NOT_FOUND
                     )
                 
-                orders_query = """
-                    SELECT 
-                        o.id, o.item, o.amount, o.order_time, o.created_at,
-                        c.id as customer_id, c.code as customer_code, 
-                        c.name as customer_name, c.phone_number as customer_phone
-                    FROM orders o
-                    JOIN customers c ON o.customer_id = c.id
-                    WHERE c.code = %s
-                    ORDER BY o.order_time DESC
-                """
+                orders_query = ORDERS_BY_CUSTOMER_CODE
+                orders_json_query = ORDERS_BY_CUSTOMER_CODE_JSON
                 query_param = customer_code
             
-            with self.get_db_connection().cursor() as cursor:
-                cursor.execute(orders_query, [query_param])
-                columns = [col[0] for col in cursor.description]
-                orders = [dict(zip(columns, row)) for row in cursor.fetchall()]
-            return Response(orders)
+            selected = selected_fields(fields, embed)
+            if selected is not None:
+                # The customer is resolved already, so filter on its id and
+                # join customers only if customer_* fields are requested.
+                orders_query = order_projection('customer', selected)
+                orders_json_query = order_projection('customer', selected, as_json=True)
+                query_param = customer['id']
+            
+            with self.get_db_connection(shard).cursor() as cursor:
+                if db_json_enabled(request) and not embed:
+                    return DBJSONResponse(orders_json_query.fetchvalue(cursor, [query_param]))
+                orders = orders_query.fetchall(cursor, [query_param])
+            return Response(embed_customers(orders) if embed else orders)
             
         except Exception as e:
             return Response(
                 {"error": f"Failed to fetch orders: {str(e)}"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
\ No newline at end of file
+            )
+
+def upload_chunks(request):
+    """
+    (format, chunks) of an import upload: a multipart ``file`` field named
+    *.csv, *.ndjson or *.jsonl, or a raw body whose Content-Type names the
+    format. Raises ValueError when there is no file or the format is unknown.
+    """
+    if request.content_type.startswith('multipart/form-data'):
+        upload = request.FILES.get('file')
+        if upload is None:
+            raise ValueError("Upload the file as the 'file' field")
+        extension = os.path.splitext(upload.name)[1].lower()
+        file_format = {'.csv': 'csv', '.ndjson': 'ndjson', '.jsonl': 'ndjson'}.get(extension)
+        if file_format is None:
+            raise ValueError("File name must end in .csv, .ndjson or .jsonl")
+        return file_format, upload.chunks(UPLOAD_CHUNK_SIZE)
+
+    file_format = IMPORT_CONTENT_TYPES.get(request.content_type.split(';')[0].strip().lower())
+    if file_format is None:
+        raise ValueError(f"Content-Type must be one of: {', '.join(IMPORT_CONTENT_TYPES)}")
+    if request.stream is None:
+        raise ValueError("The upload is empty")
+    return file_format, iter(lambda: request.stream.read(UPLOAD_CHUNK_SIZE), b'')
+
+
+class OrderImportListView(APIView):
+    """Queue bulk order imports and list recent ones (see orders.imports)"""
+    permission_classes = [permissions.IsAdminUser]
+    
+    def get(self, request):
+        """The latest import jobs, newest first"""
+        try:
+            with connections[PRIMARY_ALIAS].cursor() as cursor:
+                return Response(IMPORT_JOB_LIST.fetchall(cursor))
+        except Exception as e:
+            return Response(
+                {"error": f"Failed to fetch imports: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+    
+    def post(self, request):
+        """
+        Store a CSV or NDJSON file of orders and queue it; returns the job
+        at once, with 202. Poll /api/orders/imports/{id}/ for progress.
+        """
+        try:
+            file_format, chunks = upload_chunks(request)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            job = store_upload(chunks, file_format)
+            return Response(job, status=status.HTTP_202_ACCEPTED)
+        except Exception as e:
+            return Response(
+                {"error": f"Failed to queue import: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
+class OrderImportDetailView(APIView):
+    """Status of an import job: progress, rows per second and rejected rows"""
+    permission_classes = [permissions.IsAdminUser]
+    
+    def get(self, request, pk):
+        """The job and its first IMPORT_REJECTS_SHOWN rejected rows"""
+        try:
+            with connections[PRIMARY_ALIAS].cursor() as cursor:
+                job = IMPORT_JOB_DETAIL.fetchone(cursor, [pk])
+                if not job:
+                    return Response(
+                        {"error": "Import not found"},
+                        status=status.HTTP_404_NOT_FOUND
+                    )
+                job['rejects'] = IMPORT_REJECTS.fetchall(cursor, [pk, settings.IMPORT_REJECTS_SHOWN])
+            return Response(job)
+        except Exception as e:
+            return Response(
+                {"error": f"Failed to fetch import: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
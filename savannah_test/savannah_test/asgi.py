@@ -2,6 +2,12 @@
 ASGI config for savannah_test project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Serve it with an ASGI server, e.g.
+
+    uvicorn savannah_test.asgi:application --workers 2
+
+The async endpoints under /api/async/ then share one asyncpg pool per
+worker; the sync DRF endpoints still work but run in a thread.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
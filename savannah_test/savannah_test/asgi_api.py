@@ -0,0 +1,15 @@
+"""
+ASGI entrypoint serving only the customers/orders API with settings_api,
+including the async views under /api/async/.
+
+    uvicorn savannah_test.asgi_api:application
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ['DJANGO_SETTINGS_MODULE'] = 'savannah_test.settings_api'
+os.environ.setdefault('DJANGO_API_ASYNC_VIEWS', 'True')
+
+application = get_asgi_application()
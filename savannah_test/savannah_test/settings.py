@@ -1,12 +1,14 @@
 import os
 from pathlib import Path
 
-# Load environment variables from .env file
-try:
-    from dotenv import load_dotenv
-    load_dotenv()
-except ImportError:
-    pass
+# Load environment variables from .env file, unless the platform already
+# provides them (DJANGO_SKIP_DOTENV=True, e.g. serverless deploys)
+if os.getenv('DJANGO_SKIP_DOTENV', 'False').lower() != 'true':
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -39,16 +41,19 @@ INSTALLED_APPS = [
     'core',
     'customers',
     'orders',
+    'webhooks',
 ]
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.CompressionMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.ReadYourWritesMiddleware',
     'mozilla_django_oidc.middleware.SessionRefresh',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
@@ -74,17 +79,156 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'savannah_test.wsgi.application'
 
+# Import-time budget for booting the app, checked by `manage.py profile_startup`
+STARTUP_IMPORT_BUDGET_MS = float(os.getenv('STARTUP_IMPORT_BUDGET_MS', '1500'))
+
+# Connections are borrowed from a per-process pool (core.db.pool) and handed
+# back at the end of each request. Set DB_POOL_ENABLED=False to fall back to
+# Django's persistent per-thread connections instead.
+DB_POOL_ENABLED = os.getenv('DB_POOL_ENABLED', 'True').lower() == 'true'
+
 DATABASES = {
     'default': { 
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'core.db.backends.postgresql_pool' if DB_POOL_ENABLED else 'django.db.backends.postgresql',
         'NAME': os.getenv('POSTGRES_DB', 'customer_order_db'),
         'USER': os.getenv('POSTGRES_USER', 'postgres'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', 'root'),
         'HOST': os.getenv('POSTGRES_HOST', 'localhost'),
         'PORT': os.getenv('POSTGRES_PORT', '5432'),
+        'CONN_MAX_AGE': 0 if DB_POOL_ENABLED else int(os.getenv('CONN_MAX_AGE', '60')),
+        'CONN_HEALTH_CHECKS': True,
+        'POOL': {
+            'MIN_SIZE': int(os.getenv('DB_POOL_MIN_SIZE', '2')),
+            'MAX_SIZE': int(os.getenv('DB_POOL_MAX_SIZE', '10')),
+            'MAX_LIFETIME': int(os.getenv('DB_POOL_MAX_LIFETIME', '1800')),
+            'MAX_IDLE': int(os.getenv('DB_POOL_MAX_IDLE', '300')),
+            'TIMEOUT': float(os.getenv('DB_POOL_TIMEOUT', '30')),
+            'HEALTH_CHECK_AFTER': float(os.getenv('DB_POOL_HEALTH_CHECK_AFTER', '10')),
+        },
     }
 }
 
+# Hot queries run as server-side prepared statements (core.db.statements).
+# Turn off behind a transaction-pooling proxy such as PgBouncer.
+DB_PREPARED_STATEMENTS = os.getenv('DB_PREPARED_STATEMENTS', 'True').lower() == 'true'
+
+# Let PostgreSQL build the JSON body of customer and order reads
+# (core.db.jsonsql); responses are unchanged. Ignored when sharding is on.
+DB_JSON_RESPONSES = os.getenv('DB_JSON_RESPONSES', 'False').lower() == 'true'
+
+# Read replicas, e.g. POSTGRES_REPLICA_HOSTS=replica1:5432,replica2:5432.
+# Each gets its own alias (replica_1, replica_2, ...) with the primary's
+# credentials; safe API reads are routed there by core.db.routing.
+DATABASE_READ_REPLICAS = []
+for index, replica in enumerate(filter(None, os.getenv('POSTGRES_REPLICA_HOSTS', '').split(',')), start=1):
+    host, _, port = replica.strip().partition(':')
+    alias = f'replica_{index}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': port or DATABASES['default']['PORT'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_READ_REPLICAS.append(alias)
+
+# Opt-in customer sharding, e.g. POSTGRES_SHARD_DATABASES=shard0,db2:5432/shard1.
+# Entries are [host[:port]/]dbname and become aliases shard_0, shard_1, ...;
+# the order matters, see core.db.sharding. Replica routing does not apply
+# to sharded reads.
+CUSTOMER_SHARDS = []
+for index, shard in enumerate(filter(None, os.getenv('POSTGRES_SHARD_DATABASES', '').split(','))):
+    location, _, name = shard.strip().rpartition('/')
+    host, _, port = location.partition(':')
+    alias = f'shard_{index}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'NAME': name,
+        'HOST': host or DATABASES['default']['HOST'],
+        'PORT': port or DATABASES['default']['PORT'],
+    }
+    CUSTOMER_SHARDS.append(alias)
+SHARD_FANOUT_WORKERS = int(os.getenv('SHARD_FANOUT_WORKERS', '8'))
+
+# Most keys one multi-get (?ids=, ?codes=, POST .../lookup/) may ask for
+MULTI_GET_MAX_KEYS = int(os.getenv('MULTI_GET_MAX_KEYS', '1000'))
+
+# Orders per customer for ?include=recent_orders: default and largest ?limit=
+RECENT_ORDERS_DEFAULT_LIMIT = int(os.getenv('RECENT_ORDERS_DEFAULT_LIMIT', '5'))
+RECENT_ORDERS_MAX_LIMIT = int(os.getenv('RECENT_ORDERS_MAX_LIMIT', '50'))
+
+# Server-Sent Events at /api/orders/stream/ (orders.streams), ASGI only. Each client
+# may fall ORDER_STREAM_CLIENT_BUFFER events behind before it is dropped;
+# the last ORDER_STREAM_HISTORY events per process can be resumed with
+# Last-Event-ID. Idle streams get a comment every ORDER_STREAM_HEARTBEAT
+# seconds and are ended (clients reconnect) after ORDER_STREAM_MAX_AGE.
+ORDER_STREAM_CLIENT_BUFFER = int(os.getenv('ORDER_STREAM_CLIENT_BUFFER', '1000'))
+ORDER_STREAM_HISTORY = int(os.getenv('ORDER_STREAM_HISTORY', '10000'))
+ORDER_STREAM_HEARTBEAT = float(os.getenv('ORDER_STREAM_HEARTBEAT', '15'))
+ORDER_STREAM_MAX_AGE = float(os.getenv('ORDER_STREAM_MAX_AGE', '300'))
+
+# Incremental sync (/api/customers/changes/, /api/orders/changes/, core.changes).
+# Pages stop before the start of the oldest open transaction and the last
+# SYNC_SETTLE_SECONDS, so no in-flight write is skipped; tombstones are
+# kept for SYNC_TOMBSTONE_RETENTION_DAYS (see purge_tombstones), and older
+# cursors get 410 Gone.
+SYNC_PAGE_SIZE = int(os.getenv('SYNC_PAGE_SIZE', '500'))
+SYNC_MAX_PAGE_SIZE = int(os.getenv('SYNC_MAX_PAGE_SIZE', '5000'))
+SYNC_SETTLE_SECONDS = float(os.getenv('SYNC_SETTLE_SECONDS', '2'))
+SYNC_TOMBSTONE_RETENTION_DAYS = int(os.getenv('SYNC_TOMBSTONE_RETENTION_DAYS', '30'))
+
+# Group commit for order creation (orders.groupcommit): concurrent
+# POST /api/orders/ calls are written with one multi-row INSERT and one
+# commit, waiting up to ORDER_GROUP_COMMIT_WINDOW_MS for up to
+# ORDER_GROUP_COMMIT_MAX_ROWS rows. Helps when commits (WAL flushes) are
+# the bottleneck; costs each order up to the window in latency.
+ORDER_GROUP_COMMIT = os.getenv('ORDER_GROUP_COMMIT', 'False').lower() == 'true'
+ORDER_GROUP_COMMIT_WINDOW_MS = float(os.getenv('ORDER_GROUP_COMMIT_WINDOW_MS', '2'))
+ORDER_GROUP_COMMIT_MAX_ROWS = int(os.getenv('ORDER_GROUP_COMMIT_MAX_ROWS', '64'))
+
+# Bulk order imports (orders.imports): uploads are stored in IMPORT_DIR,
+# which `manage.py process_order_imports` must see too, and loaded
+# IMPORT_CHUNK_ROWS at a time. IMPORT_VALIDATION_PROCESSES > 0 validates
+# chunks in that many processes. A running job that saved no progress for
+# IMPORT_STALE_SECONDS is taken over by another worker.
+IMPORT_DIR = os.getenv('IMPORT_DIR', os.path.join(BASE_DIR, 'imports'))
+IMPORT_CHUNK_ROWS = int(os.getenv('IMPORT_CHUNK_ROWS', '10000'))
+IMPORT_VALIDATION_PROCESSES = int(os.getenv('IMPORT_VALIDATION_PROCESSES', '0'))
+IMPORT_POLL_INTERVAL = float(os.getenv('IMPORT_POLL_INTERVAL', '2'))
+IMPORT_STALE_SECONDS = int(os.getenv('IMPORT_STALE_SECONDS', '300'))
+IMPORT_MAX_STORED_REJECTS = int(os.getenv('IMPORT_MAX_STORED_REJECTS', '1000'))
+IMPORT_REJECTS_SHOWN = int(os.getenv('IMPORT_REJECTS_SHOWN', '100'))
+
+# Batch endpoints (core.bulk): bodies are JSON arrays parsed as they arrive
+# and written BULK_CHUNK_SIZE elements per statement; responses list the
+# first BULK_MAX_ERRORS failed elements.
+BULK_CHUNK_SIZE = int(os.getenv('BULK_CHUNK_SIZE', '1000'))
+BULK_MAX_ERRORS = int(os.getenv('BULK_MAX_ERRORS', '1000'))
+
+# Order webhooks, sent by `manage.py dispatch_webhooks` (webhooks.dispatcher)
+# with WEBHOOK_WORKERS threads. Failed deliveries are retried after
+# WEBHOOK_RETRY_BASE_DELAY seconds, doubling up to WEBHOOK_RETRY_MAX_DELAY,
+# and dead-lettered after WEBHOOK_MAX_ATTEMPTS.
+WEBHOOK_WORKERS = int(os.getenv('WEBHOOK_WORKERS', '8'))
+WEBHOOK_POLL_INTERVAL = float(os.getenv('WEBHOOK_POLL_INTERVAL', '1'))
+WEBHOOK_TIMEOUT = float(os.getenv('WEBHOOK_TIMEOUT', '5'))
+WEBHOOK_MAX_ATTEMPTS = int(os.getenv('WEBHOOK_MAX_ATTEMPTS', '10'))
+WEBHOOK_RETRY_BASE_DELAY = float(os.getenv('WEBHOOK_RETRY_BASE_DELAY', '10'))
+WEBHOOK_RETRY_MAX_DELAY = float(os.getenv('WEBHOOK_RETRY_MAX_DELAY', '3600'))
+WEBHOOK_MAX_BATCH_SIZE = int(os.getenv('WEBHOOK_MAX_BATCH_SIZE', '100'))
+
+REPLICA_MAX_LAG = float(os.getenv('REPLICA_MAX_LAG', '5'))
+REPLICA_LAG_CHECK_INTERVAL = float(os.getenv('REPLICA_LAG_CHECK_INTERVAL', '5'))
+READ_YOUR_WRITES_WINDOW = int(os.getenv('READ_YOUR_WRITES_WINDOW', '5'))
+
+# gzip/brotli response compression (core.middleware.CompressionMiddleware).
+# Bodies smaller than COMPRESSION_MIN_SIZE bytes are sent as is; streams are
+# flushed at least every COMPRESSION_BUFFER_SIZE bytes of input. Above
+# COMPRESSION_BUSY_LOAD (load average per CPU) the fastest level is used.
+COMPRESSION_ENABLED = os.getenv('COMPRESSION_ENABLED', 'True').lower() == 'true'
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', '1024'))
+COMPRESSION_BUFFER_SIZE = int(os.getenv('COMPRESSION_BUFFER_SIZE', '65536'))
+COMPRESSION_BUSY_LOAD = float(os.getenv('COMPRESSION_BUSY_LOAD', '0.75'))
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'mozilla_django_oidc.contrib.drf.OIDCAuthentication',
@@ -95,6 +239,19 @@ REST_FRAMEWORK = {
     'DEFAULT_FILTER_BACKENDS': (
         'django_filters.rest_framework.DjangoFilterBackend',
     ),
+    # orjson-backed JSON, with the same output as DRF's JSONRenderer, and
+    # MessagePack for internal services (Accept: application/msgpack)
+    'DEFAULT_RENDERER_CLASSES': (
+        'core.renderers.ORJSONRenderer',
+        'core.renderers.MessagePackRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'core.parsers.ORJSONParser',
+        'core.parsers.MessagePackParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
 }
 
 OAUTH2_PROVIDER = {
@@ -129,6 +286,34 @@ AUTHENTICATION_BACKENDS = [
     'django.contrib.auth.backends.ModelBackend',
 ]
 
+# Caching and sessions
+# cached_db serves session reads from the cache and only writes through to
+# Postgres when the session is modified. That only works with a cache shared
+# by every worker, so without REDIS_URL sessions stay in the database rather
+# than in a per-process cache that would hand out stale (e.g. logged-out)
+# sessions. Signed cookies skip the database as well but are opt-in, via
+# SESSION_ENGINE: they can't be revoked server-side, and sessions holding
+# OIDC tokens may outgrow the browser's cookie size limit.
+REDIS_URL = os.getenv('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+    SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+    SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+SESSION_ENGINE = os.getenv('SESSION_ENGINE', SESSION_ENGINE)
+SESSION_SAVE_EVERY_REQUEST = False
+SESSION_CLEANUP_BATCH_SIZE = int(os.getenv('SESSION_CLEANUP_BATCH_SIZE', '1000'))
+
 # Mobile Sasa SMS Configuration
 MOBILE_SASA_API_TOKEN = os.getenv('MOBILE_SASA_API_TOKEN')
 MOBILE_SASA_SENDER_ID = os.getenv('MOBILE_SASA_SENDER_ID', 'MOBILESASA')
@@ -0,0 +1,61 @@
+"""
+Slim settings for serving only the customers/orders API, e.g. on serverless
+platforms where every cold start pays for what INSTALLED_APPS imports.
+
+Compared to settings.py this drops the admin, sessions, messages, static
+files, templates, django_filters and the OAuth2 provider, and authenticates
+API requests with core.authentication.LazyOIDCAuthentication, which imports
+mozilla_django_oidc on the first authenticated request instead of at boot.
+Environment variables are expected to come from the platform, not .env.
+
+Use it through savannah_test.wsgi_api or savannah_test.asgi_api.
+"""
+import os
+
+os.environ.setdefault('DJANGO_SKIP_DOTENV', 'True')
+
+from .settings import *  # noqa: E402,F401,F403
+
+INSTALLED_APPS = [
+    'django.contrib.auth',
+    'django.contrib.contenttypes',
+    'rest_framework',
+    'corsheaders',
+    'core',
+    'customers',
+    'orders',
+]
+
+MIDDLEWARE = [
+    'corsheaders.middleware.CorsMiddleware',
+    'django.middleware.security.SecurityMiddleware',
+    'core.middleware.CompressionMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'core.middleware.ReadYourWritesMiddleware',
+]
+
+ROOT_URLCONF = 'savannah_test.urls_api'
+TEMPLATES = []
+
+REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': (
+        'core.authentication.LazyOIDCAuthentication',
+    ),
+    'DEFAULT_PERMISSION_CLASSES': (
+        'rest_framework.permissions.IsAuthenticated',
+    ),
+    # The browsable API needs templates and static files.
+    'DEFAULT_RENDERER_CLASSES': (
+        'core.renderers.ORJSONRenderer',
+        'core.renderers.MessagePackRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'core.parsers.ORJSONParser',
+        'core.parsers.MessagePackParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
+}
+
+# Set by asgi_api: also route the async views (and import asyncpg).
+API_ASYNC_VIEWS = os.getenv('DJANGO_API_ASYNC_VIEWS', 'False').lower() == 'true'
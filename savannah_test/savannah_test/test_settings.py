@@ -23,6 +23,17 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.ORJSONRenderer',
+        'core.renderers.MessagePackRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'core.parsers.ORJSONParser',
+        'core.parsers.MessagePackParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
 # Disable all external services
@@ -31,6 +42,12 @@ OIDC_ENABLED = False
 # Remove OIDC middleware if present
 MIDDLEWARE = [m for m in MIDDLEWARE if 'oidc' not in m.lower()]
 
+# Pooled connections would stay open on the test database and block
+# DROP DATABASE at teardown, so tests use plain Django connections.
+for database in DATABASES.values():
+    database['ENGINE'] = 'django.db.backends.postgresql'
+    database['CONN_MAX_AGE'] = 0
+
 # Use in-memory cache
 CACHES = {
     'default': {
@@ -11,6 +11,10 @@ urlpatterns = [
     path('api/auth/', include('core.urls')),
     path('api/customers/', include('customers.urls')),
     path('api/orders/', include('orders.urls')),
+    path('api/webhooks/', include('webhooks.urls')),
+    # Async variants of the same endpoints, for ASGI servers (see asgi.py).
+    path('api/async/customers/', include('customers.async_urls')),
+    path('api/async/orders/', include('orders.async_urls')),
     path('o/', include('oauth2_provider.urls', namespace='oauth2_provider')),
     path('oidc/', include('mozilla_django_oidc.urls')),
 ]
@@ -0,0 +1,16 @@
+"""
+URLconf for the slim API-only entrypoints (settings_api)
+"""
+from django.conf import settings
+from django.urls import path, include
+
+urlpatterns = [
+    path('api/customers/', include('customers.urls')),
+    path('api/orders/', include('orders.urls')),
+]
+
+if settings.API_ASYNC_VIEWS:
+    urlpatterns += [
+        path('api/async/customers/', include('customers.async_urls')),
+        path('api/async/orders/', include('orders.async_urls')),
+    ]
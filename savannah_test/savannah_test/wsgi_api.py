@@ -0,0 +1,14 @@
+"""
+WSGI entrypoint serving only the customers/orders API with settings_api.
+
+The settings module is forced rather than defaulted, because serverless
+platforms usually set DJANGO_SETTINGS_MODULE for the full site as well.
+"""
+
+import os
+
+from django.core.wsgi import get_wsgi_application
+
+os.environ['DJANGO_SETTINGS_MODULE'] = 'savannah_test.settings_api'
+
+application = get_wsgi_application()
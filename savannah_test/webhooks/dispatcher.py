@@ -0,0 +1,193 @@
+"""
+Sends queued webhook deliveries (see webhooks.events) from a pool of
+worker threads. Run it next to the API with ``manage.py dispatch_webhooks``.
+
+Each poll hands every subscription with deliveries due, and not already
+being served, to a worker. The worker claims up to the subscription's
+max_batch_size deliveries and POSTs them in one request, and keeps going
+while a backlog remains, for up to TURN_SECONDS. A subscription is served
+by one worker at a time, so a slow receiver holds one thread for at most
+WEBHOOK_TIMEOUT per request and the others keep going; the order API only
+ever inserts rows. One requests.Session keeps a connection pool per host.
+
+Failed deliveries are retried with exponential backoff and, after
+WEBHOOK_MAX_ATTEMPTS, kept as dead letters that the API can list and
+re-queue. Claims are leases: deliveries claimed by a dispatcher that dies
+come due again, so delivery of a queued event is at least once and
+receivers should dedupe on the event id. (Events of sharded writes may
+not get queued at all; see webhooks.events.)
+
+Requests are signed with the subscription secret:
+``X-Webhook-Signature: t=<unix time>,v1=<hex HMAC-SHA256 of "<t>.<body>">``.
+"""
+import hashlib
+import hmac
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.db import close_old_connections, connections
+
+from core.db.routing import PRIMARY_ALIAS
+from webhooks.queries import DELIVERY_CLAIM, DELIVERY_DONE, DELIVERY_FAILED, DUE_SUBSCRIPTIONS
+
+logger = logging.getLogger(__name__)
+
+# Longest a worker keeps draining one subscription's backlog before
+# letting the next poll share the threads out again
+TURN_SECONDS = 1.0
+
+# Hosts to keep a connection pool for
+HOST_POOLS = 100
+
+
+def signature(secret, timestamp, body):
+    digest = hmac.new(secret.encode(), f'{timestamp}.'.encode() + body, hashlib.sha256).hexdigest()
+    return f't={timestamp},v1={digest}'
+
+
+def batch_body(payloads):
+    """One event as is, several as {"events": [...]}, without re-encoding them"""
+    if len(payloads) == 1:
+        return payloads[0].encode()
+    return b'{"events":[' + ','.join(payloads).encode() + b']}'
+
+
+def backoff(attempts):
+    """Seconds before retrying after ``attempts`` failures, doubling with jitter"""
+    delay = min(
+        settings.WEBHOOK_RETRY_MAX_DELAY,
+        settings.WEBHOOK_RETRY_BASE_DELAY * 2 ** (attempts - 1),
+    )
+    return random.uniform(delay / 2, delay)
+
+
+def make_session(workers):
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=HOST_POOLS, pool_maxsize=workers)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+class Dispatcher:
+    """Worker pool sending webhook deliveries; see the module docstring"""
+
+    def __init__(self, workers=None):
+        self.workers = workers or settings.WEBHOOK_WORKERS
+        self.session = make_session(self.workers)
+        self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='webhooks')
+        self._serving = set()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self.delivered = 0
+        self.failed = 0
+
+    def poll(self):
+        """Start serving every idle subscription with deliveries due; returns the futures"""
+        with connections[PRIMARY_ALIAS].cursor() as cursor:
+            subscriptions = DUE_SUBSCRIPTIONS.fetchall(cursor)
+        futures = []
+        for subscription in subscriptions:
+            with self._lock:
+                if subscription['id'] in self._serving:
+                    continue
+                self._serving.add(subscription['id'])
+            futures.append(self._executor.submit(self._serve, subscription))
+        return futures
+
+    def run_once(self):
+        """Serve everything due now and wait for it"""
+        wait(self.poll())
+
+    def run(self, poll_interval=None):
+        """Poll until stop() is called"""
+        poll_interval = poll_interval or settings.WEBHOOK_POLL_INTERVAL
+        try:
+            while not self._stopped.is_set():
+                try:
+                    self.poll()
+                except Exception:
+                    logger.exception("Polling webhook deliveries failed")
+                    close_old_connections()
+                self._stopped.wait(poll_interval)
+        finally:
+            self._executor.shutdown(wait=True)
+
+    def stop(self):
+        self._stopped.set()
+
+    def _serve(self, subscription):
+        try:
+            deadline = time.monotonic() + TURN_SECONDS
+            while self.deliver_batch(subscription) and time.monotonic() < deadline:
+                pass
+        except Exception:
+            logger.exception("Serving webhook subscription %s failed", subscription['id'])
+        finally:
+            with self._lock:
+                self._serving.discard(subscription['id'])
+            close_old_connections()
+
+    def deliver_batch(self, subscription):
+        """
+        Claim and send one batch of ``subscription``'s due deliveries;
+        returns whether it was a full batch, i.e. more may be waiting
+        """
+        lease = settings.WEBHOOK_TIMEOUT + 30
+        with connections[PRIMARY_ALIAS].cursor() as cursor:
+            claimed = DELIVERY_CLAIM.fetchall(
+                cursor, [lease, subscription['id'], subscription['max_batch_size']]
+            )
+        if not claimed:
+            return False
+        claimed.sort(key=lambda delivery: delivery['id'])
+
+        error = self.send(subscription, batch_body([delivery['payload'] for delivery in claimed]))
+        ids = [delivery['id'] for delivery in claimed]
+        with connections[PRIMARY_ALIAS].cursor() as cursor:
+            if error is None:
+                DELIVERY_DONE.execute(cursor, [ids])
+            else:
+                attempts = max(delivery['attempts'] for delivery in claimed) + 1
+                DELIVERY_FAILED.execute(
+                    cursor, [error, settings.WEBHOOK_MAX_ATTEMPTS, backoff(attempts), ids]
+                )
+                logger.warning(
+                    "Webhook delivery to %s failed (attempt %d): %s",
+                    subscription['url'], attempts, error
+                )
+        with self._lock:
+            if error is None:
+                self.delivered += len(ids)
+            else:
+                self.failed += len(ids)
+        return error is None and len(claimed) == subscription['max_batch_size']
+
+    def send(self, subscription, body):
+        """POST ``body``; returns None on a 2xx response, the error otherwise"""
+        timestamp = int(time.time())
+        try:
+            response = self.session.post(
+                subscription['url'],
+                data=body,
+                headers={
+                    'Content-Type': 'application/json',
+                    'X-Webhook-Signature': signature(subscription['secret'], timestamp, body),
+                },
+                timeout=settings.WEBHOOK_TIMEOUT,
+                allow_redirects=False,
+            )
+            # Read the body so the connection goes back to the pool
+            response.content
+        except Exception as e:
+            return f"{type(e).__name__}: {e}"
+        if 200 <= response.status_code < 300:
+            return None
+        return f"HTTP {response.status_code}"
@@ -0,0 +1,140 @@
+"""
+Order events for webhook subscribers, queued from the order write paths.
+
+webhook_deliveries lives on the primary database and gets one row per
+subscribed registration for each event; webhooks.dispatcher sends them
+from its own process.
+
+Writes on the primary (shares_outbox()) queue their events with enqueue()
+or enqueue_many() on the write's own cursor, inside its transaction: the
+order change and its deliveries commit together or not at all, so with
+the dispatcher's leases delivery is at least once. An error queuing them
+fails the write.
+
+Writes on a shard can't share a transaction with the outbox. They call
+publish() or publish_many() after the write has committed, which queue
+the events in a statement of their own and only log errors, so the order
+request never fails on account of webhooks. For sharded writes delivery
+is at most once: an event is lost if queuing fails or the process dies
+in between.
+"""
+import logging
+import uuid
+from contextlib import nullcontext
+
+from django.db import connections, transaction
+from django.utils import timezone
+
+from core.db.routing import PRIMARY_ALIAS
+from core.renderers import ORJSONRenderer
+from webhooks.queries import DELIVERY_ENQUEUE, DELIVERY_ENQUEUE_MANY
+
+logger = logging.getLogger(__name__)
+
+ORDER_CREATED = 'order.created'
+ORDER_DELETED = 'order.deleted'
+
+_renderer = ORJSONRenderer()
+
+
+def event_payload(event_id, event, data):
+    return _renderer.render({
+        'id': event_id,
+        'type': event,
+        'created_at': timezone.now(),
+        'data': data,
+    }).decode()
+
+
+def enqueue_params(event, data):
+    """
+    DELIVERY_ENQUEUE parameters for ``event``. The body is rendered once,
+    like an API response, and sent as is to every subscriber.
+    """
+    event_id = uuid.uuid4()
+    return [event_id, event, event_payload(event_id, event, data), event]
+
+
+def enqueue_many_params(event, items):
+    """DELIVERY_ENQUEUE_MANY parameters for one ``event`` per item"""
+    event_ids = [uuid.uuid4() for _ in items]
+    payloads = [event_payload(event_id, event, data) for event_id, data in zip(event_ids, items)]
+    return [event, event_ids, payloads, event]
+
+
+def shares_outbox(alias):
+    """Whether writes on ``alias`` can queue their events in their own transaction"""
+    return alias == PRIMARY_ALIAS
+
+
+def enqueue(cursor, event, data):
+    """Queue ``event`` for every subscriber to it, in ``cursor``'s transaction on the primary"""
+    DELIVERY_ENQUEUE.execute(cursor, enqueue_params(event, data))
+
+
+def enqueue_many(cursor, event, items):
+    """enqueue() for each of ``items`` in one statement"""
+    if items:
+        DELIVERY_ENQUEUE_MANY.execute(cursor, enqueue_many_params(event, items))
+
+
+def publish(event, data):
+    """Queue ``event`` for every subscriber to it after a write elsewhere; at most once"""
+    connection = connections[PRIMARY_ALIAS]
+    # Inside a transaction, a savepoint keeps a failure from aborting it
+    savepoint = transaction.atomic(using=PRIMARY_ALIAS) if connection.in_atomic_block else nullcontext()
+    try:
+        with savepoint, connection.cursor() as cursor:
+            DELIVERY_ENQUEUE.execute(cursor, enqueue_params(event, data))
+    except Exception:
+        logger.exception("Failed to queue %s webhooks", event)
+
+
+def publish_many(event, items):
+    """publish() for each of ``items`` in one statement, e.g. the orders of a deleted customer"""
+    if not items:
+        return
+    connection = connections[PRIMARY_ALIAS]
+    savepoint = transaction.atomic(using=PRIMARY_ALIAS) if connection.in_atomic_block else nullcontext()
+    try:
+        with savepoint, connection.cursor() as cursor:
+            DELIVERY_ENQUEUE_MANY.execute(cursor, enqueue_many_params(event, items))
+    except Exception:
+        logger.exception("Failed to queue %d %s webhooks", len(items), event)
+
+
+async def aenqueue(connection, event, data):
+    """enqueue() on an asyncpg connection, see core.db.aio.transaction()"""
+    from core.db import aio
+
+    await aio.fetch(DELIVERY_ENQUEUE, enqueue_params(event, data), connection=connection)
+
+
+async def aenqueue_many(connection, event, items):
+    """enqueue_many() on an asyncpg connection"""
+    from core.db import aio
+
+    if items:
+        await aio.fetch(DELIVERY_ENQUEUE_MANY, enqueue_many_params(event, items), connection=connection)
+
+
+async def apublish(event, data):
+    """publish() for the async views"""
+    from core.db import aio
+
+    try:
+        await aio.fetch(DELIVERY_ENQUEUE, enqueue_params(event, data))
+    except Exception:
+        logger.exception("Failed to queue %s webhooks", event)
+
+
+async def apublish_many(event, items):
+    """publish_many() for the async views"""
+    from core.db import aio
+
+    if not items:
+        return
+    try:
+        await aio.fetch(DELIVERY_ENQUEUE_MANY, enqueue_many_params(event, items))
+    except Exception:
+        logger.exception("Failed to queue %d %s webhooks", len(items), event)
@@ -0,0 +1,50 @@
+"""
+Management command running the webhook dispatcher (webhooks.dispatcher)
+"""
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from webhooks.dispatcher import Dispatcher
+
+
+class Command(BaseCommand):
+    help = 'Send queued order webhooks until stopped (SIGTERM or Ctrl-C)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=settings.WEBHOOK_WORKERS,
+            help='Deliveries sent concurrently; each subscription uses at most one'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=settings.WEBHOOK_POLL_INTERVAL,
+            help='Seconds between looks for due deliveries'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Send what is due now, then exit'
+        )
+
+    def handle(self, *args, **options):
+        if options['workers'] <= 0:
+            raise CommandError('--workers must be a positive integer')
+
+        dispatcher = Dispatcher(workers=options['workers'])
+        if options['once']:
+            dispatcher.run_once()
+        else:
+            signal.signal(signal.SIGTERM, lambda signum, frame: dispatcher.stop())
+            try:
+                dispatcher.run(options['poll_interval'])
+            except KeyboardInterrupt:
+                dispatcher.stop()
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Delivered {dispatcher.delivered} webhooks, {dispatcher.failed} failed')
+        )
@@ -0,0 +1,112 @@
+"""
+Named SQL statements for webhook registrations and deliveries. See
+core.db.statements. Both tables live on the primary database.
+"""
+from core.db.statements import register
+
+EVENTS = ('order.created', 'order.deleted')
+
+SUBSCRIPTION_COLUMNS_SQL = "id, url, events, max_batch_size, active, created_at"
+
+SUBSCRIPTION_LIST = register('webhook_subscription_list', f"""
+    SELECT {SUBSCRIPTION_COLUMNS_SQL}
+    FROM webhook_subscriptions
+    ORDER BY created_at DESC
+""")
+
+SUBSCRIPTION_DETAIL = register('webhook_subscription_detail', f"""
+    SELECT {SUBSCRIPTION_COLUMNS_SQL}
+    FROM webhook_subscriptions
+    WHERE id = %s
+""")
+
+# The secret is returned once, on creation, for signature checks.
+SUBSCRIPTION_INSERT = register('webhook_subscription_insert', f"""
+    INSERT INTO webhook_subscriptions (url, events, secret, max_batch_size)
+    VALUES (%s, %s, %s, %s)
+    RETURNING {SUBSCRIPTION_COLUMNS_SQL}, secret
+""")
+
+SUBSCRIPTION_DELETE = register('webhook_subscription_delete', """
+    DELETE FROM webhook_subscriptions WHERE id = %s RETURNING id
+""")
+
+# One delivery per active subscription to the event, in one statement on
+# the write path; nothing is sent from the request itself.
+DELIVERY_ENQUEUE = register('webhook_delivery_enqueue', """
+    INSERT INTO webhook_deliveries (subscription_id, event_id, event, payload)
+    SELECT id, %s::uuid, %s::varchar, %s::text
+    FROM webhook_subscriptions
+    WHERE active AND %s = ANY(events)
+""")
+
+# DELIVERY_ENQUEUE for many events of one type at once, from parallel
+# arrays of event ids and payloads
+DELIVERY_ENQUEUE_MANY = register('webhook_delivery_enqueue_many', """
+    INSERT INTO webhook_deliveries (subscription_id, event_id, event, payload)
+    SELECT s.id, e.event_id, %s::varchar, e.payload
+    FROM unnest(%s::uuid[], %s::text[]) WITH ORDINALITY AS e(event_id, payload, position)
+    CROSS JOIN webhook_subscriptions s
+    WHERE s.active AND %s = ANY(s.events)
+    ORDER BY s.id, e.position
+""")
+
+# Subscriptions with deliveries due, for the dispatcher to hand out
+DUE_SUBSCRIPTIONS = register('webhook_due_subscriptions', """
+    SELECT s.id, s.url, s.secret, s.max_batch_size
+    FROM webhook_subscriptions s
+    WHERE EXISTS (
+        SELECT 1 FROM webhook_deliveries d
+        WHERE d.subscription_id = s.id
+          AND d.status = 'pending' AND d.next_attempt_at <= now()
+    )
+""")
+
+# Claim up to a batch of a subscription's due deliveries, oldest first, by
+# pushing next_attempt_at past the lease: another dispatcher skips them,
+# and they come due again by themselves if this one dies.
+DELIVERY_CLAIM = register('webhook_delivery_claim', """
+    UPDATE webhook_deliveries
+    SET next_attempt_at = now() + make_interval(secs => %s)
+    WHERE id IN (
+        SELECT id FROM webhook_deliveries
+        WHERE subscription_id = %s
+          AND status = 'pending' AND next_attempt_at <= now()
+        ORDER BY next_attempt_at, id
+        LIMIT %s
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING id, payload, attempts
+""")
+
+DELIVERY_DONE = register('webhook_delivery_done', """
+    DELETE FROM webhook_deliveries WHERE id = ANY(%s)
+""")
+
+# Back off, or dead-letter after the last attempt (then next_attempt_at
+# records when it failed). Parameters: error, max attempts, delay, ids.
+DELIVERY_FAILED = register('webhook_delivery_failed', """
+    WITH params AS (SELECT %s::text AS error, %s::int AS max_attempts, %s::float AS delay)
+    UPDATE webhook_deliveries
+    SET attempts = attempts + 1,
+        last_error = params.error,
+        status = CASE WHEN attempts + 1 >= params.max_attempts THEN 'dead' ELSE 'pending' END,
+        next_attempt_at = CASE WHEN attempts + 1 >= params.max_attempts THEN now()
+                               ELSE now() + make_interval(secs => params.delay) END
+    FROM params
+    WHERE id = ANY(%s)
+""")
+
+DEAD_LETTERS = register('webhook_dead_letters', """
+    SELECT id, event_id, event, attempts, last_error, created_at, next_attempt_at as failed_at
+    FROM webhook_deliveries
+    WHERE subscription_id = %s AND status = 'dead'
+    ORDER BY id
+""")
+
+DEAD_LETTERS_RETRY = register('webhook_dead_letters_retry', """
+    UPDATE webhook_deliveries
+    SET status = 'pending', attempts = 0, next_attempt_at = now()
+    WHERE subscription_id = %s AND status = 'dead'
+    RETURNING id
+""")
@@ -0,0 +1,255 @@
+import hashlib
+import hmac
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.db import DatabaseError, connections
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from webhooks.dispatcher import Dispatcher
+from webhooks.queries import DELIVERY_ENQUEUE
+
+
+# The outbox tables, for test cases whose order writes queue webhook events
+WEBHOOK_TABLES = (
+    """
+        CREATE TABLE IF NOT EXISTS webhook_subscriptions (
+            id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+            url VARCHAR(500) NOT NULL,
+            events TEXT [] NOT NULL,
+            secret VARCHAR(100) NOT NULL,
+            max_batch_size INTEGER NOT NULL DEFAULT 1,
+            active BOOLEAN NOT NULL DEFAULT true,
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+        )
+    """,
+    """
+        CREATE TABLE IF NOT EXISTS webhook_deliveries (
+            id BIGSERIAL PRIMARY KEY,
+            subscription_id UUID NOT NULL REFERENCES webhook_subscriptions(id) ON DELETE CASCADE,
+            event_id UUID NOT NULL,
+            event VARCHAR(50) NOT NULL,
+            payload TEXT NOT NULL,
+            status VARCHAR(10) NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            last_error TEXT,
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+        )
+    """,
+)
+
+
+class Receiver(BaseHTTPRequestHandler):
+    """Records every POST and answers with the server's status code"""
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        self.server.received.append((self.headers['X-Webhook-Signature'], body))
+        self.send_response(self.server.status_code)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class WebhookTestCase(TransactionTestCase):
+    """
+    Test cases for order webhooks. The dispatcher's worker threads use
+    their own database connections, so the rows have to be committed.
+    """
+
+    def setUp(self):
+        with connections['default'].cursor() as cursor:
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS \"uuid-ossp\"")
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS customers (
+                    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+                    code VARCHAR(50) UNIQUE NOT NULL,
+                    name VARCHAR(100) NOT NULL,
+                    phone_number VARCHAR(20) NOT NULL,
+                    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS orders (
+                    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+                    customer_id UUID NOT NULL REFERENCES customers(id) ON DELETE CASCADE,
+                    item VARCHAR(200) NOT NULL,
+                    amount DECIMAL(10, 2) NOT NULL,
+                    order_time TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+                    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            for statement in WEBHOOK_TABLES:
+                cursor.execute(statement)
+            cursor.execute("DELETE FROM webhook_subscriptions")
+            cursor.execute("DELETE FROM customers WHERE code = 'HOOK001'")
+            cursor.execute(
+                "INSERT INTO customers (code, name, phone_number) VALUES ('HOOK001', 'Hook', '+254733333333')"
+            )
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Receiver)
+        self.server.received = []
+        self.server.status_code = 200
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}/hooks'
+
+        admin = User.objects.create_user(username='hookadmin', password='testpass123', is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(admin)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        with connections['default'].cursor() as cursor:
+            cursor.execute("DELETE FROM webhook_subscriptions")
+            cursor.execute("DELETE FROM customers WHERE code = 'HOOK001'")
+
+    def _subscribe(self, **data):
+        response = self.client.post(reverse('webhook-list'), {'url': self.url, **data}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data
+
+    @patch('core.sms_service.send_sms')
+    def _create_order(self, mock_send_sms):
+        mock_send_sms.return_value = {'status': 'success'}
+        response = self.client.post(
+            reverse('order-list'),
+            {'customer_code': 'HOOK001', 'item': 'Hooked', 'amount': '7.00'},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data
+
+    def _dispatch(self):
+        dispatcher = Dispatcher(workers=2)
+        try:
+            dispatcher.run_once()
+        finally:
+            dispatcher.stop()
+            dispatcher._executor.shutdown()
+        return dispatcher
+
+    def test_order_events_delivered_signed(self):
+        """Created and deleted orders reach the subscriber, signed with its secret"""
+        subscription = self._subscribe()
+        self.assertEqual(subscription['events'], ['order.created', 'order.deleted'])
+        order = self._create_order()
+        response = self.client.delete(reverse('order-detail', kwargs={'pk': order['id']}))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+        dispatcher = self._dispatch()
+
+        self.assertEqual(dispatcher.delivered, 2)
+        self.assertEqual(len(self.server.received), 2)
+        events = []
+        for header, body in self.server.received:
+            timestamp, digest = (part.split('=', 1)[1] for part in header.split(','))
+            expected = hmac.new(
+                subscription['secret'].encode(), f'{timestamp}.'.encode() + body, hashlib.sha256
+            ).hexdigest()
+            self.assertTrue(hmac.compare_digest(digest, expected))
+            events.append(json.loads(body))
+        self.assertEqual([event['type'] for event in events], ['order.created', 'order.deleted'])
+        self.assertEqual({event['data']['id'] for event in events}, {str(order['id'])})
+        self.assertEqual(events[1]['data']['item'], 'Hooked')
+
+        with connections['default'].cursor() as cursor:
+            cursor.execute("SELECT count(*) FROM webhook_deliveries")
+            self.assertEqual(cursor.fetchone()[0], 0)
+
+    def test_batching_and_event_filter(self):
+        """Up to max_batch_size events go in one request; only subscribed events are queued"""
+        self._subscribe(events=['order.created'], max_batch_size=3)
+        orders = [self._create_order() for _ in range(3)]
+        self.client.delete(reverse('order-detail', kwargs={'pk': orders[0]['id']}))
+
+        self._dispatch()
+
+        self.assertEqual(len(self.server.received), 1)
+        batch = json.loads(self.server.received[0][1])
+        self.assertEqual([event['data']['id'] for event in batch['events']], [str(order['id']) for order in orders])
+
+    def test_customer_delete_sends_order_deleted(self):
+        """Orders removed with their customer are reported like deleted orders"""
+        self._subscribe(events=['order.deleted'], max_batch_size=10)
+        orders = [self._create_order() for _ in range(2)]
+        customer_id = orders[0]['customer_id']
+        response = self.client.delete(reverse('customer-detail', kwargs={'pk': customer_id}))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+        self._dispatch()
+
+        self.assertEqual(len(self.server.received), 1)
+        events = json.loads(self.server.received[0][1])['events']
+        self.assertEqual({event['type'] for event in events}, {'order.deleted'})
+        self.assertEqual({event['data']['id'] for event in events}, {str(order['id']) for order in orders})
+        self.assertEqual(events[0]['data']['item'], 'Hooked')
+        self.assertEqual(len({event['id'] for event in events}), 2)
+
+    def test_order_and_its_events_commit_together(self):
+        """An order whose events can't be queued is rolled back; group commit queues them once"""
+        self._subscribe(events=['order.created'], max_batch_size=10)
+        with patch.object(DELIVERY_ENQUEUE, 'execute', side_effect=DatabaseError('outbox unavailable')):
+            response = self.client.post(
+                reverse('order-list'),
+                {'customer_code': 'HOOK001', 'item': 'Lost', 'amount': '7.00'},
+                format='json'
+            )
+        self.assertEqual(response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
+        with connections['default'].cursor() as cursor:
+            cursor.execute("SELECT count(*) FROM orders WHERE item = 'Lost'")
+            self.assertEqual(cursor.fetchone()[0], 0)
+
+        with override_settings(ORDER_GROUP_COMMIT=True, ORDER_GROUP_COMMIT_WINDOW_MS=1):
+            order = self._create_order()
+
+        self._dispatch()
+
+        self.assertEqual(len(self.server.received), 1)
+        event = json.loads(self.server.received[0][1])
+        self.assertEqual((event['type'], event['data']['id']), ('order.created', str(order['id'])))
+
+    @override_settings(WEBHOOK_MAX_ATTEMPTS=1)
+    def test_failed_delivery_dead_letter_and_retry(self):
+        """A failing receiver's deliveries become dead letters that can be re-queued"""
+        subscription = self._subscribe()
+        self._create_order()
+        self.server.status_code = 500
+
+        dispatcher = self._dispatch()
+
+        self.assertEqual(dispatcher.failed, 1)
+        url = reverse('webhook-dead-letters', kwargs={'pk': subscription['id']})
+        dead = self.client.get(url).data
+        self.assertEqual(len(dead), 1)
+        self.assertEqual(dead[0]['last_error'], 'HTTP 500')
+
+        self.server.status_code = 200
+        self.assertEqual(self.client.post(url).data, {'requeued': 1})
+        self.assertEqual(self._dispatch().delivered, 1)
+        self.assertEqual(self.client.get(url).data, [])
+
+    def test_registration_validation(self):
+        """Invalid registrations are rejected and the API is staff only"""
+        for data in (
+            {'url': 'ftp://example.com/hooks'},
+            {'url': self.url, 'events': ['order.updated']},
+            {'url': self.url, 'max_batch_size': 0},
+        ):
+            response = self.client.post(reverse('webhook-list'), data, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.client.force_authenticate(User.objects.create_user(username='hookuser', password='testpass123'))
+        response = self.client.get(reverse('webhook-list'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
@@ -0,0 +1,8 @@
+from django.urls import path
+from .views import WebhookListView, WebhookDetailView, WebhookDeadLetterView
+
+urlpatterns = [
+    path('', WebhookListView.as_view(), name='webhook-list'),
+    path('<uuid:pk>/', WebhookDetailView.as_view(), name='webhook-detail'),
+    path('<uuid:pk>/dead-letters/', WebhookDeadLetterView.as_view(), name='webhook-dead-letters'),
+]
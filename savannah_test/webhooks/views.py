@@ -0,0 +1,141 @@
+import secrets
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.db import connections
+from rest_framework import permissions, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from core.db.routing import PRIMARY_ALIAS
+from webhooks.queries import (
+    DEAD_LETTERS, DEAD_LETTERS_RETRY, EVENTS, SUBSCRIPTION_DELETE, SUBSCRIPTION_DETAIL,
+    SUBSCRIPTION_INSERT, SUBSCRIPTION_LIST,
+)
+
+
+def requested_registration(data):
+    """
+    (url, events, max_batch_size) for a new subscription from a request
+    body. Raises ValueError for anything invalid.
+    """
+    url = data.get('url')
+    parts = urlsplit(url) if isinstance(url, str) else None
+    if parts is None or parts.scheme not in ('http', 'https') or not parts.netloc:
+        raise ValueError("url must be an http or https URL")
+
+    events = data.get('events', list(EVENTS))
+    if not isinstance(events, list) or not events or not set(events) <= set(EVENTS):
+        raise ValueError(f"events must be a non-empty list of: {', '.join(EVENTS)}")
+
+    max_batch_size = data.get('max_batch_size', 1)
+    if (not isinstance(max_batch_size, int) or isinstance(max_batch_size, bool)
+            or not 1 <= max_batch_size <= settings.WEBHOOK_MAX_BATCH_SIZE):
+        raise ValueError(f"max_batch_size must be between 1 and {settings.WEBHOOK_MAX_BATCH_SIZE}")
+    return url, sorted(set(events)), max_batch_size
+
+
+class WebhookListView(APIView):
+    """List webhook subscriptions or register a new one"""
+    permission_classes = [permissions.IsAdminUser]
+    
+    def get(self, request):
+        """List all subscriptions"""
+        try:
+            with connections[PRIMARY_ALIAS].cursor() as cursor:
+                return Response(SUBSCRIPTION_LIST.fetchall(cursor))
+        except Exception as e:
+            return Response(
+                {"error": f"Failed to fetch webhooks: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+    
+    def post(self, request):
+        """
+        Register {"url": ..., "events": [...], "max_batch_size": N}. The
+        response includes the signing secret, which is not shown again.
+        """
+        try:
+            registration = requested_registration(request.data)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            url, events, max_batch_size = registration
+            with connections[PRIMARY_ALIAS].cursor() as cursor:
+                subscription = SUBSCRIPTION_INSERT.fetchone(
+                    cursor, [url, events, secrets.token_hex(32), max_batch_size]
+                )
+            return Response(subscription, status=status.HTTP_201_CREATED)
+        except Exception as e:
+            return Response(
+                {"error": f"Failed to create webhook: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
+class WebhookDetailView(APIView):
+    """Retrieve or delete a webhook subscription"""
+    permission_classes = [permissions.IsAdminUser]
+    
+    def get(self, request, pk):
+        """Get a specific subscription"""
+        try:
+            with connections[PRIMARY_ALIAS].cursor() as cursor:
+                subscription = SUBSCRIPTION_DETAIL.fetchone(cursor, [pk])
+            if not subscription:
+                return Response(
+                    {"error": "Webhook not found"},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            return Response(subscription)
+        except Exception as e:
+            return Response(
+                {"error": f"Failed to fetch webhook: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+    
+    def delete(self, request, pk):
+        """Delete a subscription and everything still queued for it"""
+        try:
+            with connections[PRIMARY_ALIAS].cursor() as cursor:
+                deleted = SUBSCRIPTION_DELETE.fetchone(cursor, [pk])
+            if not deleted:
+                return Response(
+                    {"error": "Webhook not found"},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        except Exception as e:
+            return Response(
+                {"error": f"Failed to delete webhook: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
+class WebhookDeadLetterView(APIView):
+    """Deliveries that ran out of attempts, and re-queuing them"""
+    permission_classes = [permissions.IsAdminUser]
+    
+    def get(self, request, pk):
+        """List a subscription's dead letters, oldest first"""
+        try:
+            with connections[PRIMARY_ALIAS].cursor() as cursor:
+                return Response(DEAD_LETTERS.fetchall(cursor, [pk]))
+        except Exception as e:
+            return Response(
+                {"error": f"Failed to fetch dead letters: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+    
+    def post(self, request, pk):
+        """Queue every dead letter of the subscription again"""
+        try:
+            with connections[PRIMARY_ALIAS].cursor() as cursor:
+                requeued = DEAD_LETTERS_RETRY.fetchall(cursor, [pk])
+            return Response({"requeued": len(requeued)})
+        except Exception as e:
+            return Response(
+                {"error": f"Failed to retry dead letters: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )